@@ -19,6 +19,25 @@ in
         type = lib.types.nullOr lib.types.str;
         default = null;
       };
+      githubEventsBatchSize = lib.mkOption {
+        type = lib.types.int;
+        default = 0;
+        description = ''
+          Number of received GitHub events that are buffered in memory and
+          stored at once. Buffered events are lost if a worker is killed
+          before storing them. With 0 every event is stored before its
+          delivery is acknowledged.
+        '';
+      };
+      githubEventsCompact = lib.mkOption {
+        type = lib.types.bool;
+        default = false;
+        description = ''
+          Whether received GitHub events are only stored with their number,
+          title, body and compressed data. Events that have been stored with
+          their full data are compacted daily.
+        '';
+      };
       database = lib.mkOption {
         type = lib.types.enum [ "sqlite" "postgresql" ];
         default = "sqlite";
@@ -50,6 +69,37 @@ in
           Whether updates from the NVD CVE database should be imported regularly.
         '';
       };
+      nvdImportWorkers = lib.mkOption {
+        type = lib.types.int;
+        default = 2;
+        description = ''
+          Number of NVD feeds that are downloaded and parsed concurrently
+          while importing.
+        '';
+      };
+      nvdImportProcesses = lib.mkOption {
+        type = lib.types.bool;
+        default = false;
+        description = ''
+          Whether the NVD feeds are parsed in separate processes instead of
+          threads. This spreads the parsing over multiple cores.
+        '';
+      };
+      nvdUseCVEAPI = lib.mkOption {
+        type = lib.types.bool;
+        default = false;
+        description = ''
+          Whether the hourly import fetches the CVEs modified since its last
+          run from the NVD CVE API 2.0 instead of downloading the recent feed.
+        '';
+      };
+      nvdAPIKeyFile = lib.mkOption {
+        type = lib.types.nullOr lib.types.str;
+        default = null;
+        description = ''
+          File containing an API key for the NVD CVE API 2.0.
+        '';
+      };
       virtualHost = lib.mkOption {
         type = lib.types.str;
         default = "localhost";
@@ -111,6 +161,8 @@ in
       let
         envFile = pkgs.writeText "env" ((lib.optionalString (cfg.githubEventsSharedSecretFile != null) ''
           export NIXOS_SECURITY_TRACKER_GITHUB_EVENTS_SECRET="$(<${cfg.githubEventsSharedSecretFile})"
+        '') + (lib.optionalString (cfg.nvdAPIKeyFile != null) ''
+          export NIXOS_SECURITY_TRACKER_NVD_API_KEY="$(<${cfg.nvdAPIKeyFile})"
         '') + (if cfg.database == "sqlite" then ''
           export NIXOS_SECURITY_TRACKER_DATABASE_TYPE="sqlite"
           export NIXOS_SECURITY_TRACKER_DATABASE_NAME="$STATE_DIRECTORY/database.sqlite"
@@ -128,6 +180,9 @@ in
           test -f "$SECRET_KEY_FILE" || tr -dc A-Za-z0-9 < /dev/urandom  | head -c 128 > "$SECRET_KEY_FILE"
 
           export NIXOS_SECURITY_TRACKER_SECRET_KEY="$(<$SECRET_KEY_FILE)"
+          export NIXOS_SECURITY_TRACKER_NVD_CACHE_DIR="$STATE_DIRECTORY/nvd-cache"
+          export NIXOS_SECURITY_TRACKER_GITHUB_EVENTS_BATCH_SIZE="${toString cfg.githubEventsBatchSize}"
+          export NIXOS_SECURITY_TRACKER_GITHUB_EVENTS_COMPACT="${if cfg.githubEventsCompact then "1" else "0"}"
         '');
       in
       {
@@ -175,7 +230,7 @@ in
 
           script = ''
             source $ENVFILE
-            exec manage import_nvd
+            exec manage import_nvd --workers ${toString cfg.nvdImportWorkers} ${lib.optionalString cfg.nvdImportProcesses "--processes"}
           '';
 
           startAt = "daily"; # FIXME: make configurable
@@ -203,7 +258,7 @@ in
 
           script = ''
             source $ENVFILE
-            exec manage import_nvd https://nvd.nist.gov/feeds/json/cve/1.1/nvdcve-1.1-recent.json.gz
+            exec manage import_nvd ${if cfg.nvdUseCVEAPI then "--api" else "https://nvd.nist.gov/feeds/json/cve/1.1/nvdcve-1.1-recent.json.gz"}
           '';
 
           startAt = "hourly"; # FIXME: make configurable
@@ -217,6 +272,34 @@ in
           };
         };
 
+        nixos-security-tracker-compact-github-events = lib.mkIf cfg.githubEventsCompact {
+          path = [
+            pkgs.nixos-security-tracker.manage
+            pkgs.nixos-security-tracker.env
+          ];
+          environment = {
+            ENVFILE = toString envFile;
+          };
+
+          after = lib.mkIf cfg.runMigrations [ "nixos-security-tracker-migrate.service" ];
+          requires = lib.mkIf cfg.runMigrations [ "nixos-security-tracker-migrate.service" ];
+
+          script = ''
+            source $ENVFILE
+            exec manage compact_github_events
+          '';
+
+          startAt = "daily";
+
+          serviceConfig = {
+            Type = "oneshot";
+            User = "nixos-security-tracker";
+            DynamicUser = true;
+            StateDirectory = "nixos-security-tracker";
+            PrivateTmp = true;
+          };
+        };
+
         nixos-security-tracker = {
           path = [
             pkgs.nixos-security-tracker.manage
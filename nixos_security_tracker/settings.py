@@ -175,3 +175,22 @@ if _github_events_secret:
     GITHUB_EVENTS_SECRET = _github_events_secret.encode()
 else:
     GITHUB_EVENTS_SECRET = False
+
+# Number of received GitHub events that are stored with a single query, 0
+# stores every event while its delivery is being handled. Buffered events are
+# acknowledged before they are stored and are lost if the worker is killed,
+# GitHub does not redeliver them on its own.
+GITHUB_EVENTS_BATCH_SIZE = int(
+    os.getenv("NIXOS_SECURITY_TRACKER_GITHUB_EVENTS_BATCH_SIZE", 0)
+)
+
+# Number of seconds received GitHub events are buffered at most
+GITHUB_EVENTS_FLUSH_INTERVAL = float(
+    os.getenv("NIXOS_SECURITY_TRACKER_GITHUB_EVENTS_FLUSH_INTERVAL", 1.0)
+)
+
+# Store only the extracted fields and the compressed raw data of received
+# GitHub events rather than their data as JSON
+GITHUB_EVENTS_COMPACT = os.getenv(
+    "NIXOS_SECURITY_TRACKER_GITHUB_EVENTS_COMPACT", ""
+).lower() in ("1", "true", "yes")
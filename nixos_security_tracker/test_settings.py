@@ -1,3 +1,6 @@
 from .settings import *  # noqa: F403
 
 DATABASES["default"]["NAME"] = ":memory:"  # noqa: F405
+
+# the tests expect events to be stored once the response has been received
+GITHUB_EVENTS_BATCH_SIZE = 0
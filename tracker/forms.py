@@ -0,0 +1,22 @@
+from decimal import Decimal
+
+from django import forms
+
+# the lower bounds of the qualitative severity ratings of CVSS v3
+SEVERITY_CHOICES = [
+    ("", "any"),
+    ("0.1", "low or higher"),
+    ("4.0", "medium or higher"),
+    ("7.0", "high or higher"),
+    ("9.0", "critical"),
+]
+
+
+class IssueFilterForm(forms.Form):
+    min_cvss = forms.TypedChoiceField(
+        label="Severity",
+        choices=SEVERITY_CHOICES,
+        coerce=Decimal,
+        empty_value=None,
+        required=False,
+    )
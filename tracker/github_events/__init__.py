@@ -1,41 +1,124 @@
 import logging
 import re
-from typing import Iterator, List, Tuple
+from typing import Iterable, Iterator, List, Match, Optional, Set, Tuple
 
 from ..exceptions import GitHubEventBodyNotSupported
-from ..models import GitHubEvent
+from ..models import GitHubEvent, GitHubEventReference
 
 logger = logging.getLogger(__name__)
 
-CVE_REGEXP = re.compile(r"\b(?P<id>CVE-[0-9]+-[0-9]+)\b")
+# The identifiers of vulnerabilities that are recognized in texts, all in a
+# single pattern so that a text is only searched once. GitHub Security
+# Advisories use a restricted alphabet, the IDs of the databases aggregated
+# by OSV are prefixed with the name of the database.
+IDENTIFIER_REGEXP = re.compile(
+    r"\b(?:"
+    r"(?P<cve>CVE-[0-9]+-[0-9]+)"
+    r"|(?P<ghsa>GHSA(?:-[23456789cfghjmpqrvwx]{4}){3})"
+    r"|(?P<osv>(?:OSV|PYSEC|RUSTSEC|GO)-[0-9]{4}-[0-9]+)"
+    r")\b",
+    re.IGNORECASE,
+)
 
+# Most texts do not mention any identifier at all. Looking for these literal
+# parts of the identifiers in the upper cased text is much cheaper than
+# running the regular expression, which is only done for texts that contain
+# one of them. `SEC-` covers both PYSEC and RUSTSEC.
+IDENTIFIER_PREFIXES = ("CVE-", "GHSA-", "SEC-", "OSV-", "GO-")
 
-def find_cve_identifiers(text: List[str]) -> Iterator[str]:
+
+# the kinds of events whose text we know how to get
+SUPPORTED_KINDS = ["issue_comment", "pull_request"]
+
+BATCH_SIZE = 1000
+
+
+def normalize_identifier(match: Match) -> str:
+    """
+    Write an identifier found by IDENTIFIER_REGEXP the way its database does,
+    e.g. `CVE-2021-3449` or `GHSA-8r8j-xvfj-36f9`.
+    """
+    identifier = match.group(0)
+    if match.lastgroup == "ghsa":
+        return "GHSA" + identifier[4:].lower()
+    return identifier.upper()
+
+
+def might_mention_identifiers(s: str) -> bool:
+    # identifiers are matched regardless of their case
+    s = s.upper()
+    # a plain loop is noticeably faster than any() with a generator here
+    for prefix in IDENTIFIER_PREFIXES:
+        if prefix in s:
+            return True
+    return False
+
+
+def find_identifiers(text: List[str]) -> Set[str]:
     """
-    Find all the CVE identifiers in the given string.
+    Find all the CVE, GHSA and OSV identifiers in the given strings.
     """
-    results = []
+    results: Set[str] = set()
     for s in text:
-        results += CVE_REGEXP.findall(s)
-    return set(results)
+        # the body of a pull request is null if it has not been filled in
+        if not s or not might_mention_identifiers(s):
+            continue
+        results.update(
+            normalize_identifier(match) for match in IDENTIFIER_REGEXP.finditer(s)
+        )
+    return results
+
+
+def find_cve_identifiers(text: List[str]) -> Set[str]:
+    """
+    Find all the CVE identifiers in the given strings.
+    """
+    return {
+        identifier
+        for identifier in find_identifiers(text)
+        if identifier.startswith("CVE-")
+    }
 
 
-def search_for_cve_references() -> Iterator[Tuple[GitHubEvent, Iterator[str]]]:
+def search_for_cve_references(
+    events: Optional[Iterable[GitHubEvent]] = None,
+) -> Iterator[Tuple[GitHubEvent, Iterator[str]]]:
     """
-    Search through all the recorded GitHubEvent's (of a supported kind) and
-    yield tuples of (event, identifiers) where event is the GitHubEvent and
-    identifiers is a list of CVE identifiers as strings.
+    Search through the given or all the recorded GitHubEvent's (of a
+    supported kind) and yield tuples of (event, identifiers) where event is
+    the GitHubEvent and identifiers is a list of CVE (as well as GHSA and
+    OSV) identifiers as strings.
     """
-    events = GitHubEvent.objects.filter(kind__in=["issue_comment", "pull_request"])
+    if events is None:
+        events = GitHubEvent.objects.filter(kind__in=SUPPORTED_KINDS).iterator()
 
-    for event in events.iterator():
+    for event in events:
+        if event.kind not in SUPPORTED_KINDS:
+            continue
         try:
-            identifiers = find_cve_identifiers(event.text)
+            identifiers = find_identifiers(event.text)
             if not identifiers:
-                logger.debug("No CVE identifiers in %s, skipping it", event)
+                logger.debug("No identifiers in %s, skipping it", event)
                 continue
 
             yield (event, identifiers)
-        except GitHubEventBodyNotSupported:
+        except (GitHubEventBodyNotSupported, KeyError, TypeError):
             logger.info("Skipping %s as it doesn't seem to have a body", event)
             continue
+
+
+def store_references(references: Iterable[Tuple[int, Iterable[str]]]) -> int:
+    """
+    Link the (stored) events with the given primary keys to the CVE, GHSA
+    and OSV identifiers they mention. Links that exist already are skipped. Returns
+    the number of mentions.
+    """
+    links = [
+        GitHubEventReference(event_id=event_id, identifier_id=identifier)
+        for event_id, identifiers in references
+        for identifier in sorted(identifiers)
+    ]
+    GitHubEventReference.objects.bulk_create(
+        links, ignore_conflicts=True, batch_size=BATCH_SIZE
+    )
+    return len(links)
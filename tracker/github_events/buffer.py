@@ -0,0 +1,167 @@
+"""
+Buffered storage of received GitHubEvents
+
+Storing every webhook delivery with its own INSERT while the request is being
+handled makes bursts of deliveries queue up in the workers. With
+GITHUB_EVENTS_BATCH_SIZE set, received events are therefore appended to an
+in-process buffer instead, and a background thread stores them with a single
+`bulk_create` once enough have been collected or after a short interval at
+the latest.
+
+The buffer only lives in memory: events that have been acknowledged but not
+stored yet are lost if the worker is killed. They are flushed when the
+process exits normally, and GitHub allows redelivering them by hand.
+"""
+import atexit
+import logging
+import threading
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Max
+
+from ..models import GitHubEvent
+from . import SUPPORTED_KINDS, search_for_cve_references, store_references
+
+logger = logging.getLogger(__name__)
+
+# events that could not be stored are kept for the next attempt, but only up
+# to this many batches
+MAX_PENDING_BATCHES = 100
+
+
+def store_events(events: List[GitHubEvent]) -> None:
+    """
+    Store the given events with one query, skipping deliveries that have
+    been stored before, and link them to the CVEs they mention.
+    """
+    if not any(event.kind in SUPPORTED_KINDS for event in events):
+        GitHubEvent.objects.bulk_create(events, ignore_conflicts=True)
+        return
+
+    with transaction.atomic():
+        # The primary keys are not returned when conflicts are ignored, the
+        # new events are the ones after the last event before the insert.
+        last = GitHubEvent.objects.aggregate(last=Max("pk"))["last"] or 0
+        GitHubEvent.objects.bulk_create(events, ignore_conflicts=True)
+        new_events = GitHubEvent.objects.filter(
+            pk__gt=last, kind__in=SUPPORTED_KINDS
+        ).only("id", "kind", "delivery", "number", "title", "body", "data")
+        references = []
+        for event in new_events.iterator():
+            # the event is kept even if its text cannot be searched
+            try:
+                references += [
+                    (event.pk, identifiers)
+                    for _, identifiers in search_for_cve_references([event])
+                ]
+            except Exception:
+                logger.exception(
+                    "Failed to search GitHub event %d (delivery %s) for references",
+                    event.pk,
+                    event.delivery,
+                )
+        store_references(references)
+
+
+class EventBuffer:
+    """
+    Collects events and stores them in batches of up to `batch_size` from a
+    background thread, waiting at most `interval` seconds for a batch to fill.
+    """
+
+    def __init__(self, batch_size: int, interval: float):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.events: List[GitHubEvent] = []
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def add(self, event: GitHubEvent) -> None:
+        """
+        Append an event to the buffer. This never blocks on the database.
+        """
+        with self.lock:
+            self.events.append(event)
+            full = len(self.events) >= self.batch_size
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name="github-event-buffer", daemon=True
+                )
+                self.thread.start()
+                atexit.register(self.flush)
+        if full:
+            self.wakeup.set()
+
+    def run(self) -> None:
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            if self.events:
+                self.flush()
+                # like after a request, so that the connection of this thread
+                # does not outlive CONN_MAX_AGE
+                close_old_connections()
+
+    def flush(self) -> None:
+        """
+        Store all buffered events, in batches of `batch_size`.
+        """
+        with self.lock:
+            events, self.events = self.events, []
+
+        for start in range(0, len(events), self.batch_size):
+            batch = events[start : start + self.batch_size]
+            try:
+                store_events(batch)
+            except Exception:
+                logger.exception("Failed to store %d GitHub events", len(batch))
+                if not self.store_separately(batch):
+                    self.requeue(events[start:])
+                    return
+
+    def store_separately(self, events: List[GitHubEvent]) -> bool:
+        """
+        Store the events of a batch that failed one by one, so that a single
+        malformed event does not hold back the others. Events that fail on
+        their own are dropped. Returns False if none of them could be stored,
+        e.g. as the database is not available.
+        """
+        stored = False
+        for event in events:
+            try:
+                with transaction.atomic():
+                    store_events([event])
+                stored = True
+            except Exception:
+                logger.exception(
+                    "Failed to store GitHub event of kind %s (delivery %s)",
+                    event.kind,
+                    event.delivery,
+                )
+        return stored
+
+    def requeue(self, events: List[GitHubEvent]) -> None:
+        with self.lock:
+            self.events[:0] = events
+            dropped = len(self.events) - MAX_PENDING_BATCHES * self.batch_size
+            if dropped > 0:
+                logger.error("Dropping %d GitHub events that were not stored", dropped)
+                del self.events[:dropped]
+
+
+_event_buffer: Optional[EventBuffer] = None
+
+
+def get_event_buffer() -> EventBuffer:
+    """
+    The buffer of this process, as configured in the settings.
+    """
+    global _event_buffer
+    if _event_buffer is None:
+        _event_buffer = EventBuffer(
+            settings.GITHUB_EVENTS_BATCH_SIZE, settings.GITHUB_EVENTS_FLUSH_INTERVAL
+        )
+    return _event_buffer
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tracker.models import GitHubEvent, compress_payload
+
+# number of events that are compacted at once
+DEFAULT_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Extract the number, title and body of the stored GitHub events and "
+        "replace their JSON data by the compressed payload"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Number of events that are compacted at once",
+        )
+
+    def handle(self, *args, **options):
+        compacted = 0
+        last = 0
+        while True:
+            with transaction.atomic():
+                events = list(
+                    GitHubEvent.objects.filter(pk__gt=last, data__isnull=False)
+                    .order_by("pk")
+                    .only("pk", "kind", "data")[: options["batch_size"]]
+                )
+                if not events:
+                    break
+                for event in events:
+                    for field, value in GitHubEvent.extract_fields(
+                        event.kind, event.data
+                    ).items():
+                        setattr(event, field, value)
+                    event.payload = compress_payload(event.data)
+                    event.data = None
+                GitHubEvent.objects.bulk_update(
+                    events, ["number", "title", "body", "payload", "data"]
+                )
+            compacted += len(events)
+            last = events[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(f"Compacted {compacted} events"))
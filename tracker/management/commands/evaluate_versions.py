@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tracker.models import Issue, Package
+from tracker.nixpkgs.evaluation import evaluate_issues
+from tracker.nixpkgs.matching import PackageIndex
+from tracker.utils import chunked
+
+# number of issues whose candidates are evaluated at once
+DEFAULT_CHUNK_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the package candidates of all issues against the vulnerable "
+        "version ranges and update the suggested status of the issues"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Number of issues that are evaluated at once",
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        index = PackageIndex.build(
+            Package.objects.values_list("id", "attribute", "pname").iterator()
+        )
+
+        issue_ids = list(Issue.objects.order_by("pk").values_list("pk", flat=True))
+
+        changed = 0
+        with transaction.atomic():
+            for chunk in chunked(issue_ids, options["chunk_size"]):
+                changed += evaluate_issues(index, chunk)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Evaluated {len(issue_ids)} issues, {changed} package candidates "
+                f"changed in {time.monotonic() - start:.1f}s"
+            )
+        )
@@ -0,0 +1,237 @@
+import time
+from typing import Dict, Iterable, List, Set
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from tracker.management.commands.import_packages import BATCH_SIZE, upsert_packages
+from tracker.management.commands.match_packages import match_issues
+from tracker.models import (
+    Channel,
+    ChannelPackage,
+    ChannelPackageChange,
+    ChannelRevision,
+    Issue,
+    IssuePackageCandidate,
+    IssueStatus,
+    Package,
+)
+from tracker.nixpkgs import read_packages
+from tracker.nixpkgs.evaluation import evaluate_issues
+from tracker.nixpkgs.matching import PackageIndex
+from tracker.utils import chunked
+
+# number of issues that are matched or evaluated at once
+DEFAULT_CHUNK_SIZE = 5000
+
+# number of packages whose candidates are evaluated at once
+PACKAGE_CHUNK_SIZE = 500
+
+# the statuses of issues that are still of interest for new packages
+OPEN_STATUSES = (IssueStatus.UNKNOWN, IssueStatus.AFFECTED)
+
+
+class Command(BaseCommand):
+    help = (
+        "Import the package listing of a channel revision and re-evaluate the "
+        "issues of the packages that changed since the previous revision"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("channel", type=str, help="Name of the channel")
+        parser.add_argument(
+            "path",
+            type=str,
+            help="Path of the listing (packages.json), optionally gzip compressed",
+        )
+        parser.add_argument(
+            "--revision",
+            type=str,
+            default="",
+            help="Revision of the channel the listing belongs to",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Number of issues that are matched or evaluated at once",
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        try:
+            records = list(read_packages(options["path"]))
+        except FileNotFoundError:
+            raise CommandError(f"{options['path']} does not exist")
+
+        with transaction.atomic():
+            known = set(Package.objects.values_list("attribute", flat=True))
+            # The versions of existing packages are not touched, they differ
+            # from channel to channel and are kept per channel instead.
+            upsert_packages(records, updated_fields=())
+            package_ids = dict(Package.objects.values_list("attribute", "id"))
+
+            channel, _ = Channel.objects.get_or_create(name=options["channel"])
+            revision = update_channel(
+                channel,
+                options["revision"],
+                {package_ids[record.attribute]: record.version for record in records},
+            )
+            changes = list(
+                revision.changes.values_list("old_version", "new_version", "package_id")
+            )
+
+            new_packages = {
+                package_ids[record.attribute]
+                for record in records
+                if record.attribute not in known
+            }
+            matched = match_packages(new_packages, options["chunk_size"])
+            evaluated = evaluate_packages(
+                {package_id for _, _, package_id in changes}, options["chunk_size"]
+            )
+
+        added = sum(old is None for old, _, _ in changes)
+        removed = sum(new is None for _, new, _ in changes)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {revision.package_count} packages of {channel} "
+                f"{revision.revision}: {added} added, {removed} removed, "
+                f"{len(changes) - added - removed} changed, "
+                f"{matched} new package candidates, "
+                f"{evaluated} package candidates changed "
+                f"in {time.monotonic() - start:.1f}s"
+            )
+        )
+
+
+def update_channel(
+    channel: Channel, revision: str, versions: Dict[int, str]
+) -> ChannelRevision:
+    """
+    Make the given package versions the current ones of the channel and
+    record the differences to the previous revision.
+    """
+    current: Dict[int, ChannelPackage] = {
+        channel_package.package_id: channel_package
+        for channel_package in channel.packages.only("id", "package_id", "version")
+    }
+
+    channel_revision = ChannelRevision.objects.create(
+        channel=channel, revision=revision, package_count=len(versions)
+    )
+    changes: List[ChannelPackageChange] = []
+    to_create: List[ChannelPackage] = []
+    to_update: List[ChannelPackage] = []
+    for package_id, version in versions.items():
+        channel_package = current.get(package_id)
+        if channel_package is None:
+            to_create.append(
+                ChannelPackage(channel=channel, package_id=package_id, version=version)
+            )
+            old_version = None
+        elif channel_package.version != version:
+            old_version = channel_package.version
+            channel_package.version = version
+            to_update.append(channel_package)
+        else:
+            continue
+        changes.append(
+            ChannelPackageChange(
+                revision=channel_revision,
+                package_id=package_id,
+                old_version=old_version,
+                new_version=version,
+            )
+        )
+
+    to_delete = [
+        channel_package
+        for package_id, channel_package in current.items()
+        if package_id not in versions
+    ]
+    changes.extend(
+        ChannelPackageChange(
+            revision=channel_revision,
+            package_id=channel_package.package_id,
+            old_version=channel_package.version,
+            new_version=None,
+        )
+        for channel_package in to_delete
+    )
+
+    ChannelPackage.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+    if to_update:
+        ChannelPackage.objects.bulk_update(
+            to_update, ["version"], batch_size=BATCH_SIZE
+        )
+    for batch in chunked(to_delete, BATCH_SIZE):
+        ChannelPackage.objects.filter(pk__in=[c.pk for c in batch]).delete()
+    ChannelPackageChange.objects.bulk_create(changes, batch_size=BATCH_SIZE)
+
+    channel.revision = revision
+    channel.save(update_fields=["revision"])
+    return channel_revision
+
+
+def package_index(package_ids: Set[int]) -> PackageIndex:
+    return PackageIndex.build(
+        (package_id, attribute, pname)
+        for package_id, attribute, pname in Package.objects.values_list(
+            "id", "attribute", "pname"
+        ).iterator()
+        if package_id in package_ids
+    )
+
+
+def match_packages(package_ids: Set[int], chunk_size: int) -> int:
+    """
+    Match the open issues against the given (new) packages only. Returns the
+    number of package candidates that have been created.
+    """
+    if not package_ids:
+        return 0
+    index = package_index(package_ids)
+
+    issue_ids = list(
+        Issue.objects.filter(status__in=OPEN_STATUSES)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    created = 0
+    for chunk in chunked(issue_ids, chunk_size):
+        # the range of the chunk might include issues that are not open
+        open_issues = set(chunk)
+        candidates = [
+            candidate
+            for candidate in match_issues(index, chunk)
+            if candidate.issue_id in open_issues
+        ]
+        IssuePackageCandidate.objects.bulk_create(candidates, batch_size=BATCH_SIZE)
+        created += len(candidates)
+    return created
+
+
+def evaluate_packages(package_ids: Iterable[int], chunk_size: int) -> int:
+    """
+    Re-evaluate the package candidates of the given packages of all open
+    issues. Returns the number of candidates whose outcome changed.
+    """
+    changed = 0
+    for package_chunk in chunked(sorted(package_ids), PACKAGE_CHUNK_SIZE):
+        packages = set(package_chunk)
+        index = PackageIndex.build(
+            Package.objects.filter(pk__in=package_chunk).values_list(
+                "id", "attribute", "pname"
+            )
+        )
+        issue_ids = sorted(
+            set(
+                IssuePackageCandidate.objects.filter(
+                    package_id__in=package_chunk, issue__status__in=OPEN_STATUSES
+                ).values_list("issue_id", flat=True)
+            )
+        )
+        for chunk in chunked(issue_ids, chunk_size):
+            changed += evaluate_issues(index, chunk, packages)
+    return changed
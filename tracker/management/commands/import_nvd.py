@@ -1,25 +1,176 @@
+import argparse
 import datetime
-import json
+import functools
 import os
-from gzip import GzipFile
-from typing import BinaryIO, Dict
-
-import requests
-from django.core.management.base import BaseCommand
-from django.utils.dateparse import parse_datetime
+import sqlite3
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from tracker.models import (
+    Issue,
+    IssueCPEMatch,
+    IssueReference,
+    IssueWeakness,
+    NVDFeed,
+    NVDImportMode,
+    NVDImportRun,
+    NVDImportRunFeed,
+)
+from tracker.nvd import (
+    NVD_UPDATED_FIELDS,
+    CVERecord,
+    FeedCache,
+    FetchStatistics,
+    NVDFeedFetch,
+    cpe_vendor_product,
+    issue_fields,
+    local_path,
+)
+from tracker.nvd.api import API_URL, NVDAPIFetch
+from tracker.nvd.bulk_load import BulkLoader
+from tracker.utils import chunked, pipeline, process_pipeline
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# number of chunks each feed may read ahead of the database writes
+DEFAULT_BUFFER_SIZE = 4
+
+# minimum number of seconds between two progress lines of a feed
+DEFAULT_PROGRESS_INTERVAL = 60.0
+
+
+class ImportProgress:
+    """
+    Writes a progress line with the import rate and, if the fraction that
+    is done is known, the estimated time until the feed is complete. Lines
+    are written at most once every `interval` seconds no matter how often
+    `update()` is called.
+    """
 
-from tracker.models import Issue, IssueReference
+    def __init__(
+        self,
+        write: Callable[[str], Any],
+        url: str,
+        interval: float = DEFAULT_PROGRESS_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.write = write
+        self.url = url
+        self.interval = interval
+        self.clock = clock
+        self.started = clock()
+        self.reported = self.started
+
+    def update(self, records: int, done: Optional[float] = None):
+        now = self.clock()
+        if now - self.reported < self.interval:
+            return
+        self.reported = now
+
+        elapsed = now - self.started
+        rate = records / elapsed if elapsed else 0.0
+        line = f"{self.url}: {records} records, {rate:.0f} records/s"
+        if done:
+            remaining = elapsed * (1 - done) / done
+            eta = datetime.timedelta(seconds=round(remaining))
+            line += f", {done:.0%} done, ETA {eta}"
+        self.write(line)
 
 
 class Command(BaseCommand):
     help = "Import CVEs from the NVD databases"
 
+    # per issue output is only written with a verbosity of 2 or more
+    verbosity = 1
+    progress_interval = DEFAULT_PROGRESS_INTERVAL
+
     def add_arguments(self, parser):
         parser.add_argument(
-            "url", nargs="*", type=str, help="URL of the NVD JSON in version 1.1"
+            "url",
+            nargs="*",
+            type=str,
+            help="URL or path of the NVD JSON in version 1.1",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Number of CVEs that are written to the database at once",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of feeds that are downloaded and parsed concurrently",
+        )
+        parser.add_argument(
+            "--processes",
+            action="store_true",
+            help="Download and parse the feeds in worker processes instead of threads",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Import the feeds even if they did not change since the last import",
+        )
+        parser.add_argument(
+            "--cache-dir",
+            type=str,
+            default=os.environ.get("NIXOS_SECURITY_TRACKER_NVD_CACHE_DIR"),
+            help="Directory in which the downloaded feeds are kept",
+        )
+        parser.add_argument(
+            "--bulk-load",
+            action="store_true",
+            help="Load all feeds with COPY in a single transaction (PostgreSQL only)",
+        )
+
+        parser.add_argument(
+            "--api",
+            action="store_true",
+            help="Fetch the CVEs modified since the last run from the CVE API 2.0 instead of the feeds",
+        )
+        parser.add_argument(
+            "--api-url",
+            type=str,
+            default=API_URL,
+            help="URL of the CVE API 2.0",
+        )
+        parser.add_argument(
+            "--api-delay",
+            type=float,
+            default=None,
+            help="Seconds to wait between two requests to the CVE API, retries of "
+            "failed requests wait twice as long each time",
+        )
+        parser.add_argument(
+            "--since",
+            type=parse_since,
+            default=None,
+            help="Fetch the CVEs modified since this datetime from the CVE API",
+        )
+        parser.add_argument(
+            "--progress-interval",
+            type=float,
+            default=DEFAULT_PROGRESS_INTERVAL,
+            help="Minimum number of seconds between two progress lines of a feed",
         )
 
     def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        self.progress_interval = options["progress_interval"]
+
+        if options["api"]:
+            return self.handle_api(**options)
+
         urls = options["url"]
         env_urls = os.environ.get("NIXOS_SECURITY_TRACKER_NVD_URLS")
         if not urls and env_urls:
@@ -32,136 +183,506 @@ class Command(BaseCommand):
             ]
 
         for url in urls:
-            self.stdout.write(self.style.NOTICE(f"Loading {url}"))
-            response = requests.get(url, stream=True)
-            assert response.status_code == 200
-            data = gzip_decompress(response.raw)
-            data = json.load(data)
-
-            cves: Dict[str, str] = {}
-
-            for cve_item in data["CVE_Items"]:
-                cve = cve_item["cve"]
-                identifier = cve["CVE_data_meta"]["ID"]
-
-                # get the first 'en' description
-                description = next(
-                    entry["value"]
-                    for entry in cve["description"]["description_data"]
-                    if entry["lang"] == "en"
-                )
+            path = local_path(url)
+            if path is not None and not path.is_file():
+                raise CommandError(f"{url} is neither a URL nor an existing file")
 
-                published_date = parse_datetime(cve_item["publishedDate"])
+        chunk_size = options["chunk_size"]
 
-                references = [
-                    data["url"] for data in cve["references"]["reference_data"]
-                ]
+        cache = None
+        if options["cache_dir"]:
+            cache = FeedCache(options["cache_dir"])
 
-                cves[identifier] = {
-                    "description": description,
-                    "published_date": published_date,
-                    "references": sorted(references),
-                }
+        feeds = {}
+        if not options["force"]:
+            feeds = {feed.url: feed for feed in NVDFeed.objects.filter(url__in=urls)}
 
-            cve_ids = set(cves.keys())
-            existing_issues = list(
-                Issue.objects.prefetch_related("references").filter(
-                    identifier__in=cve_ids
+        fetches = []
+        for url in urls:
+            feed = feeds.get(url)
+            if feed:
+                resume = None
+                # the bulk loader writes everything in a single transaction,
+                # there is nothing to resume
+                if feed.checkpoint_version and not options["bulk_load"]:
+                    resume = (feed.checkpoint_version, feed.checkpoint_offset)
+                fetch = NVDFeedFetch(
+                    url,
+                    etag=feed.etag,
+                    last_modified=feed.last_modified,
+                    sha256=feed.sha256,
+                    cache=cache,
+                    resume=resume,
                 )
-            )
-            missing_issues = cve_ids ^ set(i.identifier for i in existing_issues)
-
-            # insert all the missing issues
-            if missing_issues:
-                Issue.objects.bulk_create(
-                    (
-                        Issue(
-                            identifier=i,
-                            description=cves[i]["description"],
-                            published_date=cves[i]["published_date"],
-                        )
-                        for i in missing_issues
+            else:
+                fetch = NVDFeedFetch(url, cache=cache)
+            fetches.append(fetch)
+
+        if options["bulk_load"]:
+            connection = connections[router.db_for_write(Issue)]
+            if connection.vendor != "postgresql":
+                raise CommandError("--bulk-load requires a PostgreSQL database")
+
+            with self.record_run(NVDImportMode.BULK_LOAD) as run:
+                with transaction.atomic(using=connection.alias):
+                    loader = BulkLoader(connection)
+                    self.import_feeds(
+                        run,
+                        fetches,
+                        loader.copy,
+                        chunk_size,
+                        workers=options["workers"],
+                        processes=options["processes"],
+                        checkpoints=False,
                     )
+                    self.stdout.write(self.style.NOTICE("Merging the staged records"))
+                    counts = loader.merge()
+                    run.add_counts(counts)
+            changed = counts["issues_created"] + counts["issues_updated"]
+            self.stdout.write(
+                self.style.SUCCESS(f"Created or updated {changed} issues")
+            )
+        else:
+            with self.record_run(NVDImportMode.FEEDS) as run:
+                self.import_feeds(
+                    run,
+                    fetches,
+                    self.import_records,
+                    chunk_size,
+                    workers=options["workers"],
+                    processes=options["processes"],
                 )
 
-                missing_issues_with_references = dict(
-                    (i, cves[i]["references"])
-                    for i in missing_issues
-                    if cves[i]["references"]
-                )
+    @contextmanager
+    def record_run(self, mode: NVDImportMode) -> Iterator[NVDImportRun]:
+        """
+        Record the run in the ledger. The run is stored before anything is
+        imported and marked as succeeded once the import finished. A failed
+        run keeps the counters of the feeds that have been completed.
+        """
+        run = NVDImportRun.objects.create(mode=mode)
+        try:
+            yield run
+            run.succeeded = True
+        finally:
+            run.finished_at = timezone.now()
+            run.save()
+
+    def record_feed(
+        self,
+        run: NVDImportRun,
+        url: str,
+        statistics: FetchStatistics,
+        write_seconds: float,
+        counts: Counter,
+        skipped: bool = False,
+    ):
+        NVDImportRunFeed.objects.create(
+            run=run,
+            url=url,
+            skipped=skipped,
+            downloaded_bytes=statistics.downloaded_bytes,
+            download_duration=datetime.timedelta(seconds=statistics.download_seconds),
+            decompress_duration=datetime.timedelta(
+                seconds=statistics.decompress_seconds
+            ),
+            parse_duration=datetime.timedelta(seconds=statistics.parse_seconds),
+            write_duration=datetime.timedelta(seconds=write_seconds),
+            **counts,
+        )
+        run.add_counts(counts)
 
-                if missing_issues_with_references:
-                    objs = Issue.objects.filter(
-                        identifier__in=missing_issues_with_references.keys()
-                    )
-                    references_to_create = []
-                    for issue in objs:
-                        references = missing_issues_with_references[issue.identifier]
-
-                        references_to_create += [
-                            IssueReference(issue=issue, uri=uri) for uri in references
-                        ]
-                    IssueReference.objects.bulk_create(references_to_create)
-
-            for issue in existing_issues:
-                cve = cves[issue.identifier]
-                description = cve["description"]
-
-                # handle initial database migration that introduced
-                # published_date
-                if issue.published_date is None:
-                    self.style.NOTICE(
-                        f"Adding published_date to issue {issue.identifier}"
-                    )
+    def handle_api(self, **options):
+        url = options["api_url"]
+        feed, _ = NVDFeed.objects.get_or_create(url=url)
+
+        since = options["since"] or feed.watermark
+        if since is not None and timezone.is_naive(since):
+            since = timezone.make_aware(since, datetime.timezone.utc)
 
-                    issue.published_date = cve["published_date"]
-                    issue.save()
+        fetch = NVDAPIFetch(
+            url,
+            since=since,
+            api_key=os.environ.get("NIXOS_SECURITY_TRACKER_NVD_API_KEY"),
+            delay=options["api_delay"],
+        )
+
+        if since is None:
+            self.stdout.write(self.style.NOTICE(f"Loading all CVEs from {url}"))
+        else:
+            self.stdout.write(
+                self.style.NOTICE(f"Loading CVEs modified since {since} from {url}")
+            )
 
-                if issue.description != description:
+        def save_watermark():
+            if fetch.watermark != since:
+                NVDFeed.objects.filter(pk=feed.pk).update(watermark=fetch.watermark)
+
+        with self.record_run(NVDImportMode.API) as run:
+            progress = self.progress(url)
+            written = 0
+            counts: Counter = Counter()
+            write_seconds = 0.0
+            # The watermark only moves past a time window once all of its
+            # records have been read so it is stored together with each chunk.
+            for chunk in chunked(fetch.records(), options["chunk_size"]):
+                start = time.perf_counter()
+                with transaction.atomic():
+                    counts.update(self.import_records(chunk))
+                    save_watermark()
+                write_seconds += time.perf_counter() - start
+                written += len(chunk)
+                progress.update(written, fetch.progress())
+            save_watermark()
+            self.record_feed(run, url, fetch.statistics, write_seconds, counts)
+            self.write_summary(url, written, counts)
+
+    def import_feeds(
+        self,
+        run: NVDImportRun,
+        fetches: List[NVDFeedFetch],
+        write: Callable[[List[CVERecord]], Any],
+        chunk_size: int,
+        workers: int = 1,
+        processes: bool = False,
+        checkpoints: bool = True,
+    ):
+        """
+        Fetch the given feeds and write their records in chunks. Unless
+        `checkpoints` is disabled every chunk is written in its own
+        transaction together with a checkpoint that allows resuming the
+        import of the feed if it is interrupted.
+
+        The statistics of every feed and the counts returned by `write` are
+        recorded as part of the `run`.
+        """
+        load = functools.partial(load_feed, chunk_size=chunk_size)
+
+        # The feeds are downloaded and parsed by a pool of workers while the
+        # main thread writes the chunks of the current feed to the database.
+        # Each feed is streamed so only a bounded number of records is held
+        # in memory at any time. Decoding the JSON is CPU bound, with
+        # `processes` the workers are not limited by the GIL.
+        run_pipeline = process_pipeline if processes else pipeline
+        for fetch, chunks in run_pipeline(
+            fetches, load, workers=workers, buffer_size=DEFAULT_BUFFER_SIZE
+        ):
+            self.stdout.write(self.style.NOTICE(f"Loading {fetch.url}"))
+            progress = self.progress(fetch.url)
+            written = 0
+            write_seconds = 0.0
+            counts: Counter = Counter()
+            for chunk in chunks:
+                if written == 0 and fetch.offset:
                     self.stdout.write(
                         self.style.NOTICE(
-                            f"Updating metadata of issue {issue.identifier}"
+                            f"Resuming {fetch.url} after {fetch.offset} records"
                         )
                     )
 
-                    issue.description = description
-                    issue.save()
+                start = time.perf_counter()
+                if checkpoints:
+                    with transaction.atomic():
+                        result = write(chunk)
+                        if fetch.version:
+                            self.save_checkpoint(
+                                fetch, fetch.offset + written + len(chunk)
+                            )
+                else:
+                    result = write(chunk)
+                write_seconds += time.perf_counter() - start
+                if result:
+                    counts.update(result)
+                written += len(chunk)
+                progress.update(written, fetch.progress())
+
+            self.record_feed(
+                run,
+                fetch.url,
+                fetch.statistics,
+                write_seconds,
+                counts,
+                skipped=fetch.unchanged,
+            )
+
+            if fetch.unchanged:
+                self.stdout.write(
+                    self.style.NOTICE(f"Skipping {fetch.url}, it did not change")
+                )
+                continue
+
+            self.write_summary(fetch.url, written, counts)
+
+            NVDFeed.objects.update_or_create(
+                url=fetch.url,
+                defaults=dict(
+                    etag=fetch.etag,
+                    last_modified=fetch.last_modified,
+                    sha256=fetch.sha256,
+                    checkpoint_version="",
+                    checkpoint_offset=0,
+                ),
+            )
+
+    def progress(self, url: str) -> ImportProgress:
+        def write(line: str):
+            if self.verbosity >= 1:
+                self.stdout.write(line)
+
+        return ImportProgress(write, url, interval=self.progress_interval)
+
+    def write_summary(self, url: str, records: int, counts: Counter):
+        """
+        Write a single line with the counts of a feed. The bulk loader only
+        counts once everything has been merged, its feeds have no counts.
+        """
+        if not counts:
+            self.stdout.write(f"Read {records} records from {url}")
+            return
+        self.stdout.write(
+            f"Read {records} records from {url}: "
+            f"{counts['issues_created']} issues created, "
+            f"{counts['issues_updated']} updated, "
+            f"{counts['issues_unchanged']} unchanged, "
+            f"{counts['references_created']} references created, "
+            f"{counts['references_deleted']} deleted"
+        )
+
+    def save_checkpoint(self, fetch: NVDFeedFetch, offset: int):
+        checkpoint = dict(checkpoint_version=fetch.version, checkpoint_offset=offset)
+        if not NVDFeed.objects.filter(url=fetch.url).update(**checkpoint):
+            NVDFeed.objects.create(url=fetch.url, **checkpoint)
+
+    def import_records(self, records: List[CVERecord]) -> Counter:
+        """
+        Write the given records and return the number of issues and
+        references that have been created, updated, left alone or deleted.
+        """
+        cves: Dict[str, CVERecord] = {record.identifier: record for record in records}
+
+        # all the issues that have been created or whose NVD record changed
+        issues, created = upsert_issues(cves.values())
+        counts = Counter(
+            issues_created=len(created),
+            issues_updated=len(issues) - len(created),
+            issues_unchanged=len(cves) - len(issues),
+        )
+        if not issues:
+            return counts
+
+        existing_references: Dict[int, Dict[str, int]] = defaultdict(dict)
+        for pk, issue_id, uri in IssueReference.objects.filter(
+            issue_id__in=issues.values()
+        ).values_list("pk", "issue_id", "uri"):
+            existing_references[issue_id][uri] = pk
+
+        references_to_remove: List[int] = []
+        references_to_create: List[IssueReference] = []
+
+        # writing a line per issue slows down large imports and floods the
+        # journal, it is only done when asked for
+        verbose = self.verbosity >= 2
 
-                references = set(cve["references"])
+        for identifier, issue_id in issues.items():
+            references = set(cves[identifier].references)
 
-                existing_uris = set(r.uri for r in issue.references.all())
+            existing_uris = existing_references[issue_id]
 
-                # the difference between the two sets, this yield missing and "exceeding" items
-                diff_uris = existing_uris ^ references
+            # filter the difference of both sets into missing and exceeding
+            # (to be removed) items
+            missing_uris = references - existing_uris.keys()
+            to_be_removed_uris = existing_uris.keys() - references
 
-                # filter the diff into missing and exceeding (to be removed) items
-                missing_uris = diff_uris & references
-                to_be_removed_uris = diff_uris & existing_uris
+            if verbose:
+                action = "Creating" if identifier in created else "Updating"
+                self.stdout.write(self.style.NOTICE(f"{action} issue {identifier}"))
 
-                if to_be_removed_uris:
+            if to_be_removed_uris:
+                if verbose:
                     self.stdout.write(
                         self.style.NOTICE(
-                            f"Removing {len(to_be_removed_uris)} references from issue {issue.identifier}"
+                            f"Removing {len(to_be_removed_uris)} references from issue {identifier}"
                         )
                     )
-                    IssueReference.objects.filter(
-                        issue=issue, uri__in=to_be_removed_uris
-                    ).delete()
+                references_to_remove += [
+                    existing_uris[uri] for uri in to_be_removed_uris
+                ]
 
-                if missing_uris:
+            if missing_uris:
+                if verbose:
                     self.stdout.write(
                         self.style.NOTICE(
-                            f"Creating {len(references)} references from issue {issue.identifier}"
+                            f"Creating {len(missing_uris)} references for issue {identifier}"
                         )
                     )
-                    IssueReference.objects.bulk_create(
-                        IssueReference(issue=issue, uri=uri) for uri in missing_uris
-                    )
+                references_to_create += [
+                    IssueReference(issue_id=issue_id, uri=uri) for uri in missing_uris
+                ]
+
+        if references_to_remove:
+            IssueReference.objects.filter(pk__in=references_to_remove).delete()
+
+        if references_to_create:
+            IssueReference.objects.bulk_create(references_to_create)
+
+        replace_weaknesses_and_cpe_matches(issues, cves)
+
+        counts.update(
+            references_created=len(references_to_create),
+            references_deleted=len(references_to_remove),
+        )
+        return counts
+
+
+def replace_weaknesses_and_cpe_matches(
+    issues: Dict[str, int], cves: Dict[str, CVERecord]
+):
+    """
+    Replace the weaknesses and CPE matches of the given issues with those of
+    their records. Unlike references they are never edited locally, so they
+    are simply deleted and created again.
+    """
+    IssueWeakness.objects.filter(issue_id__in=issues.values()).delete()
+    IssueCPEMatch.objects.filter(issue_id__in=issues.values()).delete()
+
+    weaknesses: List[IssueWeakness] = []
+    cpe_matches: List[IssueCPEMatch] = []
+    for identifier, issue_id in issues.items():
+        record = cves[identifier]
+        weaknesses += [IssueWeakness(issue_id=issue_id, cwe=cwe) for cwe in record.cwes]
+        for match in record.cpe_matches:
+            vendor, product = cpe_vendor_product(match.criteria)
+            cpe_matches.append(
+                IssueCPEMatch(
+                    issue_id=issue_id, vendor=vendor, product=product, **match._asdict()
+                )
+            )
+
+    if weaknesses:
+        IssueWeakness.objects.bulk_create(weaknesses)
+    if cpe_matches:
+        IssueCPEMatch.objects.bulk_create(cpe_matches)
+
 
+def parse_since(value: str) -> datetime.datetime:
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            date = parse_date(value)
+            if date is not None:
+                parsed = datetime.datetime.combine(date, datetime.time())
+    except ValueError:
+        parsed = None
 
-def gzip_decompress(input: BinaryIO) -> BinaryIO:
+    if parsed is None:
+        raise argparse.ArgumentTypeError(f"{value!r} is not a valid datetime")
+    return parsed
+
+
+def load_feed(fetch: NVDFeedFetch, chunk_size: int) -> Iterator[List[CVERecord]]:
+    return chunked(fetch.records(), chunk_size)
+
+
+def supports_returning(connection) -> bool:
     """
-    gzip_decompress takes an input byte stream and returns a stream of the
-    decompressed data.
+    Whether the database supports `RETURNING` on an `INSERT ... ON CONFLICT`
+    statement. SQLite only does so since version 3.35.
     """
-    return GzipFile(fileobj=input, mode="rb")
+    if connection.vendor == "sqlite":
+        return sqlite3.sqlite_version_info >= (3, 35, 0)
+    return True
+
+
+def upsert_issues(records: Iterable[CVERecord]) -> Tuple[Dict[str, int], Set[str]]:
+    """
+    Insert the issues for the given records or update the existing issues
+    whose NVD record changed since the last import using
+    `INSERT ... ON CONFLICT (identifier) DO UPDATE`.
+
+    Returns a mapping of identifiers to primary keys of all the issues that
+    have been inserted or updated and the identifiers of the inserted ones.
+    Issues with an unchanged digest are not touched and not part of the
+    result.
+    """
+    objs = [Issue(**issue_fields(record)) for record in records]
+    if not objs:
+        return {}, set()
+
+    connection = connections[router.db_for_write(Issue)]
+    qn = connection.ops.quote_name
+
+    fields = [field for field in Issue._meta.concrete_fields if not field.primary_key]
+    table = qn(Issue._meta.db_table)
+    columns = ", ".join(qn(field.column) for field in fields)
+    row = "(" + ", ".join(["%s"] * len(fields)) + ")"
+
+    def column(name: str) -> str:
+        return qn(Issue._meta.get_field(name).column)
+
+    # The description and scores follow the NVD, the published date is only
+    # filled in for issues that were created before it was imported.
+    updates = [
+        f"{column(name)} = EXCLUDED.{column(name)}" for name in NVD_UPDATED_FIELDS
+    ]
+    updates.append(
+        f"{column('published_date')} = COALESCE({table}.{column('published_date')}, EXCLUDED.{column('published_date')})"
+    )
+    # only the quoted table and column names are interpolated, all values are
+    # passed as parameters
+    conflict = (
+        f"ON CONFLICT ({column('identifier')}) DO UPDATE SET "  # nosec B608
+        + ", ".join(updates)
+        + f" WHERE {table}.{column('nvd_digest')} <> EXCLUDED.{column('nvd_digest')}"
+    )
+
+    returning = supports_returning(connection)
+    if returning:
+        # the primary keys are increasing, everything beyond the current
+        # maximum has been inserted by the upsert
+        max_pk = Issue.objects.aggregate(max_pk=Max("pk"))["max_pk"] or 0
+    else:
+        # without RETURNING the changed issues have to be determined upfront
+        existing = dict(
+            Issue.objects.filter(
+                identifier__in=[obj.identifier for obj in objs]
+            ).values_list("identifier", "nvd_digest")
+        )
+        changed = [
+            obj.identifier
+            for obj in objs
+            if existing.get(obj.identifier) != obj.nvd_digest
+        ]
+        created = {obj.identifier for obj in objs} - existing.keys()
+
+    issues: Dict[str, int] = {}
+    batch_size = max(connection.ops.bulk_batch_size(fields, objs), 1)
+    with transaction.atomic(using=connection.alias, savepoint=False):
+        with connection.cursor() as cursor:
+            for batch in chunked(objs, batch_size):
+                # quoted table and column names only, the values are parameters
+                sql = f"INSERT INTO {table} ({columns}) VALUES "  # nosec B608
+                sql += ", ".join([row] * len(batch))
+                sql += " " + conflict
+                if returning:
+                    sql += f" RETURNING {column('id')}, {column('identifier')}"
+
+                params = [
+                    field.get_db_prep_save(field.pre_save(obj, True), connection)
+                    for obj in batch
+                    for field in fields
+                ]
+                cursor.execute(sql, params)
+
+                if returning:
+                    issues.update(
+                        (identifier, pk) for pk, identifier in cursor.fetchall()
+                    )
+
+    if returning:
+        created = {identifier for identifier, pk in issues.items() if pk > max_pk}
+    elif changed:
+        issues = dict(
+            Issue.objects.filter(identifier__in=changed).values_list("identifier", "pk")
+        )
+
+    return issues, created
@@ -0,0 +1,75 @@
+from typing import Dict, List, Sequence, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from tracker.models import Package
+from tracker.nixpkgs import PackageRecord, read_packages
+
+BATCH_SIZE = 1000
+
+UPDATED_FIELDS = ("pname", "version", "description")
+
+
+class Command(BaseCommand):
+    help = "Import the packages of a nixpkgs package listing (packages.json)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            type=str,
+            help="Path of the listing, optionally gzip compressed",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            records = list(read_packages(options["path"]))
+        except FileNotFoundError:
+            raise CommandError(f"{options['path']} does not exist")
+
+        created, updated = upsert_packages(records)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Read {len(records)} packages: {created} created, {updated} updated"
+            )
+        )
+
+
+def upsert_packages(
+    records: List[PackageRecord], updated_fields: Sequence[str] = UPDATED_FIELDS
+) -> Tuple[int, int]:
+    """
+    Create the packages that are not known yet and update the ones whose
+    name, version or description (or only the given fields) changed. Returns
+    the number of created and updated packages.
+    """
+    existing: Dict[str, Package] = {
+        package.attribute: package
+        for package in Package.objects.only("id", "attribute", *updated_fields)
+    }
+
+    to_create: List[Package] = []
+    to_update: List[Package] = []
+    for record in records:
+        package = existing.get(record.attribute)
+        if package is None:
+            to_create.append(Package(**record._asdict()))
+            continue
+
+        changed = False
+        for field in updated_fields:
+            value = getattr(record, field)
+            if getattr(package, field) != value:
+                setattr(package, field, value)
+                changed = True
+        if changed:
+            to_update.append(package)
+
+    with transaction.atomic():
+        Package.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        if to_update:
+            Package.objects.bulk_update(
+                to_update, updated_fields, batch_size=BATCH_SIZE
+            )
+
+    return len(to_create), len(to_update)
@@ -0,0 +1,95 @@
+import time
+from typing import Dict, List, Sequence, Set, Tuple
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tracker.models import (
+    Issue,
+    IssueCPEMatch,
+    IssuePackageCandidate,
+    Package,
+    PackageMatchReason,
+)
+from tracker.nixpkgs.evaluation import evaluate_issues
+from tracker.nixpkgs.matching import PackageIndex
+from tracker.utils import chunked
+
+# number of issues whose candidates are determined at once
+DEFAULT_CHUNK_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = "Match all issues against the nixpkgs packages and store the candidates"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Number of issues that are matched at once",
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        index = PackageIndex.build(
+            Package.objects.values_list("id", "attribute", "pname").iterator()
+        )
+
+        issue_ids = list(Issue.objects.order_by("pk").values_list("pk", flat=True))
+
+        created = 0
+        with transaction.atomic():
+            IssuePackageCandidate.objects.all().delete()
+            for chunk in chunked(issue_ids, options["chunk_size"]):
+                candidates = match_issues(index, chunk)
+                IssuePackageCandidate.objects.bulk_create(candidates)
+                created += len(candidates)
+                evaluate_issues(index, chunk)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Matched {len(issue_ids)} issues to {created} package candidates "
+                f"in {time.monotonic() - start:.1f}s"
+            )
+        )
+
+
+def match_issues(
+    index: PackageIndex, issue_ids: Sequence[int]
+) -> List[IssuePackageCandidate]:
+    """
+    Determine the package candidates of the issues with the given (sorted)
+    primary keys. Issues are matched by the products of their vulnerable CPE
+    matches. Only issues without any (e.g. because the NVD did not analyze
+    them yet) are matched by the words of their description.
+    """
+    if not issue_ids:
+        return []
+    # a range rather than a list of ids keeps the number of query parameters
+    # constant
+    in_range = dict(issue_id__gte=issue_ids[0], issue_id__lte=issue_ids[-1])
+
+    candidates: Dict[Tuple[int, int], str] = {}
+    with_cpe: Set[int] = set()
+    for issue_id, vendor, product in IssueCPEMatch.objects.filter(
+        vulnerable=True, **in_range
+    ).values_list("issue_id", "vendor", "product"):
+        with_cpe.add(issue_id)
+        for package_id in index.match_cpe(vendor, product):
+            candidates[(issue_id, package_id)] = PackageMatchReason.CPE
+
+    for issue_id, description in (
+        Issue.objects.filter(pk__gte=issue_ids[0], pk__lte=issue_ids[-1])
+        .order_by()
+        .values_list("pk", "description")
+    ):
+        if issue_id in with_cpe:
+            continue
+        for package_id in index.match_description(description):
+            candidates.setdefault((issue_id, package_id), PackageMatchReason.KEYWORD)
+
+    return [
+        IssuePackageCandidate(issue_id=issue_id, package_id=package_id, reason=reason)
+        for (issue_id, package_id), reason in candidates.items()
+    ]
@@ -1,11 +1,127 @@
+import multiprocessing
+from typing import Iterable, List, Tuple
+
 from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Max
+
+from tracker.github_events import (
+    SUPPORTED_KINDS,
+    search_for_cve_references,
+    store_references,
+)
+from tracker.models import GitHubEvent, GitHubEventReference, GitHubEventScan
+
+# the name the progress of this command is stored under
+SCAN_NAME = "cve_references"
+
+# number of consecutive event ids that are scanned at once
+DEFAULT_SHARD_SIZE = 1000
 
-from tracker.github_events import search_for_cve_references
+# an event id, its description and the CVE identifiers it mentions
+Mention = Tuple[int, str, List[str]]
 
 
 class Command(BaseCommand):
-    help = "Search the database for CVE references in the received GitHub events"
+    help = (
+        "Search the GitHub events received since the last run for CVE "
+        "references and link the events to the CVEs they mention"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help=(
+                "Scan all events rather than only those received since the last "
+                "run and replace their links, e.g. after the rules changed"
+            ),
+        )
+        parser.add_argument(
+            "--shard-size",
+            type=int,
+            default=DEFAULT_SHARD_SIZE,
+            help="Number of consecutive event ids that are scanned at once",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of processes that scan shards of the events concurrently",
+        )
 
     def handle(self, *args, **options):
-        for (event, cves) in search_for_cve_references():
-            self.stdout.write(f"{event} - {cves}")
+        scan, _ = GitHubEventScan.objects.get_or_create(name=SCAN_NAME)
+        last = 0 if options["full"] else scan.last_event_id
+        # events that arrive while scanning are left for the next run
+        end = GitHubEvent.objects.aggregate(end=Max("pk"))["end"] or 0
+
+        shards = id_shards(last, end, options["shard_size"])
+        scanned = mentions = 0
+        for (shard_start, shard_end), (count, results) in zip(
+            shards, scan_shards(shards, options["workers"])
+        ):
+            for _, description, cves in results:
+                self.stdout.write(f"{description} - {set(cves)}")
+            with transaction.atomic():
+                if options["full"]:
+                    # links the current rules do not find anymore are removed
+                    GitHubEventReference.objects.filter(
+                        event_id__gt=shard_start, event_id__lte=shard_end
+                    ).delete()
+                mentions += store_references(
+                    (event_id, cves) for event_id, _, cves in results
+                )
+                scan.last_event_id = shard_end
+                scan.save()
+            scanned += count
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Scanned {scanned} events up to {end}: {mentions} CVE mentions"
+            )
+        )
+
+
+def id_shards(last: int, end: int, size: int) -> List[Tuple[int, int]]:
+    """
+    Split the ids after `last` up to and including `end` into consecutive
+    (exclusive start, inclusive end) ranges of at most `size` ids.
+    """
+    return [(start, min(start + size, end)) for start in range(last, end, size)]
+
+
+def scan_shard(shard: Tuple[int, int]) -> Tuple[int, List[Mention]]:
+    """
+    Search the events of a shard for CVE identifiers. Returns the number of
+    events that have been searched and their mentions.
+    """
+    start, end = shard
+    events = list(
+        GitHubEvent.objects.filter(
+            pk__gt=start, pk__lte=end, kind__in=SUPPORTED_KINDS
+        ).order_by("pk")
+    )
+    return len(events), [
+        (event.pk, str(event), sorted(identifiers))
+        for event, identifiers in search_for_cve_references(events)
+    ]
+
+
+def scan_shards(
+    shards: List[Tuple[int, int]], workers: int
+) -> Iterable[Tuple[int, List[Mention]]]:
+    """
+    Scan the shards in order, with more than one worker in a pool of
+    processes. Decoding the JSON of the events is CPU bound, the processes
+    are not limited by the GIL.
+    """
+    if workers <= 1:
+        yield from map(scan_shard, shards)
+        return
+
+    # The worker processes must open connections of their own rather than
+    # sharing the ones inherited from this process.
+    connections.close_all()
+    with multiprocessing.get_context().Pool(workers) as pool:
+        yield from pool.imap(scan_shard, shards)
@@ -0,0 +1,66 @@
+# Generated by Django 3.1.3 on 2026-10-17 16:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracker", "0010_issue_order"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NVDFeed",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "url",
+                    models.CharField(
+                        help_text="URL the feed has been downloaded from",
+                        max_length=255,
+                        unique=True,
+                    ),
+                ),
+                (
+                    "etag",
+                    models.CharField(
+                        blank=True,
+                        help_text="Content of the ETag HTTP header",
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "last_modified",
+                    models.CharField(
+                        blank=True,
+                        help_text="Content of the Last-Modified HTTP header",
+                        max_length=64,
+                    ),
+                ),
+                (
+                    "sha256",
+                    models.CharField(
+                        blank=True,
+                        help_text="SHA256 checksum of the decompressed feed",
+                        max_length=64,
+                    ),
+                ),
+                (
+                    "imported_at",
+                    models.DateTimeField(
+                        auto_now=True,
+                        help_text="Datetime of the last successful import",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.1.3 on 2026-10-17 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracker", "0011_nvdfeed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="issue",
+            name="nvd_digest",
+            field=models.CharField(
+                blank=True,
+                help_text="Digest of the NVD record this issue has last been imported from",
+                max_length=64,
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.1.3 on 2026-10-17 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracker", "0012_issue_nvd_digest"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="nvdfeed",
+            name="checkpoint_offset",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Number of records of the unfinished import that have been written",
+            ),
+        ),
+        migrations.AddField(
+            model_name="nvdfeed",
+            name="checkpoint_version",
+            field=models.CharField(
+                blank=True,
+                help_text="Checksum (or ETag) of the feed of an unfinished import",
+                max_length=255,
+            ),
+        ),
+    ]
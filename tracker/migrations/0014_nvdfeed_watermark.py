@@ -0,0 +1,22 @@
+# Generated by Django 3.1.3 on 2026-10-17 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracker", "0013_nvdfeed_checkpoint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="nvdfeed",
+            name="watermark",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="CVEs modified before this datetime have been imported from the CVE API",
+                null=True,
+            ),
+        ),
+    ]
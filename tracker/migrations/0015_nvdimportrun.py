@@ -0,0 +1,209 @@
+# Generated by Django 3.1.3 on 2026-10-17 18:30
+
+import datetime
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracker", "0014_nvdfeed_watermark"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NVDImportRun",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "issues_created",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of issues that have been created"
+                    ),
+                ),
+                (
+                    "issues_updated",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of issues whose NVD record changed"
+                    ),
+                ),
+                (
+                    "issues_unchanged",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Number of issues whose NVD record did not change",
+                    ),
+                ),
+                (
+                    "references_created",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Number of references that have been added to issues",
+                    ),
+                ),
+                (
+                    "references_deleted",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Number of references that have been removed from issues",
+                    ),
+                ),
+                (
+                    "mode",
+                    models.CharField(
+                        choices=[
+                            ("FEEDS", "feeds"),
+                            ("BULK_LOAD", "bulk load"),
+                            ("API", "CVE API"),
+                        ],
+                        default="FEEDS",
+                        help_text="Where the CVEs have been imported from and how",
+                        max_length=9,
+                    ),
+                ),
+                (
+                    "started_at",
+                    models.DateTimeField(
+                        db_index=True,
+                        default=django.utils.timezone.now,
+                        help_text="Datetime the run started",
+                    ),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="Datetime the run finished or failed",
+                        null=True,
+                    ),
+                ),
+                (
+                    "succeeded",
+                    models.BooleanField(
+                        default=False,
+                        help_text="Whether the run finished without an error",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("-started_at",),
+            },
+        ),
+        migrations.CreateModel(
+            name="NVDImportRunFeed",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "issues_created",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of issues that have been created"
+                    ),
+                ),
+                (
+                    "issues_updated",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of issues whose NVD record changed"
+                    ),
+                ),
+                (
+                    "issues_unchanged",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Number of issues whose NVD record did not change",
+                    ),
+                ),
+                (
+                    "references_created",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Number of references that have been added to issues",
+                    ),
+                ),
+                (
+                    "references_deleted",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Number of references that have been removed from issues",
+                    ),
+                ),
+                (
+                    "url",
+                    models.CharField(
+                        help_text="URL the feed has been imported from", max_length=255
+                    ),
+                ),
+                (
+                    "skipped",
+                    models.BooleanField(
+                        default=False,
+                        help_text="Whether the feed did not change since the last run",
+                    ),
+                ),
+                (
+                    "downloaded_bytes",
+                    models.PositiveBigIntegerField(
+                        default=0,
+                        help_text="Size of the (compressed) data read from the network or the disk",
+                    ),
+                ),
+                (
+                    "download_duration",
+                    models.DurationField(
+                        default=datetime.timedelta,
+                        help_text="Time spent downloading or reading",
+                    ),
+                ),
+                (
+                    "decompress_duration",
+                    models.DurationField(
+                        default=datetime.timedelta, help_text="Time spent decompressing"
+                    ),
+                ),
+                (
+                    "parse_duration",
+                    models.DurationField(
+                        default=datetime.timedelta,
+                        help_text="Time spent decoding the JSON and normalizing the records",
+                    ),
+                ),
+                (
+                    "write_duration",
+                    models.DurationField(
+                        default=datetime.timedelta,
+                        help_text="Time spent writing to the database",
+                    ),
+                ),
+                (
+                    "run",
+                    models.ForeignKey(
+                        help_text="Run the feed has been imported in",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feeds",
+                        to="tracker.nvdimportrun",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
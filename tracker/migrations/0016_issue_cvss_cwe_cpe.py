@@ -0,0 +1,148 @@
+# Generated by Django 3.1.3 on 2026-10-17 19:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracker", "0015_nvdimportrun"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="issue",
+            name="cvss2_base_score",
+            field=models.DecimalField(
+                blank=True,
+                db_index=True,
+                decimal_places=1,
+                help_text="CVSS v2 base score according to the NVD",
+                max_digits=3,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="issue",
+            name="cvss2_vector",
+            field=models.CharField(
+                blank=True,
+                help_text="CVSS v2 vector according to the NVD",
+                max_length=64,
+            ),
+        ),
+        migrations.AddField(
+            model_name="issue",
+            name="cvss3_base_score",
+            field=models.DecimalField(
+                blank=True,
+                db_index=True,
+                decimal_places=1,
+                help_text="CVSS v3 base score according to the NVD",
+                max_digits=3,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="issue",
+            name="cvss3_vector",
+            field=models.CharField(
+                blank=True,
+                help_text="CVSS v3 vector according to the NVD",
+                max_length=64,
+            ),
+        ),
+        migrations.CreateModel(
+            name="IssueWeakness",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "cwe",
+                    models.CharField(
+                        db_index=True,
+                        help_text="CWE identifier (e.g. CWE-79 or NVD-CWE-Other)",
+                        max_length=32,
+                    ),
+                ),
+                (
+                    "issue",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="weaknesses",
+                        to="tracker.issue",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="IssueCPEMatch",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("criteria", models.TextField(help_text="CPE 2.3 match string")),
+                (
+                    "vendor",
+                    models.CharField(
+                        blank=True,
+                        help_text="Vendor part of the match string",
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "product",
+                    models.CharField(
+                        blank=True,
+                        help_text="Product part of the match string",
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "vulnerable",
+                    models.BooleanField(
+                        default=True,
+                        help_text="Whether the match describes vulnerable software rather than the platform",
+                    ),
+                ),
+                (
+                    "version_start_including",
+                    models.CharField(blank=True, max_length=128),
+                ),
+                (
+                    "version_start_excluding",
+                    models.CharField(blank=True, max_length=128),
+                ),
+                ("version_end_including", models.CharField(blank=True, max_length=128)),
+                ("version_end_excluding", models.CharField(blank=True, max_length=128)),
+                (
+                    "issue",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cpe_matches",
+                        to="tracker.issue",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="issuecpematch",
+            index=models.Index(
+                fields=["vendor", "product"], name="tracker_iss_vendor_5af97a_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 3.1.3 on 2026-10-17 19:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracker", "0016_issue_cvss_cwe_cpe"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Package",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "attribute",
+                    models.CharField(
+                        help_text="Attribute path of the package (e.g. thunderbird-bin)",
+                        max_length=255,
+                        unique=True,
+                    ),
+                ),
+                (
+                    "pname",
+                    models.CharField(
+                        db_index=True,
+                        help_text="Name of the package without version",
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "version",
+                    models.CharField(
+                        blank=True,
+                        help_text="Version of the package last seen",
+                        max_length=128,
+                    ),
+                ),
+                ("description", models.TextField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="IssuePackageCandidate",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[
+                            ("CPE", "CPE product"),
+                            ("KEYWORD", "description keyword"),
+                        ],
+                        help_text="What the package has been matched by",
+                        max_length=7,
+                    ),
+                ),
+                (
+                    "issue",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="package_candidates",
+                        to="tracker.issue",
+                    ),
+                ),
+                (
+                    "package",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="issue_candidates",
+                        to="tracker.package",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="issuepackagecandidate",
+            constraint=models.UniqueConstraint(
+                fields=("issue", "package"), name="unique_issue_package_candidate"
+            ),
+        ),
+    ]
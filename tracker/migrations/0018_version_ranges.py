@@ -0,0 +1,37 @@
+# Generated by Django 3.1.3 on 2026-10-17 20:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracker", "0017_package"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="issue",
+            name="suggested_status",
+            field=models.CharField(
+                choices=[
+                    ("UNKNOWN", "unknown"),
+                    ("AFFECTED", "affected"),
+                    ("NOTAFFECTED", "notaffected"),
+                    ("NOTFORUS", "notforus"),
+                    ("WONTFIX", "wontfix"),
+                ],
+                default="UNKNOWN",
+                help_text="The status suggested by the versions of the package candidates",
+                max_length=11,
+            ),
+        ),
+        migrations.AddField(
+            model_name="issuepackagecandidate",
+            name="affected",
+            field=models.BooleanField(
+                help_text="Whether the package version is within the vulnerable version ranges of the issue, unknown if there are none",
+                null=True,
+            ),
+        ),
+    ]
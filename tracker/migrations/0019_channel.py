@@ -0,0 +1,216 @@
+# Generated by Django 3.1.3 on 2026-10-17 21:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracker", "0018_version_ranges"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Channel",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        help_text="Name of the channel (e.g. nixos-20.09)",
+                        max_length=64,
+                        unique=True,
+                    ),
+                ),
+                (
+                    "revision",
+                    models.CharField(
+                        blank=True,
+                        help_text="Revision the packages of the channel have last been imported from",
+                        max_length=64,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ChannelPackage",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.CharField(blank=True, max_length=128)),
+                (
+                    "channel",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="packages",
+                        to="tracker.channel",
+                    ),
+                ),
+                (
+                    "package",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="channels",
+                        to="tracker.package",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="IssueChannelPackage",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "affected",
+                    models.BooleanField(
+                        help_text="Whether the version in the channel is within the vulnerable version ranges of the issue, unknown if there are none",
+                        null=True,
+                    ),
+                ),
+                (
+                    "candidate",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="channels",
+                        to="tracker.issuepackagecandidate",
+                    ),
+                ),
+                (
+                    "channel_package",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="issue_candidates",
+                        to="tracker.channelpackage",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ChannelRevision",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "revision",
+                    models.CharField(
+                        blank=True,
+                        help_text="Revision of the channel (git commit)",
+                        max_length=64,
+                    ),
+                ),
+                (
+                    "imported_at",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="Datetime the revision has been imported",
+                    ),
+                ),
+                (
+                    "package_count",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Number of packages in the revision"
+                    ),
+                ),
+                (
+                    "channel",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="revisions",
+                        to="tracker.channel",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("-imported_at",),
+            },
+        ),
+        migrations.CreateModel(
+            name="ChannelPackageChange",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "old_version",
+                    models.CharField(
+                        help_text="Version in the previous revision, null if the package is new",
+                        max_length=128,
+                        null=True,
+                    ),
+                ),
+                (
+                    "new_version",
+                    models.CharField(
+                        help_text="Version in this revision, null if the package has been removed",
+                        max_length=128,
+                        null=True,
+                    ),
+                ),
+                (
+                    "package",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="tracker.package",
+                    ),
+                ),
+                (
+                    "revision",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="changes",
+                        to="tracker.channelrevision",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="issuechannelpackage",
+            constraint=models.UniqueConstraint(
+                fields=("candidate", "channel_package"),
+                name="unique_issue_channel_package",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="channelpackage",
+            constraint=models.UniqueConstraint(
+                fields=("channel", "package"), name="unique_channel_package"
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.1.3 on 2026-10-17 21:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracker", "0019_channel"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="githubevent",
+            name="delivery",
+            field=models.CharField(
+                blank=True,
+                help_text="Content of the X-GitHub-Delivery HTTP header",
+                max_length=64,
+                null=True,
+                unique=True,
+            ),
+        ),
+    ]
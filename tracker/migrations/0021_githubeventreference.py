@@ -0,0 +1,53 @@
+# Generated by Django 3.1.3 on 2026-10-17 22:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracker", "0020_githubevent_delivery"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GitHubEventReference",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cve_references",
+                        to="tracker.githubevent",
+                    ),
+                ),
+                (
+                    "issue",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        help_text="The mentioned issue",
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="github_event_references",
+                        to="tracker.issue",
+                        to_field="identifier",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="githubeventreference",
+            constraint=models.UniqueConstraint(
+                fields=("event", "issue"), name="unique_github_event_reference"
+            ),
+        ),
+    ]
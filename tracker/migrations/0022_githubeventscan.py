@@ -0,0 +1,49 @@
+# Generated by Django 3.1.3 on 2026-10-17 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracker", "0021_githubeventreference"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GitHubEventScan",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        help_text="Name of the scan (e.g. cve_references)",
+                        max_length=64,
+                        unique=True,
+                    ),
+                ),
+                (
+                    "last_event_id",
+                    models.PositiveBigIntegerField(
+                        default=0,
+                        help_text="Primary key of the last event that has been scanned",
+                    ),
+                ),
+                (
+                    "scanned_at",
+                    models.DateTimeField(
+                        auto_now=True,
+                        help_text="Datetime of the last progress of the scan",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 3.1.3 on 2026-10-17 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracker", "0022_githubeventscan"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="githubevent",
+            name="body",
+            field=models.TextField(
+                blank=True, help_text="Body of the comment or pull request"
+            ),
+        ),
+        migrations.AddField(
+            model_name="githubevent",
+            name="number",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Number of the issue or pull request the event belongs to",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="githubevent",
+            name="payload",
+            field=models.BinaryField(
+                blank=True,
+                help_text="The RAW event data as gzip compressed JSON, for compact events",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="githubevent",
+            name="title",
+            field=models.TextField(
+                blank=True, help_text="Title of the issue or pull request"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="githubevent",
+            name="data",
+            field=models.JSONField(
+                blank=True,
+                help_text="The RAW event data as received from GitHub, null for compact events",
+                null=True,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="githubevent",
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    ("data__isnull", False), ("payload__isnull", False), _connector="OR"
+                ),
+                name="githubevent_data_or_payload",
+            ),
+        ),
+    ]
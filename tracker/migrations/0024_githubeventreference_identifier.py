@@ -0,0 +1,51 @@
+# Generated by Django 3.1.3 on 2026-10-17 23:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracker", "0023_githubevent_compact"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="githubeventreference",
+            name="unique_github_event_reference",
+        ),
+        migrations.RenameField(
+            model_name="githubeventreference",
+            old_name="issue",
+            new_name="identifier",
+        ),
+        migrations.AlterField(
+            model_name="githubeventreference",
+            name="identifier",
+            field=models.ForeignKey(
+                db_column="identifier",
+                db_constraint=False,
+                help_text="The mentioned identifier, an issue once it has been imported",
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="github_event_references",
+                to="tracker.issue",
+                to_field="identifier",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="githubeventreference",
+            name="event",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="references",
+                to="tracker.githubevent",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="githubeventreference",
+            constraint=models.UniqueConstraint(
+                fields=("event", "identifier"), name="unique_github_event_reference"
+            ),
+        ),
+    ]
@@ -1,4 +1,8 @@
-from typing import List
+import datetime
+import gzip
+import json
+from decimal import Decimal
+from typing import Any, Dict, List, Mapping, Optional
 
 from django.db import models
 from django.urls import reverse
@@ -8,9 +12,27 @@ from django.utils.translation import gettext_lazy as _
 from .exceptions import GitHubEventBodyNotSupported
 
 
+def compress_payload(data: Any) -> bytes:
+    return gzip.compress(json.dumps(data, separators=(",", ":")).encode())
+
+
+def decompress_payload(payload: bytes) -> Any:
+    return json.loads(gzip.decompress(payload))
+
+
+class GitHubEventManager(models.Manager):
+    def get_queryset(self):
+        # the compressed payload is only loaded when it is accessed
+        return super().get_queryset().defer("payload")
+
+
 class GitHubEvent(models.Model):
     """
     GitHub events as they happen within Nixpkgs
+
+    The number, title and body of comments and pull requests are extracted
+    when an event is received. The raw data is either kept as JSON in `data`
+    or, for compact events, only compressed in `payload`.
     """
 
     received_at = models.DateTimeField(
@@ -22,10 +44,90 @@ class GitHubEvent(models.Model):
         null=False,
         help_text="Content of the X-GitHub-Event HTTP header",
     )
+    delivery = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text="Content of the X-GitHub-Delivery HTTP header",
+    )
+    number = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Number of the issue or pull request the event belongs to",
+    )
+    title = models.TextField(blank=True, help_text="Title of the issue or pull request")
+    body = models.TextField(blank=True, help_text="Body of the comment or pull request")
     data = models.JSONField(
-        blank=False, null=False, help_text="The RAW event data as received from GitHub"
+        blank=True,
+        null=True,
+        help_text="The RAW event data as received from GitHub, null for compact events",
+    )
+    payload = models.BinaryField(
+        null=True,
+        blank=True,
+        help_text="The RAW event data as gzip compressed JSON, for compact events",
     )
 
+    objects = GitHubEventManager()
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(data__isnull=False) | models.Q(payload__isnull=False),
+                name="githubevent_data_or_payload",
+            )
+        ]
+
+    @classmethod
+    def from_delivery(
+        cls,
+        kind: str,
+        data: Any,
+        delivery: Optional[str] = None,
+        compact: bool = False,
+    ) -> "GitHubEvent":
+        """
+        Create (but do not save) the event of a received delivery.
+        """
+        event = cls(kind=kind, delivery=delivery, **cls.extract_fields(kind, data))
+        if compact:
+            event.payload = compress_payload(data)
+        else:
+            event.data = data
+        return event
+
+    @staticmethod
+    def extract_fields(kind: str, data: Any) -> Dict[str, Any]:
+        """
+        The number, title and body of comments and pull requests.
+        """
+        try:
+            if kind == "issue_comment":
+                return dict(
+                    number=data["issue"]["number"],
+                    title=data["issue"]["title"] or "",
+                    body=data["comment"]["body"] or "",
+                )
+            elif kind == "pull_request":
+                return dict(
+                    number=data["pull_request"]["number"],
+                    title=data["pull_request"]["title"] or "",
+                    body=data["pull_request"]["body"] or "",
+                )
+        except (KeyError, TypeError):
+            pass
+        return {}
+
+    @property
+    def raw_data(self) -> Any:
+        """
+        The data as received from GitHub, decompressed for compact events.
+        """
+        if self.data is None and self.payload is not None:
+            return decompress_payload(self.payload)
+        return self.data
+
     @property
     def text(self) -> List[str]:
         """
@@ -34,28 +136,189 @@ class GitHubEvent(models.Model):
         to deal with this kind.
         """
 
-        if self.kind == "issue_comment":
-            return [self.data["comment"]["body"]]
+        if self.number is None:
+            # events received before the fields were extracted, or whose
+            # fields could not be extracted, only have their raw data
+            data = self.raw_data
+            if self.kind == "issue_comment":
+                return [data["comment"]["body"]]
+            elif self.kind == "pull_request":
+                return [data["pull_request"]["body"], data["pull_request"]["title"]]
+        elif self.kind == "issue_comment":
+            return [self.body]
         elif self.kind == "pull_request":
-            return [
-                self.data["pull_request"]["body"],
-                self.data["pull_request"]["title"],
-            ]
+            return [self.body, self.title]
 
         raise GitHubEventBodyNotSupported(
             f"`body` attribute not supported for event kind {self.kind}"
         )
 
     def __str__(self):
-        gh_number = "N/A"
-        if self.kind == "issue_comment":
-            gh_number = self.data["issue"]["number"]
-        elif self.kind == "pull_request":
-            gh_number = self.data["pull_request"]["number"]
+        gh_number = self.number
+        if gh_number is None:
+            gh_number = self.extract_fields(self.kind, self.raw_data).get(
+                "number", "N/A"
+            )
 
         return f"<GitHubEvent(id={self.pk}, gh_id={gh_number}, kind={self.kind}, received_at={self.received_at})>"
 
 
+class NVDFeed(models.Model):
+    """
+    Metadata of the NVD feeds (and the CVE API) as seen during their last
+    successful import
+    """
+
+    url = models.CharField(
+        max_length=255,
+        unique=True,
+        blank=False,
+        help_text="URL the feed has been downloaded from",
+    )
+    etag = models.CharField(
+        max_length=255, blank=True, help_text="Content of the ETag HTTP header"
+    )
+    last_modified = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="Content of the Last-Modified HTTP header",
+    )
+    sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="SHA256 checksum of the decompressed feed",
+    )
+    imported_at = models.DateTimeField(
+        auto_now=True, help_text="Datetime of the last successful import"
+    )
+    checkpoint_version = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Checksum (or ETag) of the feed of an unfinished import",
+    )
+    checkpoint_offset = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of records of the unfinished import that have been written",
+    )
+    watermark = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="CVEs modified before this datetime have been imported from the CVE API",
+    )
+
+    def __str__(self):
+        return self.url
+
+
+class NVDImportMode(models.TextChoices):
+    FEEDS = "FEEDS", _("feeds")
+    BULK_LOAD = "BULK_LOAD", _("bulk load")
+    API = "API", _("CVE API")
+
+
+class NVDImportCounters(models.Model):
+    """
+    Number of rows that have been created, updated or left alone by an import
+    """
+
+    issues_created = models.PositiveIntegerField(
+        default=0, help_text="Number of issues that have been created"
+    )
+    issues_updated = models.PositiveIntegerField(
+        default=0, help_text="Number of issues whose NVD record changed"
+    )
+    issues_unchanged = models.PositiveIntegerField(
+        default=0, help_text="Number of issues whose NVD record did not change"
+    )
+    references_created = models.PositiveIntegerField(
+        default=0, help_text="Number of references that have been added to issues"
+    )
+    references_deleted = models.PositiveIntegerField(
+        default=0, help_text="Number of references that have been removed from issues"
+    )
+
+    class Meta:
+        abstract = True
+
+    def add_counts(self, counts: Mapping[str, int]):
+        for name, value in counts.items():
+            setattr(self, name, getattr(self, name) + value)
+
+
+class NVDImportRun(NVDImportCounters):
+    """
+    A single run of the NVD import. The counters are summed up over all of
+    its feeds.
+    """
+
+    mode = models.CharField(
+        choices=NVDImportMode.choices,
+        default=NVDImportMode.FEEDS,
+        max_length=max(len(x[0]) for x in NVDImportMode.choices),
+        help_text="Where the CVEs have been imported from and how",
+    )
+    started_at = models.DateTimeField(
+        default=timezone.now, db_index=True, help_text="Datetime the run started"
+    )
+    finished_at = models.DateTimeField(
+        null=True, blank=True, help_text="Datetime the run finished or failed"
+    )
+    succeeded = models.BooleanField(
+        default=False, help_text="Whether the run finished without an error"
+    )
+
+    class Meta:
+        ordering = ("-started_at",)
+
+    @property
+    def duration(self) -> Optional[datetime.timedelta]:
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def __str__(self):
+        return f"{self.mode} import started at {self.started_at}"
+
+
+class NVDImportRunFeed(NVDImportCounters):
+    """
+    Statistics of a single feed (or the CVE API) within an import run
+    """
+
+    run = models.ForeignKey(
+        NVDImportRun,
+        on_delete=models.CASCADE,
+        related_name="feeds",
+        help_text="Run the feed has been imported in",
+    )
+    url = models.CharField(
+        max_length=255, help_text="URL the feed has been imported from"
+    )
+    skipped = models.BooleanField(
+        default=False, help_text="Whether the feed did not change since the last run"
+    )
+    downloaded_bytes = models.PositiveBigIntegerField(
+        default=0,
+        help_text="Size of the (compressed) data read from the network or the disk",
+    )
+    download_duration = models.DurationField(
+        default=datetime.timedelta, help_text="Time spent downloading or reading"
+    )
+    decompress_duration = models.DurationField(
+        default=datetime.timedelta, help_text="Time spent decompressing"
+    )
+    parse_duration = models.DurationField(
+        default=datetime.timedelta,
+        help_text="Time spent decoding the JSON and normalizing the records",
+    )
+    write_duration = models.DurationField(
+        default=datetime.timedelta, help_text="Time spent writing to the database"
+    )
+
+    def __str__(self):
+        return self.url
+
+
 class IssueReference(models.Model):
     """
     Additional references for issues
@@ -108,14 +371,317 @@ class Issue(models.Model):
         null=True,  # allow this to be Null while we migrate the database
         help_text="The date and time when the issue was first published",
     )
+    nvd_digest = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="Digest of the NVD record this issue has last been imported from",
+    )
+    cvss3_base_score = models.DecimalField(
+        max_digits=3,
+        decimal_places=1,
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="CVSS v3 base score according to the NVD",
+    )
+    cvss3_vector = models.CharField(
+        max_length=64, blank=True, help_text="CVSS v3 vector according to the NVD"
+    )
+    cvss2_base_score = models.DecimalField(
+        max_digits=3,
+        decimal_places=1,
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="CVSS v2 base score according to the NVD",
+    )
+    cvss2_vector = models.CharField(
+        max_length=64, blank=True, help_text="CVSS v2 vector according to the NVD"
+    )
+    suggested_status = models.CharField(
+        choices=IssueStatus.choices,
+        default=IssueStatus.UNKNOWN,
+        max_length=max(len(x[0]) for x in IssueStatus.choices),
+        help_text="The status suggested by the versions of the package candidates",
+    )
 
     def get_absolute_url(self):
         return reverse("issue_detail", kwargs={"identifier": self.identifier})
 
+    @property
+    def cvss_base_score(self) -> Optional[Decimal]:
+        """
+        The CVSS v3 base score, or the v2 one for issues that predate v3
+        """
+        if self.cvss3_base_score is not None:
+            return self.cvss3_base_score
+        return self.cvss2_base_score
+
     class Meta:
         ordering = ("-published_date",)
 
 
+class GitHubEventScan(models.Model):
+    """
+    How far a recurring scan over the received GitHubEvents has progressed
+    """
+
+    name = models.CharField(
+        max_length=64, unique=True, help_text="Name of the scan (e.g. cve_references)"
+    )
+    last_event_id = models.PositiveBigIntegerField(
+        default=0, help_text="Primary key of the last event that has been scanned"
+    )
+    scanned_at = models.DateTimeField(
+        auto_now=True, help_text="Datetime of the last progress of the scan"
+    )
+
+    def __str__(self):
+        return self.name
+
+
+class GitHubEventReference(models.Model):
+    """
+    A CVE (or GHSA or OSV) identifier that is mentioned in a GitHubEvent
+    """
+
+    event = models.ForeignKey(
+        GitHubEvent, on_delete=models.CASCADE, related_name="references"
+    )
+    # Events mention identifiers that are not (yet) imported as issues, e.g.
+    # GHSA and OSV ones, so the issue is referenced by its identifier without
+    # a database constraint. `identifier_id` is the mentioned identifier.
+    identifier = models.ForeignKey(
+        "Issue",
+        to_field="identifier",
+        db_column="identifier",
+        db_constraint=False,
+        on_delete=models.DO_NOTHING,
+        related_name="github_event_references",
+        help_text="The mentioned identifier, an issue once it has been imported",
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["event", "identifier"], name="unique_github_event_reference"
+            )
+        ]
+
+
+class IssueWeakness(models.Model):
+    """
+    A weakness (CWE) the NVD attributes to an issue
+    """
+
+    issue = models.ForeignKey(
+        Issue, on_delete=models.CASCADE, related_name="weaknesses"
+    )
+    cwe = models.CharField(
+        max_length=32,
+        db_index=True,
+        help_text="CWE identifier (e.g. CWE-79 or NVD-CWE-Other)",
+    )
+
+
+class IssueCPEMatch(models.Model):
+    """
+    A CPE match string of the configurations the NVD lists for an issue
+    """
+
+    issue = models.ForeignKey(
+        Issue, on_delete=models.CASCADE, related_name="cpe_matches"
+    )
+    criteria = models.TextField(help_text="CPE 2.3 match string")
+    vendor = models.CharField(
+        max_length=255, blank=True, help_text="Vendor part of the match string"
+    )
+    product = models.CharField(
+        max_length=255, blank=True, help_text="Product part of the match string"
+    )
+    vulnerable = models.BooleanField(
+        default=True,
+        help_text="Whether the match describes vulnerable software rather than the platform",
+    )
+    version_start_including = models.CharField(max_length=128, blank=True)
+    version_start_excluding = models.CharField(max_length=128, blank=True)
+    version_end_including = models.CharField(max_length=128, blank=True)
+    version_end_excluding = models.CharField(max_length=128, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["vendor", "product"])]
+
+
+class Package(models.Model):
+    """
+    A package of nixpkgs. Packages are kept once they have been seen in a
+    listing, even if a later listing no longer contains them.
+    """
+
+    attribute = models.CharField(
+        max_length=255,
+        unique=True,
+        help_text="Attribute path of the package (e.g. thunderbird-bin)",
+    )
+    pname = models.CharField(
+        max_length=255, db_index=True, help_text="Name of the package without version"
+    )
+    version = models.CharField(
+        max_length=128, blank=True, help_text="Version of the package last seen"
+    )
+    description = models.TextField(blank=True)
+
+    def __str__(self):
+        return self.attribute
+
+
+class PackageMatchReason(models.TextChoices):
+    CPE = "CPE", _("CPE product")
+    KEYWORD = "KEYWORD", _("description keyword")
+
+
+class IssuePackageCandidate(models.Model):
+    """
+    A package that might be affected by an issue, as determined by matching
+    the issue against the package names
+    """
+
+    issue = models.ForeignKey(
+        Issue, on_delete=models.CASCADE, related_name="package_candidates"
+    )
+    package = models.ForeignKey(
+        Package, on_delete=models.CASCADE, related_name="issue_candidates"
+    )
+    reason = models.CharField(
+        choices=PackageMatchReason.choices,
+        max_length=max(len(x[0]) for x in PackageMatchReason.choices),
+        help_text="What the package has been matched by",
+    )
+    affected = models.BooleanField(
+        null=True,
+        help_text="Whether the package version is within the vulnerable version "
+        "ranges of the issue, unknown if there are none",
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["issue", "package"], name="unique_issue_package_candidate"
+            )
+        ]
+
+
+class Channel(models.Model):
+    """
+    A nixpkgs channel (e.g. nixos-20.09) whose package versions are tracked
+    """
+
+    name = models.CharField(
+        max_length=64, unique=True, help_text="Name of the channel (e.g. nixos-20.09)"
+    )
+    revision = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="Revision the packages of the channel have last been imported from",
+    )
+
+    def __str__(self):
+        return self.name
+
+
+class ChannelPackage(models.Model):
+    """
+    The version of a package in the latest imported revision of a channel
+    """
+
+    channel = models.ForeignKey(
+        Channel, on_delete=models.CASCADE, related_name="packages"
+    )
+    package = models.ForeignKey(
+        Package, on_delete=models.CASCADE, related_name="channels"
+    )
+    version = models.CharField(max_length=128, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["channel", "package"], name="unique_channel_package"
+            )
+        ]
+
+
+class ChannelRevision(models.Model):
+    """
+    An imported revision of a channel. Only the changes to the previously
+    imported revision are stored with it.
+    """
+
+    channel = models.ForeignKey(
+        Channel, on_delete=models.CASCADE, related_name="revisions"
+    )
+    revision = models.CharField(
+        max_length=64, blank=True, help_text="Revision of the channel (git commit)"
+    )
+    imported_at = models.DateTimeField(
+        auto_now_add=True, help_text="Datetime the revision has been imported"
+    )
+    package_count = models.PositiveIntegerField(
+        default=0, help_text="Number of packages in the revision"
+    )
+
+    class Meta:
+        ordering = ("-imported_at",)
+
+
+class ChannelPackageChange(models.Model):
+    """
+    A package that has been added to, removed from or changed its version
+    in a channel revision
+    """
+
+    revision = models.ForeignKey(
+        ChannelRevision, on_delete=models.CASCADE, related_name="changes"
+    )
+    package = models.ForeignKey(Package, on_delete=models.CASCADE)
+    old_version = models.CharField(
+        max_length=128,
+        null=True,
+        help_text="Version in the previous revision, null if the package is new",
+    )
+    new_version = models.CharField(
+        max_length=128,
+        null=True,
+        help_text="Version in this revision, null if the package has been removed",
+    )
+
+
+class IssueChannelPackage(models.Model):
+    """
+    The outcome of evaluating a package candidate of an issue against the
+    version of the package in a channel
+    """
+
+    candidate = models.ForeignKey(
+        IssuePackageCandidate, on_delete=models.CASCADE, related_name="channels"
+    )
+    channel_package = models.ForeignKey(
+        ChannelPackage, on_delete=models.CASCADE, related_name="issue_candidates"
+    )
+    affected = models.BooleanField(
+        null=True,
+        help_text="Whether the version in the channel is within the vulnerable "
+        "version ranges of the issue, unknown if there are none",
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["candidate", "channel_package"],
+                name="unique_issue_channel_package",
+            )
+        ]
+
+
 #########################################################
 
 
@@ -0,0 +1,75 @@
+"""
+nixpkgs package listings
+
+Reads the package listings that are published with every nixpkgs channel
+(`packages.json`) or that `nix-env -qaP --json` prints. Both map attribute
+paths to the derivation name and meta data of the package, the channel
+listing wraps them in a `packages` object.
+"""
+import json
+import re
+from gzip import GzipFile
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, NamedTuple, Tuple, Union
+
+# the version of a derivation name starts at the first dash followed by
+# something other than a letter, like `builtins.parseDrvName` does it
+VERSION_SEPARATOR = re.compile(r"-(?=[^a-zA-Z])")
+
+
+class PackageRecord(NamedTuple):
+    """
+    The normalized subset of a package listing entry that we are storing.
+    """
+
+    attribute: str
+    pname: str
+    version: str
+    description: str
+
+
+def parse_drv_name(name: str) -> Tuple[str, str]:
+    """
+    Split a derivation name like `thunderbird-bin-78.5.0` into the package
+    name and the version.
+    """
+    match = VERSION_SEPARATOR.search(name)
+    if match is None:
+        return name, ""
+    return name[: match.start()], name[match.end() :]
+
+
+def normalize_package(attribute: str, package: Dict[str, Any]) -> PackageRecord:
+    """
+    Extract the fields we are interested in from a single listing entry.
+    """
+    pname, version = parse_drv_name(package.get("name", ""))
+    description = package.get("meta", {}).get("description", "")
+    return PackageRecord(
+        attribute=attribute,
+        pname=package.get("pname") or pname,
+        version=package.get("version") or version,
+        description=description if isinstance(description, str) else "",
+    )
+
+
+def open_listing(path: Union[str, Path]) -> BinaryIO:
+    path = Path(path)
+    if path.suffix == ".gz":
+        return GzipFile(path, mode="rb")
+    return open(path, "rb")
+
+
+def read_packages(path: Union[str, Path]) -> Iterator[PackageRecord]:
+    """
+    Read the packages of a (optionally gzip compressed) listing.
+    """
+    with open_listing(path) as fh:
+        data = json.load(fh)
+
+    packages = data
+    if isinstance(data.get("packages"), dict) and "version" in data:
+        packages = data["packages"]
+
+    for attribute, package in packages.items():
+        yield normalize_package(attribute, package)
@@ -0,0 +1,228 @@
+"""
+Affected package evaluation
+
+Checks the versions of the package candidates of issues in every channel
+against the version ranges of the vulnerable CPE matches they have been matched
+by, and derives a suggested status for every issue from the outcome.
+"""
+from collections import defaultdict
+from typing import DefaultDict, Dict, List, Optional, Sequence, Set, Tuple
+
+from django.db.models import Q
+
+from tracker.models import (
+    ChannelPackage,
+    Issue,
+    IssueChannelPackage,
+    IssueCPEMatch,
+    IssuePackageCandidate,
+    IssueStatus,
+)
+from tracker.nvd import cpe_version
+from tracker.utils import chunked
+
+from .matching import PackageIndex
+from .versions import VersionRange, evaluate_ranges
+
+# number of rows that are updated by a single query
+UPDATE_BATCH_SIZE = 1000
+
+
+def cpe_match_range(
+    criteria: str,
+    start_including: str,
+    start_excluding: str,
+    end_including: str,
+    end_excluding: str,
+) -> Optional[VersionRange]:
+    """
+    The versions a CPE match covers, either given by its bounds or by the
+    version of the match string itself. Returns None for matches that do not
+    apply to versions at all.
+    """
+    version_range = VersionRange(
+        start_including, start_excluding, end_including, end_excluding
+    )
+    if any(version_range):
+        return version_range
+    version = cpe_version(criteria)
+    if version == "-":
+        return None
+    if version in ("", "*"):
+        return version_range
+    return VersionRange.exactly(version)
+
+
+def combine_affected(affected: Sequence[Optional[bool]]) -> Optional[bool]:
+    """
+    Something is affected as soon as one of its parts is, and not affected
+    only if all of them are known not to be.
+    """
+    if any(affected):
+        return True
+    if affected and all(value is False for value in affected):
+        return False
+    return None
+
+
+def suggested_status(affected: Sequence[Optional[bool]]) -> IssueStatus:
+    """
+    The status suggested by the outcome of the package candidates of an issue.
+    """
+    return {
+        True: IssueStatus.AFFECTED,
+        False: IssueStatus.NOTAFFECTED,
+        None: IssueStatus.UNKNOWN,
+    }[combine_affected(affected)]
+
+
+def update_in_batches(queryset, changes: Dict[int, object], field: str) -> None:
+    """
+    Set `field` of the rows with the given primary keys to the new values,
+    with one query per distinct value and batch.
+    """
+    by_value: DefaultDict[object, List[int]] = defaultdict(list)
+    for pk, value in changes.items():
+        by_value[value].append(pk)
+    for value, pks in by_value.items():
+        for batch in chunked(pks, UPDATE_BATCH_SIZE):
+            queryset.filter(pk__in=batch).update(**{field: value})
+
+
+def evaluate_issues(
+    index: PackageIndex,
+    issue_ids: Sequence[int],
+    package_ids: Optional[Set[int]] = None,
+) -> int:
+    """
+    Evaluate the package candidates of the issues with the given (sorted)
+    primary keys, or only those of the given packages, and update their
+    suggested status. Only rows whose outcome changed are written. Returns
+    the number of candidates that changed.
+    """
+    if not issue_ids:
+        return 0
+    in_range = Q(issue_id__gte=issue_ids[0], issue_id__lte=issue_ids[-1])
+
+    candidates = IssuePackageCandidate.objects.filter(in_range).order_by()
+    if package_ids is not None:
+        candidates = candidates.filter(package_id__in=package_ids)
+    # The range is cheaper to query than the list of ids, the candidates of
+    # issues within it that have not been asked for are skipped.
+    wanted = set(issue_ids)
+    rows = [
+        row
+        for row in candidates.values_list(
+            "pk", "issue_id", "package_id", "package__version", "affected"
+        )
+        if row[1] in wanted
+    ]
+    if not rows:
+        return 0
+
+    # the version ranges of every (issue, package) pair that has been matched
+    ranges: DefaultDict[Tuple[int, int], List[VersionRange]] = defaultdict(list)
+    for issue_id, criteria, vendor, product, *bounds in (
+        IssueCPEMatch.objects.filter(in_range, vulnerable=True)
+        .order_by()
+        .values_list(
+            "issue_id",
+            "criteria",
+            "vendor",
+            "product",
+            "version_start_including",
+            "version_start_excluding",
+            "version_end_including",
+            "version_end_excluding",
+        )
+    ):
+        version_range = cpe_match_range(criteria, *bounds)
+        if version_range is None:
+            continue
+        for package_id in index.match_cpe(vendor, product):
+            ranges[(issue_id, package_id)].append(version_range)
+
+    # Candidates are evaluated against the versions of the package in every
+    # channel that contains it. Packages that are not part of any channel are
+    # evaluated against the version of the listing they have been seen in.
+    channel_versions: DefaultDict[int, List[Tuple[int, str]]] = defaultdict(list)
+    for channel_package_id, package_id, version in (
+        ChannelPackage.objects.filter(package__in=candidates.values("package_id"))
+        .order_by()
+        .values_list("pk", "package_id", "version")
+    ):
+        channel_versions[package_id].append((channel_package_id, version))
+
+    queries = []
+    for pk, issue_id, package_id, version, _ in rows:
+        issue_ranges = ranges.get((issue_id, package_id), [])
+        for channel_package_id, channel_version in channel_versions.get(
+            package_id, [(None, version)]
+        ):
+            queries.append((pk, channel_package_id, channel_version, issue_ranges))
+    results = evaluate_ranges(
+        [(version, issue_ranges) for _, _, version, issue_ranges in queries]
+    )
+
+    existing = {
+        (candidate_id, channel_package_id): (pk, affected)
+        for pk, candidate_id, channel_package_id, affected in (
+            IssueChannelPackage.objects.filter(candidate__in=candidates)
+            .order_by()
+            .values_list("pk", "candidate_id", "channel_package_id", "affected")
+        )
+    }
+    by_candidate: DefaultDict[int, List[Optional[bool]]] = defaultdict(list)
+    to_create: List[IssueChannelPackage] = []
+    channel_changes: Dict[int, Optional[bool]] = {}
+    for (candidate_id, channel_package_id, _, _), result in zip(queries, results):
+        by_candidate[candidate_id].append(result)
+        if channel_package_id is None:
+            continue
+        current = existing.get((candidate_id, channel_package_id))
+        if current is None:
+            to_create.append(
+                IssueChannelPackage(
+                    candidate_id=candidate_id,
+                    channel_package_id=channel_package_id,
+                    affected=result,
+                )
+            )
+        elif current[1] != result:
+            channel_changes[current[0]] = result
+    IssueChannelPackage.objects.bulk_create(to_create, batch_size=UPDATE_BATCH_SIZE)
+    update_in_batches(IssueChannelPackage.objects, channel_changes, "affected")
+
+    changes = {}
+    for pk, _, _, _, affected in rows:
+        result = combine_affected(by_candidate[pk])
+        if result != affected:
+            changes[pk] = result
+    update_in_batches(IssuePackageCandidate.objects, changes, "affected")
+
+    update_suggested_statuses({issue_id for _, issue_id, _, _, _ in rows})
+    return len(changes)
+
+
+def update_suggested_statuses(issue_ids: Set[int]) -> None:
+    affected: DefaultDict[int, List[Optional[bool]]] = defaultdict(list)
+    current: Dict[int, str] = {}
+    for batch in chunked(sorted(issue_ids), UPDATE_BATCH_SIZE):
+        current.update(
+            Issue.objects.filter(pk__in=batch)
+            .order_by()
+            .values_list("pk", "suggested_status")
+        )
+        for issue_id, value in (
+            IssuePackageCandidate.objects.filter(issue_id__in=batch)
+            .order_by()
+            .values_list("issue_id", "affected")
+        ):
+            affected[issue_id].append(value)
+
+    changes = {}
+    for issue_id, status in current.items():
+        suggested = suggested_status(affected[issue_id])
+        if suggested != status:
+            changes[issue_id] = suggested
+    update_in_batches(Issue.objects, changes, "suggested_status")
@@ -0,0 +1,194 @@
+"""
+Matching CVEs to nixpkgs packages
+
+Packages rarely carry the same name as the product in the CPE match strings
+of a CVE: `thunderbird-bin` ships `thunderbird`, `python39` is `python` and
+`nodejs` is `node.js`. Every package is therefore indexed under a few
+normalized variants of its name and attribute path. Looking up the
+normalized product of a CPE (or a word of a description) is then a single
+hash map access, which keeps matching all CVEs against all packages linear
+in the size of both.
+
+The vendor of a CPE disambiguates its product: `x.org`'s `server` is the
+`xorg-server` package, and generic product names like `server` or `file`
+only match packages of that name if the vendor names the same thing (e.g.
+`file_project`) or is unknown.
+"""
+import re
+from collections import defaultdict
+from typing import AbstractSet, DefaultDict, FrozenSet, Iterable, Set, Tuple
+
+# parts of package names that do not name a different product
+IGNORED_SUFFIXES = frozenset(
+    [
+        "bin",
+        "unwrapped",
+        "wrapped",
+        "full",
+        "minimal",
+        "esr",
+        "lts",
+        "git",
+        "unstable",
+        "nightly",
+        "beta",
+    ]
+)
+
+# Words of descriptions that are package names as well but mostly appear in
+# their ordinary meaning.
+STOPWORDS = frozenset(
+    """
+    access account admin allows application arbitrary attack attacker attackers
+    authentication before buffer bypass cache certificate client code command
+    config configuration content cookie crafted crash data database denial
+    directory disclosure display document domain error exploit file files
+    format function handler header html image information injection input
+    issue kernel library local memory message module network overflow packet
+    page parameter parser password path plugin privilege process product
+    protocol proxy remote request resource response script server service
+    session shell socket software string system template through token
+    traversal update upload user users value version via vulnerability
+    vulnerable when which window with within
+    """.split()
+)
+
+# Products of CPEs that are too generic to be matched without a vendor that
+# agrees with them
+GENERIC_PRODUCTS = STOPWORDS | frozenset(
+    """
+    agent api app backup cli cloud common connect core desktop editor engine
+    firmware framework gateway manager mobile monitor platform portal reader
+    router sdk studio suite tools utils viewer web
+    """.split()
+)
+
+# parts of vendor names that do not name a different vendor
+IGNORED_VENDOR_SUFFIXES = frozenset(
+    [
+        "project",
+        "foundation",
+        "software",
+        "team",
+        "developers",
+        "community",
+        "inc",
+        "corp",
+        "corporation",
+        "ltd",
+        "llc",
+        "gmbh",
+    ]
+)
+
+# keys shorter than this are too ambiguous to be matched
+MIN_KEY_LENGTH = 3
+
+# words of descriptions shorter than this are not looked up
+MIN_KEYWORD_LENGTH = 4
+
+NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+NAME_PARTS = re.compile(r"[-_.]+")
+TRAILING_VERSION = re.compile(r"[0-9_]+$")
+WORD = re.compile(r"[A-Za-z][A-Za-z0-9+._-]*[A-Za-z0-9+]")
+
+EMPTY: FrozenSet[int] = frozenset()
+
+
+def normalize_name(name: str) -> str:
+    """
+    Lower case a name and drop everything but letters and digits, so that
+    `Node.js`, `node_js` and `nodejs` become the same.
+    """
+    return NON_ALPHANUMERIC.sub("", name.replace("\\", "").lower())
+
+
+def name_keys(name: str) -> Set[str]:
+    """
+    The normalized variants of a package name (or the last component of an
+    attribute path) it is indexed under.
+    """
+    keys = {normalize_name(name)}
+
+    parts = [part for part in NAME_PARTS.split(name.lower()) if part]
+    while len(parts) > 1 and parts[-1] in IGNORED_SUFFIXES:
+        parts.pop()
+    base = normalize_name("".join(parts))
+    keys.add(base)
+
+    # `python39`, `openssl_1_1` or `gtk3` without their version
+    keys.add(TRAILING_VERSION.sub("", base))
+
+    return {key for key in keys if len(key) >= MIN_KEY_LENGTH}
+
+
+def normalize_vendor(vendor: str) -> str:
+    """
+    The normalized vendor of a CPE without suffixes like `_project`, empty
+    if the vendor is not known.
+    """
+    if vendor in ("", "*", "-"):
+        return ""
+    parts = [part for part in NAME_PARTS.split(vendor.lower()) if part]
+    while len(parts) > 1 and parts[-1] in IGNORED_VENDOR_SUFFIXES:
+        parts.pop()
+    return normalize_name("".join(parts))
+
+
+def package_keys(attribute: str, pname: str) -> Set[str]:
+    return name_keys(pname) | name_keys(attribute.rsplit(".", 1)[-1])
+
+
+class PackageIndex:
+    """
+    Maps normalized names to the ids of the packages known under them.
+    """
+
+    def __init__(self):
+        self.keys: DefaultDict[str, Set[int]] = defaultdict(set)
+
+    @classmethod
+    def build(cls, packages: Iterable[Tuple[int, str, str]]) -> "PackageIndex":
+        """
+        Build the index from (id, attribute, pname) tuples.
+        """
+        index = cls()
+        for package_id, attribute, pname in packages:
+            index.add(package_id, attribute, pname)
+        return index
+
+    def add(self, package_id: int, attribute: str, pname: str):
+        for key in package_keys(attribute, pname):
+            self.keys[key].add(package_id)
+
+    def lookup(self, name: str) -> AbstractSet[int]:
+        return self.keys.get(normalize_name(name), EMPTY)
+
+    def match_cpe(self, vendor: str, product: str) -> AbstractSet[int]:
+        """
+        The packages that might ship the product of a CPE match string.
+        Packages named after both the vendor and the product (e.g.
+        `xorg-server`) are preferred over those named after the product only.
+        """
+        if product in ("", "*", "-"):
+            return EMPTY
+        vendor_key = normalize_vendor(vendor)
+        product_key = normalize_name(product)
+        if vendor_key and vendor_key != product_key:
+            qualified = self.keys.get(vendor_key + product_key, EMPTY)
+            if qualified:
+                return qualified
+            if product_key in GENERIC_PRODUCTS:
+                return EMPTY
+        return self.keys.get(product_key, EMPTY)
+
+    def match_description(self, description: str) -> Set[int]:
+        """
+        The packages whose name is mentioned in a description.
+        """
+        matches: Set[int] = set()
+        for word in set(WORD.findall(description)):
+            if len(word) < MIN_KEYWORD_LENGTH or word.lower() in STOPWORDS:
+                continue
+            matches.update(self.lookup(word))
+        return matches
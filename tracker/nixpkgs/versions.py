@@ -0,0 +1,132 @@
+"""
+Version ranges
+
+Decides whether the version of a package falls into the version ranges of the
+CPE matches of an issue. Versions are compared like `builtins.compareVersions`
+of Nix does it. Rather than comparing version strings pairwise, every distinct
+version of a batch is parsed once and assigned an integer rank in that order,
+after which checking a version against a range is just comparing integers.
+"""
+import re
+from itertools import chain
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+COMPONENT = re.compile(r"[0-9]+|[^.\-0-9]+")
+
+# sort keys of the components of a version, in the order Nix compares them:
+# `pre` comes before a missing component, which comes before any other word,
+# which comes before any number
+PRE = (0, "")
+MISSING = (1, "")
+
+ComponentKey = Union[Tuple[int, str], Tuple[int, int]]
+VersionKey = Tuple[ComponentKey, ...]
+
+
+def version_key(version: str) -> VersionKey:
+    """
+    A key that sorts versions the way `builtins.compareVersions` orders them,
+    e.g. `1.0pre1 < 1.0 < 1.0a < 1.0.1 < 1.1`.
+    """
+    components: List[ComponentKey] = []
+    for component in COMPONENT.findall(version):
+        if component.isdigit():
+            components.append((2, int(component)))
+        elif component == "pre":
+            components.append(PRE)
+        else:
+            components.append((1, component))
+    # A version that is a prefix of another one is compared against missing
+    # components. Terminating every key with one is enough to compare tuples
+    # of different lengths correctly, as no actual component equals it.
+    components.append(MISSING)
+    return tuple(components)
+
+
+class VersionRange(NamedTuple):
+    """
+    A range of versions as the NVD describes them. Empty bounds are open, a
+    range without any bounds contains every version.
+    """
+
+    start_including: str = ""
+    start_excluding: str = ""
+    end_including: str = ""
+    end_excluding: str = ""
+
+    @classmethod
+    def exactly(cls, version: str) -> "VersionRange":
+        return cls(start_including=version, end_including=version)
+
+    def versions(self) -> Iterable[str]:
+        return (bound for bound in self if bound)
+
+
+class VersionRanks:
+    """
+    Assigns every one of the given versions its rank in the order of
+    `version_key`. Versions that compare equal get the same rank.
+    """
+
+    def __init__(self, versions: Iterable[str]):
+        keys = {version: version_key(version) for version in set(versions)}
+        ranks = {key: rank for rank, key in enumerate(sorted(set(keys.values())))}
+        self.ranks: Dict[str, int] = {
+            version: ranks[key] for version, key in keys.items()
+        }
+        self.size = len(ranks)
+
+    def __getitem__(self, version: str) -> int:
+        return self.ranks[version]
+
+    def bounds(self, version_range: VersionRange) -> Tuple[int, int]:
+        """
+        The range as the lowest and the highest rank it contains.
+        """
+        if version_range.start_including:
+            low = self[version_range.start_including]
+        elif version_range.start_excluding:
+            low = self[version_range.start_excluding] + 1
+        else:
+            low = 0
+        if version_range.end_including:
+            high = self[version_range.end_including]
+        elif version_range.end_excluding:
+            high = self[version_range.end_excluding] - 1
+        else:
+            high = self.size
+        return low, high
+
+
+def evaluate_ranges(
+    queries: Sequence[Tuple[str, Sequence[VersionRange]]]
+) -> List[Optional[bool]]:
+    """
+    For every pair of a version and version ranges determine whether the
+    version is within any of the ranges. The result is None for an empty
+    version or if there are no ranges, as nothing can be said about those.
+    """
+    ranks = VersionRanks(
+        chain.from_iterable(
+            chain([version], *(version_range.versions() for version_range in ranges))
+            for version, ranges in queries
+        )
+    )
+
+    bounds: Dict[VersionRange, Tuple[int, int]] = {}
+    results: List[Optional[bool]] = []
+    for version, ranges in queries:
+        if not version or not ranges:
+            results.append(None)
+            continue
+        rank = ranks[version]
+        affected = False
+        for version_range in ranges:
+            if version_range not in bounds:
+                bounds[version_range] = ranks.bounds(version_range)
+            low, high = bounds[version_range]
+            if low <= rank <= high:
+                affected = True
+                break
+        results.append(affected)
+    return results
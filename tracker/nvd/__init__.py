@@ -0,0 +1,703 @@
+"""
+NVD feed parsing functions
+
+This module provides the functions required to read the JSON feeds (version
+1.1) published by the NVD. The feeds are large (hundreds of MB per year once
+decompressed) so they are never loaded into memory as a whole. Instead the
+`CVE_Items` array is walked incrementally and every item is handed out as soon
+as it has been decoded.
+"""
+import codecs
+import contextlib
+import datetime
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from gzip import GzipFile
+from pathlib import Path
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import requests
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+FEED_ITEMS_KEY = "CVE_Items"
+
+FEED_SUFFIX = ".json.gz"
+META_SUFFIX = ".meta"
+
+READ_SIZE = 64 * 1024
+
+# seconds to wait for a connection to the NVD and for each read from it
+REQUEST_TIMEOUT = (10, 60)
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class NVDFeedFormatError(ValueError):
+    pass
+
+
+class CPEMatch(NamedTuple):
+    """
+    A CPE match string of the configurations of a CVE, optionally limited to
+    a range of versions. Matches that are not `vulnerable` describe the
+    platform the vulnerable software has to run on.
+    """
+
+    criteria: str
+    vulnerable: bool
+    version_start_including: str = ""
+    version_start_excluding: str = ""
+    version_end_including: str = ""
+    version_end_excluding: str = ""
+
+
+class CVERecord(NamedTuple):
+    """
+    The normalized subset of a NVD `CVE_Items` entry that we are storing.
+    """
+
+    identifier: str
+    description: str
+    published_date: Optional[datetime.datetime]
+    references: List[str]
+    cvss3_score: Optional[float]
+    cvss3_vector: str
+    cvss2_score: Optional[float]
+    cvss2_vector: str
+    cwes: List[str]
+    cpe_matches: List[CPEMatch]
+
+
+# colons that separate the fields of a CPE 2.3 string, escaped ones are part
+# of a value
+CPE_SEPARATOR = re.compile(r"(?<!\\):")
+
+
+def cpe_vendor_product(criteria: str) -> Tuple[str, str]:
+    """
+    Returns the vendor and product of a CPE 2.3 string like
+    `cpe:2.3:a:vendor:product:version:...` or empty strings if it is not one.
+    """
+    fields = CPE_SEPARATOR.split(criteria)
+    if len(fields) < 5 or fields[:2] != ["cpe", "2.3"]:
+        return "", ""
+    return fields[3], fields[4]
+
+
+def cpe_version(criteria: str) -> str:
+    """
+    Returns the unescaped version of a CPE 2.3 string, `*` for any and `-`
+    for not applicable versions or an empty string if it is not one.
+    """
+    fields = CPE_SEPARATOR.split(criteria)
+    if len(fields) < 6 or fields[:2] != ["cpe", "2.3"]:
+        return ""
+    return fields[5].replace("\\", "")
+
+
+def gzip_decompress(input: BinaryIO) -> BinaryIO:
+    """
+    gzip_decompress takes an input byte stream and returns a stream of the
+    decompressed data.
+    """
+    return GzipFile(fileobj=input, mode="rb")
+
+
+def normalize_cve_item(cve_item: Dict[str, Any]) -> CVERecord:
+    """
+    Extract the fields we are interested in from a single `CVE_Items` entry.
+    """
+    cve = cve_item["cve"]
+    identifier = cve["CVE_data_meta"]["ID"]
+
+    # get the first 'en' description
+    description = next(
+        entry["value"]
+        for entry in cve["description"]["description_data"]
+        if entry["lang"] == "en"
+    )
+
+    published_date = parse_datetime(cve_item["publishedDate"])
+
+    references = [data["url"] for data in cve["references"]["reference_data"]]
+
+    impact = cve_item.get("impact", {})
+    cvss3 = impact.get("baseMetricV3", {}).get("cvssV3", {})
+    cvss2 = impact.get("baseMetricV2", {}).get("cvssV2", {})
+
+    cwes = [
+        entry["value"]
+        for problemtype in cve.get("problemtype", {}).get("problemtype_data", [])
+        for entry in problemtype["description"]
+    ]
+
+    cpe_matches = [
+        CPEMatch(
+            criteria=match["cpe23Uri"],
+            vulnerable=match["vulnerable"],
+            version_start_including=match.get("versionStartIncluding", ""),
+            version_start_excluding=match.get("versionStartExcluding", ""),
+            version_end_including=match.get("versionEndIncluding", ""),
+            version_end_excluding=match.get("versionEndExcluding", ""),
+        )
+        for node in iter_configuration_nodes(
+            cve_item.get("configurations", {}).get("nodes", [])
+        )
+        for match in node.get("cpe_match", [])
+    ]
+
+    return CVERecord(
+        identifier=identifier,
+        description=description,
+        published_date=published_date,
+        references=sorted(references),
+        cvss3_score=cvss3.get("baseScore"),
+        cvss3_vector=cvss3.get("vectorString", ""),
+        cvss2_score=cvss2.get("baseScore"),
+        cvss2_vector=cvss2.get("vectorString", ""),
+        cwes=sorted(set(cwes)),
+        cpe_matches=sorted(set(cpe_matches)),
+    )
+
+
+def iter_configuration_nodes(nodes: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Walk the (nested) nodes of the configurations of a `CVE_Items` entry.
+    """
+    for node in nodes:
+        yield node
+        yield from iter_configuration_nodes(node.get("children", []))
+
+
+def record_digest(record: CVERecord) -> str:
+    """
+    Compute a digest over the normalized content of a record. Two records
+    with the same digest do not differ in any of the fields we store.
+    """
+    published_date = record.published_date
+    content = [
+        record.description,
+        published_date.isoformat() if published_date else None,
+        sorted(record.references),
+        record.cvss3_score,
+        record.cvss3_vector,
+        record.cvss2_score,
+        record.cvss2_vector,
+        sorted(record.cwes),
+        sorted(record.cpe_matches),
+    ]
+    data = json.dumps(content, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+# issue fields that follow the NVD whenever the record of an issue changed,
+# the published date is only filled in if it is missing
+NVD_UPDATED_FIELDS = (
+    "description",
+    "cvss3_base_score",
+    "cvss3_vector",
+    "cvss2_base_score",
+    "cvss2_vector",
+    "nvd_digest",
+)
+
+
+def issue_fields(record: CVERecord) -> Dict[str, Any]:
+    """
+    The values of the issue fields that are imported from a record.
+    """
+    return dict(
+        identifier=record.identifier,
+        description=record.description,
+        published_date=record.published_date,
+        cvss3_base_score=record.cvss3_score,
+        cvss3_vector=record.cvss3_vector,
+        cvss2_base_score=record.cvss2_score,
+        cvss2_vector=record.cvss2_vector,
+        nvd_digest=record_digest(record),
+    )
+
+
+class _StreamReader:
+    """
+    Incrementally decodes a JSON document from a byte stream while only
+    keeping a small window of the text in memory.
+    """
+
+    def __init__(self, stream: BinaryIO, read_size: int = READ_SIZE):
+        self.stream = stream
+        self.read_size = read_size
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """
+        Read another block from the stream. Returns False once the stream is
+        exhausted.
+        """
+        if self.eof:
+            return False
+
+        data = self.stream.read(self.read_size)
+        self.eof = not data
+        text = self.text_decoder.decode(data, final=self.eof)
+
+        # drop everything that has already been consumed
+        self.buffer = self.buffer[self.pos :] + text
+        self.pos = 0
+        return not self.eof or bool(text)
+
+    def skip_whitespace(self):
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self.fill():
+                return
+
+    def peek(self) -> str:
+        self.skip_whitespace()
+        if self.pos >= len(self.buffer):
+            raise NVDFeedFormatError("Unexpected end of the feed")
+        return self.buffer[self.pos]
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise NVDFeedFormatError(
+                f"Expected {char!r} but found {found!r} at offset {self.pos}"
+            )
+        self.pos += 1
+
+    def value(self) -> Any:
+        """
+        Decode the next JSON value from the stream.
+        """
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+
+            # a value that ends exactly at the end of the buffer might have
+            # been truncated (e.g. numbers), read more data to be sure
+            if end == len(self.buffer) and self.fill():
+                continue
+
+            self.pos = end
+            return value
+
+
+def iter_cve_items(stream: BinaryIO, read_size: int = READ_SIZE) -> Iterator[Any]:
+    """
+    Iterate over the entries of the `CVE_Items` array of a (decompressed) NVD
+    JSON feed without loading the entire document into memory.
+    """
+    reader = _StreamReader(stream, read_size=read_size)
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+
+    while True:
+        key = reader.value()
+        reader.expect(":")
+
+        if key == FEED_ITEMS_KEY:
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.peek() == "]":
+                        reader.pos += 1
+                        break
+                    reader.expect(",")
+        else:
+            # skip over the (small) header fields of the feed
+            reader.value()
+
+        if reader.peek() == "}":
+            return
+        reader.expect(",")
+
+
+class _HashingReader:
+    """
+    Wraps a binary stream and computes the SHA256 checksum of all the data
+    that has been read through it.
+    """
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.hash = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self.hash.update(data)
+        return data
+
+    def hexdigest(self) -> str:
+        # consume whatever might be left after the JSON document
+        while self.read(READ_SIZE):
+            pass
+        return self.hash.hexdigest()
+
+
+class _MeteredReader:
+    """
+    Wraps a binary stream and counts the bytes that have been read through it
+    as well as the time spent waiting for them.
+    """
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def read(self, size: int = -1) -> bytes:
+        start = time.perf_counter()
+        data = self.stream.read(size)
+        self.seconds += time.perf_counter() - start
+        self.bytes += len(data)
+        return data
+
+
+class FetchStatistics:
+    """
+    Number of bytes and time spent in the stages of fetching a feed. The
+    stages are interleaved while the feed is streamed, the time of each stage
+    is summed up separately.
+    """
+
+    def __init__(self):
+        self.downloaded_bytes = 0
+        self.download_seconds = 0.0
+        self.decompress_seconds = 0.0
+        self.parse_seconds = 0.0
+
+
+class _TeeReader:
+    """
+    Wraps a binary stream and writes all the data that has been read through
+    it to another file.
+    """
+
+    def __init__(self, stream: BinaryIO, output: BinaryIO):
+        self.stream = stream
+        self.output = output
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self.output.write(data)
+        return data
+
+    def drain(self):
+        while self.read(READ_SIZE):
+            pass
+
+
+class FeedCache:
+    """
+    A directory of compressed NVD feeds. The files are addressed by the SHA256
+    checksum of their decompressed content, i.e. the checksum that is
+    published in the `.meta` files, so a cached feed can be found without
+    downloading it first.
+    """
+
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+
+    def path(self, sha256: str) -> Path:
+        return self.directory / f"{sha256}{FEED_SUFFIX}"
+
+    def open(self, sha256: str) -> Optional[BinaryIO]:
+        """
+        Open the cached feed with the given checksum or return None if it is
+        not in the cache.
+        """
+        try:
+            return open(self.path(sha256), "rb")
+        except FileNotFoundError:
+            return None
+
+    def create(self) -> BinaryIO:
+        """
+        Create a temporary file for a feed that is about to be downloaded. It
+        has to be passed to either `store()` or `discard()` afterwards.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return tempfile.NamedTemporaryFile(
+            dir=self.directory, prefix=".download-", delete=False
+        )
+
+    def store(self, fh: BinaryIO, sha256: str):
+        fh.close()
+        os.replace(fh.name, self.path(sha256))
+
+    def discard(self, fh: BinaryIO):
+        fh.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(fh.name)
+
+    def remove(self, sha256: str):
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path(sha256))
+
+
+def local_path(url: str) -> Optional[Path]:
+    """
+    Returns the path of feeds that are given as `file://` URL or plain path
+    and None for all other URLs.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "file":
+        return Path(url2pathname(parsed.path))
+    if not parsed.scheme:
+        return Path(url)
+    return None
+
+
+def meta_url(url: str) -> Optional[str]:
+    """
+    Returns the URL of the `.meta` file that the NVD publishes next to each of
+    the feeds or None if the URL doesn't look like a NVD feed.
+    """
+    if url.endswith(FEED_SUFFIX):
+        return url[: -len(FEED_SUFFIX)] + META_SUFFIX
+    return None
+
+
+def parse_meta(text: str) -> Dict[str, str]:
+    """
+    Parse the `key:value` lines of a NVD `.meta` file.
+    """
+    meta = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition(":")
+        if sep:
+            meta[key.strip()] = value.strip()
+    return meta
+
+
+class NVDFeedFetch:
+    """
+    Fetches a single NVD feed. The metadata of a previous import (if any) is
+    used to skip the download of feeds that did not change. Either by
+    comparing the checksum published in the `.meta` file or, if there is no
+    such file, by using a conditional GET request.
+
+    Feeds may also be given as local paths or `file://` URLs, a `.meta` file
+    next to them is used the same way. Downloaded feeds are kept in the
+    `cache` (if given) and read from there as long as the checksum in the
+    `.meta` file points to them.
+
+    An interrupted import can be resumed by passing the `version` of the feed
+    it was reading and the number of records it already processed as
+    `resume`. The records are skipped if the feed is still at that version.
+    Once the first record has been yielded `version` identifies the content
+    of the feed being read (the checksum from the `.meta` file or the ETag)
+    and `offset` holds the number of records that have been skipped.
+
+    After `records()` has been consumed the attributes carry the metadata of
+    the fetched feed and `unchanged` tells whether the download was skipped.
+    `statistics` tells how much data has been read (from the network or the
+    disk) and where the time went. While the records are being read
+    `progress()` estimates how much of the feed is done.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        etag: str = "",
+        last_modified: str = "",
+        sha256: str = "",
+        cache: Optional[FeedCache] = None,
+        resume: Optional[Tuple[str, int]] = None,
+    ):
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.sha256 = sha256
+        self.cache = cache
+        self.resume = resume
+        self.version = ""
+        self.offset = 0
+        self.unchanged = False
+        self.statistics = FetchStatistics()
+        # compressed size of the feed, if known
+        self.size: Optional[int] = None
+
+    def fetch_meta_sha256(self) -> Optional[str]:
+        url = meta_url(self.url)
+        if url is None:
+            return None
+
+        path = local_path(url)
+        if path is not None:
+            try:
+                text = path.read_text()
+            except FileNotFoundError:
+                logger.info("No meta file for %s", self.url)
+                return None
+        else:
+            try:
+                response = requests.get(url, timeout=REQUEST_TIMEOUT)
+            except requests.RequestException as e:
+                # e.g. a timeout, the feed is downloaded as without a meta file
+                logger.warning("Failed to fetch %s: %s", url, e)
+                return None
+
+            if response.status_code != 200:
+                logger.info(
+                    "No meta file for %s (HTTP %s)", self.url, response.status_code
+                )
+                return None
+            text = response.text
+
+        return parse_meta(text).get("sha256", "").lower() or None
+
+    def records(self) -> Iterator[CVERecord]:
+        """
+        Download the feed (or read it from disk) and yield the normalized
+        records while the feed is being downloaded and decompressed.
+        """
+        headers = {}
+        meta_sha256 = self.fetch_meta_sha256()
+        if meta_sha256:
+            if meta_sha256 == self.sha256:
+                self.unchanged = True
+                return
+        else:
+            if self.etag:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified:
+                headers["If-Modified-Since"] = self.last_modified
+
+        self.version = meta_sha256 or ""
+
+        path = local_path(self.url)
+        if path is not None:
+            with open(path, "rb") as fh:
+                self.size = os.fstat(fh.fileno()).st_size
+                yield from self.parse(fh)
+            return
+
+        if self.cache and meta_sha256:
+            cached = self.cache.open(meta_sha256)
+            if cached:
+                logger.info("Reading %s from the cache", self.url)
+                with cached:
+                    self.size = os.fstat(cached.fileno()).st_size
+                    yield from self.parse(cached)
+                return
+
+        kwargs = {"headers": headers} if headers else {}
+        start = time.perf_counter()
+        # the read timeout applies to every read, a stalled download fails
+        response = requests.get(
+            self.url, stream=True, timeout=REQUEST_TIMEOUT, **kwargs
+        )
+        self.statistics.download_seconds += time.perf_counter() - start
+        if response.status_code == 304:
+            self.unchanged = True
+            return
+        if response.status_code != 200:
+            raise requests.HTTPError(
+                f"Failed to fetch {self.url}: HTTP {response.status_code}",
+                response=response,
+            )
+
+        self.etag = response.headers.get("ETag", "")
+        self.last_modified = response.headers.get("Last-Modified", "")
+        self.version = meta_sha256 or self.etag
+        content_length = response.headers.get("Content-Length")
+        if content_length and content_length.isdigit():
+            self.size = int(content_length)
+
+        if not self.cache:
+            yield from self.parse(response.raw)
+            return
+
+        previous_sha256 = self.sha256
+        output = self.cache.create()
+        try:
+            tee = _TeeReader(response.raw, output)
+            yield from self.parse(tee)
+            tee.drain()
+        except BaseException:
+            self.cache.discard(output)
+            raise
+
+        self.cache.store(output, self.sha256)
+        if previous_sha256 and previous_sha256 != self.sha256:
+            self.cache.remove(previous_sha256)
+
+    def progress(self) -> Optional[float]:
+        """
+        The fraction of the feed that has been read so far or None if the
+        size of the feed is unknown.
+        """
+        if not self.size:
+            return None
+        return min(self.statistics.downloaded_bytes / self.size, 1.0)
+
+    def parse(self, stream: BinaryIO) -> Iterator[CVERecord]:
+        self.offset = 0
+        if self.resume and self.version:
+            version, offset = self.resume
+            if version == self.version:
+                self.offset = offset
+
+        compressed = _MeteredReader(stream)
+        decompressed = _MeteredReader(gzip_decompress(compressed))
+        data = _HashingReader(decompressed)
+        items = iter_cve_items(data)
+
+        statistics = self.statistics
+        downloaded_bytes = statistics.downloaded_bytes
+
+        # time spent in this generator, excluding the time the consumer holds
+        # on to the records
+        busy = 0.0
+        start = time.perf_counter()
+        # the skipped items still have to be decoded but not normalized
+        for item in itertools.islice(items, self.offset, None):
+            record = normalize_cve_item(item)
+            statistics.downloaded_bytes = downloaded_bytes + compressed.bytes
+            busy += time.perf_counter() - start
+            yield record
+            start = time.perf_counter()
+
+        self.sha256 = data.hexdigest()
+        busy += time.perf_counter() - start
+
+        statistics.downloaded_bytes = downloaded_bytes + compressed.bytes
+        statistics.download_seconds += compressed.seconds
+        statistics.decompress_seconds += decompressed.seconds - compressed.seconds
+        statistics.parse_seconds += busy - decompressed.seconds
@@ -0,0 +1,296 @@
+"""
+NVD CVE API 2.0 client
+
+Instead of downloading whole feeds the CVE API allows fetching only the CVEs
+that have been modified within a time range. The results are paginated and
+every page is normalized into the same records as the JSON feeds as soon as
+it has been received.
+
+See https://nvd.nist.gov/developers/vulnerabilities for the API
+documentation.
+"""
+import datetime
+import logging
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import REQUEST_TIMEOUT, CPEMatch, CVERecord, FetchStatistics
+
+logger = logging.getLogger(__name__)
+
+API_URL = "https://services.nvd.nist.gov/rest/json/cves/2.0"
+
+# the maximum number of results per page the API allows
+RESULTS_PER_PAGE = 2000
+
+# the maximum range of a lastModStartDate/lastModEndDate window
+MAX_WINDOW = datetime.timedelta(days=120)
+
+# The API allows 5 requests within 30 seconds without an API key and 50 with
+# one. The NVD recommends sleeping between requests in any case.
+REQUEST_DELAY = 6.0
+REQUEST_DELAY_WITH_KEY = 0.6
+
+# The API replies with these when the rate limit has been exceeded or when it
+# is overloaded. Such requests (and those that failed to connect) are retried
+# up to MAX_ATTEMPTS times, waiting twice as long before every retry.
+RETRY_STATUSES = (403, 503)
+MAX_ATTEMPTS = 4
+
+
+class NVDAPIError(Exception):
+    pass
+
+
+def parse_api_datetime(value: str) -> Optional[datetime.datetime]:
+    """
+    The API returns timestamps without a timezone, they are in UTC.
+    """
+    parsed = parse_datetime(value)
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, datetime.timezone.utc)
+    return parsed
+
+
+def format_api_datetime(value: datetime.datetime) -> str:
+    value = value.astimezone(datetime.timezone.utc)
+    return value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}Z"
+
+
+def normalize_api_cve(vulnerability: Dict[str, Any]) -> CVERecord:
+    """
+    Extract the fields we are interested in from a single entry of the
+    `vulnerabilities` of an API response.
+    """
+    cve = vulnerability["cve"]
+
+    # get the first 'en' description
+    description = next(
+        (entry["value"] for entry in cve["descriptions"] if entry["lang"] == "en"),
+        "",
+    )
+
+    references = [reference["url"] for reference in cve.get("references", [])]
+
+    metrics = cve.get("metrics", {})
+    cvss3 = primary_cvss_data(
+        metrics.get("cvssMetricV31", []) or metrics.get("cvssMetricV30", [])
+    )
+    cvss2 = primary_cvss_data(metrics.get("cvssMetricV2", []))
+
+    cwes = [
+        entry["value"]
+        for weakness in cve.get("weaknesses", [])
+        for entry in weakness["description"]
+    ]
+
+    cpe_matches = [
+        CPEMatch(
+            criteria=match["criteria"],
+            vulnerable=match["vulnerable"],
+            version_start_including=match.get("versionStartIncluding", ""),
+            version_start_excluding=match.get("versionStartExcluding", ""),
+            version_end_including=match.get("versionEndIncluding", ""),
+            version_end_excluding=match.get("versionEndExcluding", ""),
+        )
+        for configuration in cve.get("configurations", [])
+        for node in configuration["nodes"]
+        for match in node.get("cpeMatch", [])
+    ]
+
+    return CVERecord(
+        identifier=cve["id"],
+        description=description,
+        published_date=parse_api_datetime(cve["published"]),
+        references=sorted(references),
+        cvss3_score=cvss3.get("baseScore"),
+        cvss3_vector=cvss3.get("vectorString", ""),
+        cvss2_score=cvss2.get("baseScore"),
+        cvss2_vector=cvss2.get("vectorString", ""),
+        cwes=sorted(set(cwes)),
+        cpe_matches=sorted(set(cpe_matches)),
+    )
+
+
+def primary_cvss_data(metrics: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Returns the `cvssData` of the metric the NVD itself provided, falling back
+    to the first one of another source.
+    """
+    for metric in metrics:
+        if metric.get("type") == "Primary":
+            return metric["cvssData"]
+    if metrics:
+        return metrics[0]["cvssData"]
+    return {}
+
+
+def time_windows(
+    start: datetime.datetime, end: datetime.datetime
+) -> Iterator[Tuple[datetime.datetime, datetime.datetime]]:
+    """
+    Split the given range into consecutive windows the API accepts.
+    """
+    while start < end:
+        window_end = min(start + MAX_WINDOW, end)
+        yield start, window_end
+        start = window_end
+
+
+class NVDAPIFetch:
+    """
+    Fetches the CVEs from the CVE API 2.0 that have been modified since the
+    given watermark, or all CVEs if there is none.
+
+    While `records()` is being consumed `watermark` is moved forward to the
+    end of every time window once all of its records have been yielded. It
+    can be stored and passed as `since` to the next fetch. `statistics`
+    accumulates the size of the responses and the time spent receiving and
+    decoding them, `progress()` estimates how much of the range is done.
+    """
+
+    def __init__(
+        self,
+        url: str = API_URL,
+        since: Optional[datetime.datetime] = None,
+        api_key: Optional[str] = None,
+        results_per_page: int = RESULTS_PER_PAGE,
+        delay: Optional[float] = None,
+    ):
+        self.url = url
+        self.watermark = since
+        self.api_key = api_key
+        self.results_per_page = results_per_page
+        if delay is None:
+            delay = REQUEST_DELAY_WITH_KEY if api_key else REQUEST_DELAY
+        self.delay = delay
+        self.last_request: Optional[float] = None
+        self.statistics = FetchStatistics()
+        self.windows = 0
+        self.windows_done = 0
+        self.received = 0
+        self.total: Optional[int] = None
+
+    def request(self, params: Dict[str, Any]) -> requests.Response:
+        if self.last_request is not None:
+            wait = self.last_request + self.delay - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+
+        headers = {"apiKey": self.api_key} if self.api_key else {}
+        start = time.perf_counter()
+        try:
+            response = requests.get(
+                self.url, params=params, headers=headers, timeout=REQUEST_TIMEOUT
+            )
+        finally:
+            self.last_request = time.monotonic()
+            self.statistics.download_seconds += time.perf_counter() - start
+        self.statistics.downloaded_bytes += len(response.content)
+        return response
+
+    def get(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                response = self.request(params)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == MAX_ATTEMPTS:
+                    raise
+                error = str(e)
+            else:
+                if response.status_code == 200:
+                    break
+                if (
+                    response.status_code not in RETRY_STATUSES
+                    or attempt == MAX_ATTEMPTS
+                ):
+                    raise NVDAPIError(
+                        f"Request to {self.url} failed with HTTP {response.status_code}"
+                    )
+                error = f"HTTP {response.status_code}"
+
+            backoff = self.delay * 2**attempt
+            logger.warning(
+                "Request to %s failed (%s), retrying in %.1fs", self.url, error, backoff
+            )
+            time.sleep(backoff)
+
+        start = time.perf_counter()
+        page = response.json()
+        self.statistics.parse_seconds += time.perf_counter() - start
+        return page
+
+    def pages(self, params: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        start_index = 0
+        while True:
+            page = self.get(
+                dict(
+                    params,
+                    startIndex=start_index,
+                    resultsPerPage=self.results_per_page,
+                )
+            )
+            yield page
+
+            vulnerabilities = page.get("vulnerabilities", [])
+            start_index += len(vulnerabilities)
+            if not vulnerabilities or start_index >= page["totalResults"]:
+                return
+
+    def records(self) -> Iterator[CVERecord]:
+        end = timezone.now()
+
+        if self.watermark is None:
+            windows = [({}, end)]
+        else:
+            windows = [
+                (
+                    dict(
+                        lastModStartDate=format_api_datetime(window_start),
+                        lastModEndDate=format_api_datetime(window_end),
+                    ),
+                    window_end,
+                )
+                for window_start, window_end in time_windows(self.watermark, end)
+            ]
+
+        self.windows = len(windows)
+        for params, window_end in windows:
+            for page in self.pages(params):
+                self.received = page["startIndex"] + len(
+                    page.get("vulnerabilities", [])
+                )
+                self.total = page["totalResults"]
+                logger.info(
+                    "Received %d of %d CVEs from %s",
+                    self.received,
+                    self.total,
+                    self.url,
+                )
+                start = time.perf_counter()
+                records = [
+                    normalize_api_cve(vulnerability)
+                    for vulnerability in page.get("vulnerabilities", [])
+                ]
+                self.statistics.parse_seconds += time.perf_counter() - start
+                yield from records
+
+            self.watermark = window_end
+            self.windows_done += 1
+            self.total = None
+
+    def progress(self) -> Optional[float]:
+        """
+        The fraction of the time windows that has been received so far,
+        assuming the CVEs are spread evenly over the windows.
+        """
+        if not self.windows:
+            return None
+        done = float(self.windows_done)
+        if self.total:
+            done += min(self.received / self.total, 1.0)
+        return done / self.windows
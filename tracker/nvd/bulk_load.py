@@ -0,0 +1,388 @@
+"""
+PostgreSQL bulk loader for NVD records
+
+Importing the whole NVD through the ORM means hundreds of thousands of
+`INSERT` statements. The loader in this module instead streams the records
+into temporary staging tables using `COPY FROM STDIN` and merges them into
+the issue and reference tables with a few set-based statements. All of it has
+to happen within a single transaction as the staging tables are dropped on
+commit. The statements are composed with `psycopg2.sql`, which quotes the
+table and column names.
+"""
+import datetime
+import io
+from collections import Counter
+from typing import Any, Iterable, List
+
+from psycopg2 import sql
+
+from tracker.models import Issue, IssueCPEMatch, IssueReference, IssueWeakness
+
+from . import NVD_UPDATED_FIELDS, CVERecord, cpe_vendor_product, issue_fields
+
+STAGING_ISSUES = "nvd_staging_issue"
+STAGING_REFERENCES = "nvd_staging_reference"
+STAGING_WEAKNESSES = "nvd_staging_weakness"
+STAGING_CPE_MATCHES = "nvd_staging_cpe_match"
+CHANGED_ISSUES = "nvd_staging_changed"
+
+# fields of the issue table that are loaded from the staging table, all
+# other fields get their default value
+STAGED_ISSUE_FIELDS = (
+    "identifier",
+    "description",
+    "published_date",
+    "cvss3_base_score",
+    "cvss3_vector",
+    "cvss2_base_score",
+    "cvss2_vector",
+    "nvd_digest",
+)
+
+# fields of the CPE match table that are loaded from the staging table
+STAGED_CPE_MATCH_FIELDS = (
+    "criteria",
+    "vendor",
+    "product",
+    "vulnerable",
+    "version_start_including",
+    "version_start_excluding",
+    "version_end_including",
+    "version_end_excluding",
+)
+
+
+def copy_escape(value: Any) -> str:
+    """
+    Escape a value for the text format of `COPY`.
+    """
+    if value is None:
+        return "\\N"
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    value = str(value)
+    return (
+        value.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def copy_rows(rows: Iterable[List[Any]]) -> io.StringIO:
+    """
+    Format the given rows in the text format of `COPY`.
+    """
+    data = io.StringIO()
+    for row in rows:
+        data.write("\t".join(copy_escape(value) for value in row))
+        data.write("\n")
+    data.seek(0)
+    return data
+
+
+class BulkLoader:
+    """
+    Loads NVD records into staging tables with `COPY` and merges them into
+    the issue and reference tables once all records have been staged.
+
+    The same identifier may be staged more than once (e.g. from a year and
+    the `modified` feed), the record that has been staged last wins.
+    """
+
+    def __init__(self, connection):
+        if connection.vendor != "postgresql":
+            raise ValueError(f"Bulk loading is not supported on {connection.vendor}")
+        if not connection.in_atomic_block:
+            raise RuntimeError("The bulk loader must be used within a transaction")
+
+        self.connection = connection
+        self.position = 0
+        self.create_staging_tables()
+
+    def create_staging_tables(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                sql.SQL(
+                    """
+                    CREATE TEMPORARY TABLE {} (
+                        position bigint NOT NULL,
+                        identifier varchar(32) NOT NULL,
+                        description text NOT NULL,
+                        published_date timestamp with time zone,
+                        cvss3_base_score numeric(3, 1),
+                        cvss3_vector varchar(64) NOT NULL,
+                        cvss2_base_score numeric(3, 1),
+                        cvss2_vector varchar(64) NOT NULL,
+                        nvd_digest varchar(64) NOT NULL
+                    ) ON COMMIT DROP
+                    """
+                ).format(sql.Identifier(STAGING_ISSUES))
+            )
+            cursor.execute(
+                sql.SQL(
+                    """
+                    CREATE TEMPORARY TABLE {} (
+                        position bigint NOT NULL,
+                        uri text NOT NULL
+                    ) ON COMMIT DROP
+                    """
+                ).format(sql.Identifier(STAGING_REFERENCES))
+            )
+            cursor.execute(
+                sql.SQL(
+                    """
+                    CREATE TEMPORARY TABLE {} (
+                        position bigint NOT NULL,
+                        cwe varchar(32) NOT NULL
+                    ) ON COMMIT DROP
+                    """
+                ).format(sql.Identifier(STAGING_WEAKNESSES))
+            )
+            cursor.execute(
+                sql.SQL(
+                    """
+                    CREATE TEMPORARY TABLE {} (
+                        position bigint NOT NULL,
+                        criteria text NOT NULL,
+                        vendor varchar(255) NOT NULL,
+                        product varchar(255) NOT NULL,
+                        vulnerable boolean NOT NULL,
+                        version_start_including varchar(128) NOT NULL,
+                        version_start_excluding varchar(128) NOT NULL,
+                        version_end_including varchar(128) NOT NULL,
+                        version_end_excluding varchar(128) NOT NULL
+                    ) ON COMMIT DROP
+                    """
+                ).format(sql.Identifier(STAGING_CPE_MATCHES))
+            )
+            cursor.execute(
+                sql.SQL(
+                    """
+                    CREATE TEMPORARY TABLE {} (
+                        id integer NOT NULL,
+                        position bigint NOT NULL,
+                        created boolean NOT NULL
+                    ) ON COMMIT DROP
+                    """
+                ).format(sql.Identifier(CHANGED_ISSUES))
+            )
+
+    def copy(self, records: Iterable[CVERecord]):
+        """
+        Stage the given records.
+        """
+        issues = []
+        references = []
+        weaknesses = []
+        cpe_matches = []
+        for record in records:
+            self.position += 1
+            position = self.position
+            fields = issue_fields(record)
+            issues.append([position] + [fields[name] for name in STAGED_ISSUE_FIELDS])
+            references += [[position, uri] for uri in set(record.references)]
+            weaknesses += [[position, cwe] for cwe in record.cwes]
+            for match in record.cpe_matches:
+                vendor, product = cpe_vendor_product(match.criteria)
+                values = dict(match._asdict(), vendor=vendor, product=product)
+                cpe_matches.append(
+                    [position] + [values[name] for name in STAGED_CPE_MATCH_FIELDS]
+                )
+
+        with self.connection.cursor() as cursor:
+            for table, rows in (
+                (STAGING_ISSUES, issues),
+                (STAGING_REFERENCES, references),
+                (STAGING_WEAKNESSES, weaknesses),
+                (STAGING_CPE_MATCHES, cpe_matches),
+            ):
+                cursor.copy_expert(
+                    sql.SQL("COPY {} FROM STDIN").format(sql.Identifier(table)),
+                    copy_rows(rows),
+                )
+
+    def merge(self) -> Counter:
+        """
+        Merge the staged records into the issue and reference tables. Issues
+        whose digest did not change are not touched. Returns the number of
+        issues and references that have been created, updated, left alone or
+        deleted.
+        """
+        fields = [f for f in Issue._meta.concrete_fields if not f.primary_key]
+        defaults = [
+            f.get_db_prep_save(f.get_default(), self.connection)
+            for f in fields
+            if f.name not in STAGED_ISSUE_FIELDS
+        ]
+
+        def issue_column(name: str) -> sql.Identifier:
+            return sql.Identifier(Issue._meta.get_field(name).column)
+
+        names = dict(
+            staged_issues=sql.Identifier(STAGING_ISSUES),
+            staged_references=sql.Identifier(STAGING_REFERENCES),
+            changed_issues=sql.Identifier(CHANGED_ISSUES),
+            issue_table=sql.Identifier(Issue._meta.db_table),
+            reference_table=sql.Identifier(IssueReference._meta.db_table),
+            columns=sql.SQL(", ").join(sql.Identifier(f.column) for f in fields),
+            values=sql.SQL(", ").join(
+                sql.Identifier("s", f.name)
+                if f.name in STAGED_ISSUE_FIELDS
+                else sql.Placeholder()
+                for f in fields
+            ),
+            updates=sql.SQL(",\n").join(
+                sql.SQL("{column} = EXCLUDED.{column}").format(
+                    column=issue_column(name)
+                )
+                for name in NVD_UPDATED_FIELDS
+            ),
+            id=issue_column("id"),
+            identifier=issue_column("identifier"),
+            published_date=issue_column("published_date"),
+            nvd_digest=issue_column("nvd_digest"),
+            issue_id=sql.Identifier(IssueReference._meta.get_field("issue").column),
+            uri=sql.Identifier(IssueReference._meta.get_field("uri").column),
+        )
+
+        def execute(cursor, statement: str, params=None):
+            cursor.execute(sql.SQL(statement).format(**names), params)
+
+        with self.connection.cursor() as cursor:
+            # drop everything but the last staged record of each identifier
+            execute(
+                cursor,
+                """
+                DELETE FROM {staged_issues} a
+                USING {staged_issues} b
+                WHERE a.identifier = b.identifier AND a.position < b.position
+                """,
+            )
+            execute(
+                cursor,
+                """
+                DELETE FROM {staged_references} r
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {staged_issues} s WHERE s.position = r.position
+                )
+                """,
+            )
+            execute(cursor, "SELECT count(*) FROM {staged_issues}")
+            (staged,) = cursor.fetchone()
+            execute(cursor, "CREATE INDEX ON {staged_references} (position)")
+            execute(cursor, "ANALYZE {staged_issues}")
+            execute(cursor, "ANALYZE {staged_references}")
+
+            # The description and scores follow the NVD, the published date is
+            # only filled in for issues that were created before it was
+            # imported. Rows that have been inserted rather than updated have
+            # no xmax.
+            execute(
+                cursor,
+                """
+                WITH upserted AS (
+                    INSERT INTO {issue_table} ({columns})
+                    SELECT {values} FROM {staged_issues} s
+                    ON CONFLICT ({identifier}) DO UPDATE SET
+                        {updates},
+                        {published_date} = COALESCE(
+                            {issue_table}.{published_date},
+                            EXCLUDED.{published_date}
+                        )
+                    WHERE {issue_table}.{nvd_digest} <> EXCLUDED.{nvd_digest}
+                    RETURNING
+                        {id} AS id,
+                        {identifier} AS identifier,
+                        xmax = 0 AS created
+                )
+                INSERT INTO {changed_issues} (id, position, created)
+                SELECT u.id, s.position, u.created
+                FROM upserted u JOIN {staged_issues} s USING (identifier)
+                """,
+                defaults,
+            )
+            changed = cursor.rowcount
+            execute(cursor, "SELECT count(*) FROM {changed_issues} WHERE created")
+            (created,) = cursor.fetchone()
+
+            execute(
+                cursor,
+                """
+                DELETE FROM {reference_table} r
+                USING {changed_issues} c
+                WHERE r.{issue_id} = c.id AND NOT EXISTS (
+                    SELECT 1 FROM {staged_references} s
+                    WHERE s.position = c.position AND s.uri = r.{uri}
+                )
+                """,
+            )
+            references_deleted = cursor.rowcount
+            execute(
+                cursor,
+                """
+                INSERT INTO {reference_table} ({issue_id}, {uri})
+                SELECT c.id, s.uri
+                FROM {changed_issues} c
+                JOIN {staged_references} s ON s.position = c.position
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {reference_table} r
+                    WHERE r.{issue_id} = c.id AND r.{uri} = s.uri
+                )
+                """,
+            )
+            references_created = cursor.rowcount
+
+            self.replace_weaknesses_and_cpe_matches(cursor)
+
+        return Counter(
+            issues_created=created,
+            issues_updated=changed - created,
+            issues_unchanged=staged - changed,
+            references_created=references_created,
+            references_deleted=references_deleted,
+        )
+
+    def replace_weaknesses_and_cpe_matches(self, cursor):
+        """
+        Replace the weaknesses and CPE matches of the changed issues with the
+        staged ones. They are never edited locally so there is nothing to
+        keep.
+        """
+        for model, staging_table, staged_fields in (
+            (IssueWeakness, STAGING_WEAKNESSES, ("cwe",)),
+            (IssueCPEMatch, STAGING_CPE_MATCHES, STAGED_CPE_MATCH_FIELDS),
+        ):
+            names = dict(
+                table=sql.Identifier(model._meta.db_table),
+                staging_table=sql.Identifier(staging_table),
+                changed_issues=sql.Identifier(CHANGED_ISSUES),
+                issue_id=sql.Identifier(model._meta.get_field("issue").column),
+                columns=sql.SQL(", ").join(
+                    sql.Identifier(model._meta.get_field(name).column)
+                    for name in staged_fields
+                ),
+                values=sql.SQL(", ").join(
+                    sql.Identifier("s", name) for name in staged_fields
+                ),
+            )
+
+            cursor.execute(
+                sql.SQL(
+                    """
+                    DELETE FROM {table} t
+                    USING {changed_issues} c
+                    WHERE t.{issue_id} = c.id
+                    """
+                ).format(**names)
+            )
+            cursor.execute(
+                sql.SQL(
+                    """
+                    INSERT INTO {table} ({issue_id}, {columns})
+                    SELECT c.id, {values}
+                    FROM {changed_issues} c
+                    JOIN {staging_table} s ON s.position = c.position
+                    """
+                ).format(**names)
+            )
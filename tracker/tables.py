@@ -1,4 +1,5 @@
 import django_tables2 as tables
+from django.db.models import F
 from django.urls import reverse
 from django.utils.html import format_html
 
@@ -6,15 +7,27 @@ from .models import Issue
 
 
 class IssueTable(tables.Table):
+    cvss_score = tables.Column(verbose_name="CVSS")
+
     class Meta:
         model = Issue
         fields = (
             "identifier",
+            "cvss_score",
             "description",
             "published_date",
         )
         template_name = "django_tables2/bootstrap4.html"
 
+    def order_cvss_score(self, queryset, is_descending):
+        # issues without a score come last in both directions
+        score = F("cvss_score")
+        if is_descending:
+            order = score.desc(nulls_last=True)
+        else:
+            order = score.asc(nulls_last=True)
+        return queryset.order_by(order), True
+
     def render_identifier(self, value) -> str:
         return format_html(
             '<a href="{url}">{identifier}</a>',
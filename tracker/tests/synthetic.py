@@ -0,0 +1,191 @@
+"""
+Synthetic NVD feeds
+
+Generates NVD JSON feeds (version 1.1) of arbitrary size on the fly. The feed
+is produced lazily while it is being read so even feeds with hundreds of
+thousands of items do not require a copy of the document in memory. This is
+used to verify that the importer works in bounded memory and to benchmark
+repeated imports of feeds that changed in between.
+"""
+import io
+import json
+import shutil
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, Union
+
+
+def is_selected(index: int, fraction: float, salt: int = 0) -> bool:
+    """
+    Deterministically select about `fraction` of all indices, spread over the
+    whole range.
+    """
+    return (index * 2654435761 + salt) % 10000 < fraction * 10000
+
+
+def synthetic_cve_item(
+    index: int, revision: int = 0, changed: bool = False, reference_churn: bool = False
+) -> Dict[str, Any]:
+    identifier = f"CVE-2099-{index:06d}"
+    description = f"Synthetic vulnerability number {index} in some library."
+    if changed:
+        description += f" Revised in revision {revision}."
+    urls = [f"https://example.com/advisories/{index}/{n}" for n in range(3)]
+    if reference_churn:
+        urls[-1] = f"https://example.com/advisories/{index}/revision-{revision}"
+
+    return {
+        "cve": {
+            "data_type": "CVE",
+            "data_format": "MITRE",
+            "data_version": "4.0",
+            "CVE_data_meta": {"ID": identifier, "ASSIGNER": "cve@mitre.org"},
+            "references": {
+                "reference_data": [
+                    {
+                        "url": url,
+                        "name": f"reference {n}",
+                        "refsource": "MISC",
+                        "tags": [],
+                    }
+                    for n, url in enumerate(urls)
+                ]
+            },
+            "description": {
+                "description_data": [
+                    {
+                        "lang": "en",
+                        "value": description,
+                    }
+                ]
+            },
+            "problemtype": {
+                "problemtype_data": [
+                    {"description": [{"lang": "en", "value": f"CWE-{index % 1000}"}]}
+                ]
+            },
+        },
+        "configurations": {
+            "CVE_data_version": "4.0",
+            "nodes": [
+                {
+                    "operator": "OR",
+                    "children": [],
+                    "cpe_match": [
+                        {
+                            "vulnerable": True,
+                            "cpe23Uri": f"cpe:2.3:a:vendor{index % 100}:library{index}:*:*:*:*:*:*:*:*",
+                            "versionEndExcluding": f"1.{index % 10}.0",
+                            "cpe_name": [],
+                        }
+                    ],
+                }
+            ],
+        },
+        "impact": {
+            "baseMetricV3": {
+                "cvssV3": {
+                    "version": "3.1",
+                    "vectorString": "CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:H/I:H/A:H",
+                    "baseScore": 9.8,
+                    "baseSeverity": "CRITICAL",
+                },
+            },
+            "baseMetricV2": {
+                "cvssV2": {
+                    "version": "2.0",
+                    "vectorString": "AV:N/AC:L/Au:N/C:P/I:P/A:P",
+                    "baseScore": 7.5,
+                },
+                "severity": "HIGH",
+            },
+        },
+        "publishedDate": "2099-01-01T00:00Z",
+        "lastModifiedDate": "2099-01-02T00:00Z",
+    }
+
+
+def synthetic_feed_chunks(
+    count: int,
+    revision: int = 0,
+    new: int = 0,
+    changed: float = 0.0,
+    reference_churn: float = 0.0,
+) -> Iterator[bytes]:
+    """
+    Generate the `count` items of the feed followed by `new` additional
+    items. For revisions other than 0 about a fraction of `changed` items has
+    a different description and a fraction of `reference_churn` items has one
+    of the references replaced.
+    """
+    total = count + new
+    header = {
+        "CVE_data_type": "CVE",
+        "CVE_data_format": "MITRE",
+        "CVE_data_version": "4.0",
+        "CVE_data_numberOfCVEs": str(total),
+        "CVE_data_timestamp": "2099-01-02T00:00Z",
+    }
+    yield (json.dumps(header)[:-1] + ', "CVE_Items": [').encode()
+    for index in range(total):
+        item = json.dumps(
+            synthetic_cve_item(
+                index,
+                revision=revision,
+                changed=revision > 0 and is_selected(index, changed, salt=1),
+                reference_churn=revision > 0
+                and is_selected(index, reference_churn, salt=2),
+            )
+        )
+        yield (item if index == 0 else "," + item).encode()
+    yield b"]}"
+
+
+def gzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class SyntheticFeed(io.RawIOBase):
+    """
+    A read-only binary stream of a synthetic NVD feed with `count` items. When
+    `compress` is set the stream is gzip compressed just like the feeds served
+    by the NVD. The remaining arguments are passed to `synthetic_feed_chunks`
+    to describe the churn in later revisions of the feed.
+    """
+
+    def __init__(self, count: int, compress: bool = True, **churn):
+        self.chunks = synthetic_feed_chunks(count, **churn)
+        if compress:
+            self.chunks = gzip_chunks(self.chunks)
+        self.pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self.pending:
+            try:
+                self.pending = next(self.chunks)
+            except StopIteration:
+                return 0
+
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+
+def write_synthetic_feed(path: Union[str, Path], count: int, **churn) -> Path:
+    """
+    Write a compressed synthetic feed to the given path so it can be imported
+    like a downloaded feed.
+    """
+    path = Path(path)
+    with open(path, "wb") as fh:
+        shutil.copyfileobj(SyntheticFeed(count, **churn), fh)
+    return path
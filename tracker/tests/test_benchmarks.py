@@ -0,0 +1,339 @@
+"""
+Benchmarks that are too slow to run as part of the regular test suite.
+Run them with `RUN_BENCHMARKS=1 pytest tracker/tests/test_benchmarks.py -s`.
+
+The import benchmarks run against the configured database. To run them on
+PostgreSQL point the database settings to a server and use the regular
+settings module, e.g.:
+
+    RUN_BENCHMARKS=1 NIXOS_SECURITY_TRACKER_DATABASE_TYPE=postgresql \
+        pytest --ds nixos_security_tracker.settings \
+        tracker/tests/test_benchmarks.py -s
+
+The number of CVEs in the synthetic feeds is set with BENCHMARK_NVD_SIZE.
+"""
+import os
+import re
+import time
+import tracemalloc
+from io import StringIO
+from typing import List, NamedTuple, Tuple
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from tracker.github_events import (
+    IDENTIFIER_REGEXP,
+    find_identifiers,
+    normalize_identifier,
+)
+from tracker.models import GitHubEvent, GitHubEventReference, Issue, IssueReference
+from tracker.nixpkgs.versions import VersionRange, evaluate_ranges
+from tracker.nvd import gzip_decompress, iter_cve_items, normalize_cve_item
+from tracker.tests.synthetic import SyntheticFeed, write_synthetic_feed
+
+benchmark = pytest.mark.skipif(
+    not os.getenv("RUN_BENCHMARKS", False),
+    reason="Benchmarks only run when RUN_BENCHMARKS is set",
+)
+
+# peak (Python) memory allowed for streaming a feed of any size
+MEMORY_BOUND = 16 * 1024 * 1024
+
+BENCHMARK_SIZE = int(os.getenv("BENCHMARK_NVD_SIZE", 100_000))
+
+requires_postgresql = pytest.mark.skipif(
+    connection.vendor != "postgresql", reason="requires a PostgreSQL database"
+)
+
+
+@benchmark
+def test_parse_synthetic_feed_memory():
+    """
+    Parse a synthetic feed with 300k items (~600MB decompressed) and assert
+    that the peak memory usage stays bounded.
+    """
+    count = 300_000
+    tracemalloc.start()
+    try:
+        parsed = 0
+        for item in iter_cve_items(gzip_decompress(SyntheticFeed(count))):
+            normalize_cve_item(item)
+            parsed += 1
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    print(f"parsed {parsed} items with a peak memory usage of {peak} bytes")
+    assert parsed == count
+    assert peak < MEMORY_BOUND
+
+
+@benchmark
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_synthetic_feed_memory(request_get):
+    """
+    Import a synthetic feed with 300k items through the management command
+    and assert that the peak memory usage stays bounded.
+    """
+    count = 300_000
+    response = MagicMock()
+    response.status_code = 200
+    response.headers = {}
+    response.raw = SyntheticFeed(count)
+    request_get.return_value = response
+
+    tracemalloc.start()
+    try:
+        call_command("import_nvd", "https://synthetic")
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    print(f"imported {count} items with a peak memory usage of {peak} bytes")
+    assert Issue.objects.count() == count
+    assert peak < MEMORY_BOUND
+
+
+class ImportMeasurement(NamedTuple):
+    seconds: float
+    peak_memory: int
+    queries: int
+
+
+def measure_import_nvd(*args: str) -> ImportMeasurement:
+    """
+    Run `import_nvd` with the given arguments and measure the wall time, the
+    peak (Python) memory usage and the number of queries. The wall time
+    includes the overhead of tracing the memory allocations. Data loaded with
+    `COPY` is not counted as a query.
+    """
+    queries = 0
+
+    def count_queries(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    tracemalloc.start()
+    try:
+        with connection.execute_wrapper(count_queries):
+            start = time.perf_counter()
+            call_command("import_nvd", *args, stdout=StringIO())
+            seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return ImportMeasurement(seconds, peak, queries)
+
+
+def report(title: str, results: List[Tuple[str, ImportMeasurement]]):
+    print()
+    print(f"{title} ({connection.vendor}, {BENCHMARK_SIZE} CVEs)")
+    for name, result in results:
+        print(
+            f"  {name:<24} {result.seconds:8.2f} s "
+            f"{result.peak_memory / 1024 / 1024:8.1f} MiB "
+            f"{result.queries:8d} queries"
+        )
+
+
+def churned_feeds(directory) -> Tuple[str, str, int]:
+    """
+    Write a synthetic feed and a revision of it in which 5% of the CVEs are
+    new, 5% have a new description and 5% have a replaced reference.
+    """
+    new = BENCHMARK_SIZE // 20
+    initial = write_synthetic_feed(directory / "initial.json.gz", BENCHMARK_SIZE)
+    revised = write_synthetic_feed(
+        directory / "revised.json.gz",
+        BENCHMARK_SIZE,
+        revision=1,
+        new=new,
+        changed=0.05,
+        reference_churn=0.05,
+    )
+    return str(initial), str(revised), new
+
+
+@benchmark
+@pytest.mark.django_db(transaction=True)
+def test_import_nvd_benchmark(tmp_path):
+    """
+    Import synthetic feeds from disk into an empty database, import the same
+    feed again and then import a revision of it with some churn.
+    """
+    initial, revised, new = churned_feeds(tmp_path)
+
+    results = [
+        ("initial import", measure_import_nvd(initial)),
+        ("unchanged re-import", measure_import_nvd(initial)),
+        ("re-import with churn", measure_import_nvd(revised)),
+    ]
+    report("import_nvd", results)
+
+    assert Issue.objects.count() == BENCHMARK_SIZE + new
+    assert IssueReference.objects.count() == (BENCHMARK_SIZE + new) * 3
+
+
+@benchmark
+@requires_postgresql
+@pytest.mark.django_db(transaction=True)
+def test_import_nvd_bulk_load_benchmark(tmp_path):
+    """
+    The same as `test_import_nvd_benchmark` with the PostgreSQL bulk loader.
+    """
+    initial, revised, new = churned_feeds(tmp_path)
+
+    results = [
+        ("initial import", measure_import_nvd(initial, "--bulk-load")),
+        ("unchanged re-import", measure_import_nvd(initial, "--bulk-load")),
+        ("re-import with churn", measure_import_nvd(revised, "--bulk-load")),
+    ]
+    report("import_nvd --bulk-load", results)
+
+    assert Issue.objects.count() == BENCHMARK_SIZE + new
+    assert IssueReference.objects.count() == (BENCHMARK_SIZE + new) * 3
+
+
+@benchmark
+def test_evaluate_ranges_benchmark():
+    """
+    Evaluate the versions of 1M (issue, package) pairs against their ranges,
+    about what re-evaluating all candidates after a channel bump amounts to.
+    """
+    count = 1_000_000
+    queries = [
+        (
+            f"{n % 7}.{n % 13}.{n % 101}",
+            [
+                VersionRange(f"{n % 5}.0", "", "", f"{n % 7}.{n % 11}.{n % 97}"),
+                VersionRange.exactly(f"{n % 3}.{n % 17}"),
+            ],
+        )
+        for n in range(count)
+    ]
+
+    start = time.perf_counter()
+    results = evaluate_ranges(queries)
+    duration = time.perf_counter() - start
+    print(f"\nevaluate_ranges: {count} pairs in {duration:.1f}s")
+
+    assert len(results) == count
+    assert duration < 30
+
+
+@benchmark
+@pytest.mark.django_db(transaction=True)
+def test_search_cve_references_backfill_benchmark():
+    """
+    Rescan BENCHMARK_SIZE pull request events for CVE references, in one
+    process and in a pool of one process per core.
+    """
+    body = "Backport of the fix for CVE-2020-{}. " + "Lorem ipsum dolor sit. " * 40
+    GitHubEvent.objects.bulk_create(
+        (
+            GitHubEvent(
+                kind="pull_request",
+                data={
+                    "pull_request": {"number": n, "title": "x", "body": body.format(n)}
+                },
+            )
+            for n in range(BENCHMARK_SIZE)
+        ),
+        batch_size=1000,
+    )
+
+    print()
+    print(
+        f"search_cve_references --full ({connection.vendor}, {BENCHMARK_SIZE} events)"
+    )
+    for workers in sorted({1, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        call_command(
+            "search_cve_references",
+            "--full",
+            "--workers",
+            str(workers),
+            "--shard-size",
+            "5000",
+            verbosity=0,
+            stdout=StringIO(),
+        )
+        print(f"  {workers:>3} workers {time.perf_counter() - start:8.2f} s")
+
+    assert GitHubEventReference.objects.count() == BENCHMARK_SIZE
+
+
+def nixpkgs_comment_bodies(count: int) -> List[str]:
+    """
+    Comment bodies like the ones on Nixpkgs pull requests, 2% of them mention
+    a vulnerability.
+    """
+    templates = [
+        "@ofborg build {package}",
+        "Result of `nixpkgs-review pr {number}` run on x86_64-linux [1]\n"
+        "<details>\n  <summary>1 package built:</summary>\n  <ul>\n"
+        "    <li>{package}</li>\n  </ul>\n</details>",
+        "Successfully created backport PR #{number} for `release-20.09`.",
+        "Could you squash the commits and use `{package}: 1.2.3 -> 1.2.4` as the "
+        "commit message? Otherwise LGTM.",
+        "This breaks the build on aarch64-linux:\n```\nerror: builder for "
+        "'/nix/store/{number}-{package}-1.2.4.drv' failed with exit code 2\n```",
+        "> Motivation for this change\n\nUpdate to the latest release, see the "
+        "changelog at https://github.com/{package}/{package}/releases",
+    ]
+    vulnerable = [
+        "Fixes CVE-2021-{number}, please backport to 20.09.",
+        "The update addresses GHSA-8r8j-xvfj-36f9 and PYSEC-2021-{number}.",
+        "Backport of the fix for Cve-2021-{number}.",
+    ]
+    packages = ["openssl", "thunderbird", "python39Packages.requests", "nodejs"]
+    bodies = []
+    for n in range(count):
+        if n % 50 == 0:
+            template = vulnerable[n // 50 % len(vulnerable)]
+        else:
+            template = templates[n % len(templates)]
+        bodies.append(template.format(number=n, package=packages[n % len(packages)]))
+    return bodies
+
+
+@benchmark
+def test_find_identifiers_benchmark():
+    """
+    Compare searching comment bodies with the combined pattern and its
+    prefilter to searching them with a plain pattern for CVEs only.
+    """
+    bodies = nixpkgs_comment_bodies(200_000)
+    cve_regexp = re.compile(r"\b(?P<id>CVE-[0-9]+-[0-9]+)\b")
+
+    def findall_cves(text: List[str]):
+        results: List[str] = []
+        for s in text:
+            results += cve_regexp.findall(s)
+        return set(results)
+
+    print()
+    print(f"identifiers in {len(bodies)} comment bodies")
+    for name, find in [
+        ("CVE_REGEXP.findall", findall_cves),
+        ("find_identifiers", find_identifiers),
+    ]:
+        start = time.perf_counter()
+        found = sum(len(find([body])) for body in bodies)
+        seconds = time.perf_counter() - start
+        print(
+            f"  {name:<24} {seconds * 1e6 / len(bodies):8.2f} µs/event "
+            f"{found:8d} identifiers"
+        )
+
+    # the prefilter does not skip any text that mentions an identifier
+    for body in bodies:
+        assert find_identifiers([body]) == {
+            normalize_identifier(match) for match in IDENTIFIER_REGEXP.finditer(body)
+        }
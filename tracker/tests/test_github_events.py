@@ -1,14 +1,24 @@
 import json
 import os
+import time
 from io import StringIO
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 from django.core.management import call_command
+from django.urls import reverse
 
-from tracker.github_events import find_cve_identifiers, search_for_cve_references
+from tracker.github_events import (
+    find_cve_identifiers,
+    find_identifiers,
+    search_for_cve_references,
+)
+from tracker.github_events.buffer import EventBuffer, store_events
 from tracker.github_events.signature import compute_github_hmac, verify_github_signature
-from tracker.models import GitHubEvent
+from tracker.management.commands.search_cve_references import id_shards
+from tracker.models import GitHubEvent, GitHubEventReference, GitHubEventScan
+from tracker.tests.factories import IssueFactory
 
 shared_secret = b"00000000000"
 signature = "sha1-76f675f5babc40e8cc64405dcaa9049541380c18"
@@ -46,6 +56,34 @@ def test_cve_regexp(string, result):
         assert not m, "Expected no result but got something"
 
 
+@pytest.mark.parametrize(
+    "string, result",
+    [
+        ("fixes cve-2021-3449", {"CVE-2021-3449"}),
+        ("Fixes Cve-2021-3449", {"CVE-2021-3449"}),
+        (
+            "see Ghsa-8r8j-xvfj-36f9 and RustSec-2021-0001",
+            {"GHSA-8r8j-xvfj-36f9", "RUSTSEC-2021-0001"},
+        ),
+        ("See GHSA-8R8J-XVFJ-36F9.", {"GHSA-8r8j-xvfj-36f9"}),
+        (
+            "ghsa-8r8j-xvfj-36f9 and CVE-2021-3449",
+            {"GHSA-8r8j-xvfj-36f9", "CVE-2021-3449"},
+        ),
+        (
+            "PYSEC-2021-19, RUSTSEC-2021-0001, GO-2022-0001 (OSV-2020-111)",
+            {"PYSEC-2021-19", "RUSTSEC-2021-0001", "GO-2022-0001", "OSV-2020-111"},
+        ),
+        # `a`, `b`, `0` and `1` are not part of the alphabet of GHSA IDs
+        ("GHSA-abab-0101-xvfj", set()),
+        ("cargo-2021-0001", set()),
+        ("nixpkgs-review pr 12345 on x86_64-linux", set()),
+    ],
+)
+def test_find_identifiers(string, result):
+    assert find_identifiers([string]) == result
+
+
 @pytest.fixture
 def issue_comment_json():
     """Returns the parsed result of the issue_comment JSON example as
@@ -109,9 +147,336 @@ def test_search_cve_references_command(issue_comment_json, pull_request_json):
     GitHubEvent.objects.create(kind="pull_request", data=pull_request_json)
 
     call_command("search_cve_references", stdout=out)
+    assert GitHubEventReference.objects.count() == 2
 
     assert "CVE-1988-1234" in out.getvalue()
     assert "issue_comment" in out.getvalue()
 
     assert "CVE-1999-1234" in out.getvalue()
     assert "pull_request" in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_search_cve_references_command_is_incremental(
+    issue_comment_json, pull_request_json
+):
+    GitHubEvent.objects.create(kind="issue_comment", data=issue_comment_json)
+    call_command("search_cve_references", stdout=StringIO())
+
+    GitHubEvent.objects.create(kind="push", data={})
+    pull_request = GitHubEvent.objects.create(
+        kind="pull_request", data=pull_request_json
+    )
+    out = StringIO()
+    call_command("search_cve_references", stdout=out)
+    assert "CVE-1988-1234" not in out.getvalue()
+    assert "CVE-1999-1234" in out.getvalue()
+    assert "Scanned 1 events" in out.getvalue()
+    assert GitHubEventScan.objects.get().last_event_id == pull_request.pk
+
+    out = StringIO()
+    call_command("search_cve_references", stdout=out)
+    assert "Scanned 0 events" in out.getvalue()
+
+    out = StringIO()
+    call_command("search_cve_references", "--full", stdout=out)
+    assert "CVE-1988-1234" in out.getvalue()
+    assert "Scanned 2 events" in out.getvalue()
+    assert GitHubEventReference.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_search_cve_references_command_full_replaces_links(issue_comment_json):
+    event = GitHubEvent.objects.create(kind="issue_comment", data=issue_comment_json)
+    # found by earlier rules
+    GitHubEventReference.objects.create(event=event, identifier_id="CVE-2000-0001")
+
+    call_command("search_cve_references", stdout=StringIO())
+    assert set(event.references.values_list("identifier_id", flat=True)) == {
+        "CVE-1988-1234",
+        "CVE-2000-0001",
+    }
+
+    call_command("search_cve_references", "--full", stdout=StringIO())
+    assert set(event.references.values_list("identifier_id", flat=True)) == {
+        "CVE-1988-1234"
+    }
+
+
+@pytest.mark.parametrize(
+    "last, end, size, expected",
+    [
+        (0, 0, 10, []),
+        (0, 10, 10, [(0, 10)]),
+        (5, 30, 10, [(5, 15), (15, 25), (25, 30)]),
+        (30, 20, 10, []),
+    ],
+)
+def test_id_shards(last, end, size, expected):
+    assert id_shards(last, end, size) == expected
+
+
+@pytest.mark.django_db(transaction=True)
+def test_search_cve_references_command_in_parallel(
+    issue_comment_json, pull_request_json
+):
+    for n in range(10):
+        GitHubEvent.objects.create(kind="issue_comment", data=issue_comment_json)
+        GitHubEvent.objects.create(kind="pull_request", data=pull_request_json)
+        GitHubEvent.objects.create(kind="push", data={})
+
+    out = StringIO()
+    call_command(
+        "search_cve_references",
+        "--full",
+        "--workers",
+        "3",
+        "--shard-size",
+        "4",
+        stdout=out,
+    )
+    assert "Scanned 20 events" in out.getvalue()
+    assert GitHubEventReference.objects.count() == 20
+    assert (
+        GitHubEventScan.objects.get().last_event_id
+        == GitHubEvent.objects.latest("pk").pk
+    )
+
+
+def make_event(delivery: str) -> GitHubEvent:
+    return GitHubEvent(kind="push", delivery=delivery, data={"delivery": delivery})
+
+
+@pytest.mark.django_db
+def test_event_buffer_stores_batches(django_assert_num_queries):
+    buffer = EventBuffer(batch_size=2, interval=60)
+    for delivery in ["a", "b", "c", "a"]:
+        buffer.events.append(make_event(delivery))
+
+    # events without text are stored with a single query per batch
+    with django_assert_num_queries(2):
+        buffer.flush()
+
+    assert sorted(GitHubEvent.objects.values_list("delivery", flat=True)) == [
+        "a",
+        "b",
+        "c",
+    ]
+    assert buffer.events == []
+
+
+@pytest.mark.django_db
+def test_store_events_queries(
+    issue_comment_json, pull_request_json, django_assert_num_queries
+):
+    events = [
+        GitHubEvent.from_delivery(
+            kind, data, delivery=f"{kind}-{n}-{compact}", compact=compact
+        )
+        for n in range(5)
+        for kind, data in [
+            ("issue_comment", issue_comment_json),
+            ("pull_request", pull_request_json),
+        ]
+        for compact in (False, True)
+    ]
+    # the text of the stored events is read along with them
+    with django_assert_num_queries(6):
+        store_events(events)
+    assert GitHubEventReference.objects.count() == 20
+
+
+@pytest.mark.django_db
+def test_store_events_links_cve_references(issue_comment_json, pull_request_json):
+    issue = IssueFactory(identifier="CVE-1999-1234")
+    store_events(
+        [
+            GitHubEvent(kind="issue_comment", delivery="a", data=issue_comment_json),
+            GitHubEvent(kind="pull_request", delivery="b", data=pull_request_json),
+            make_event("c"),
+        ]
+    )
+    pull_request = GitHubEvent.objects.get(delivery="b")
+    assert list(GitHubEvent.objects.filter(references__identifier=issue)) == [
+        pull_request
+    ]
+    # mentions of CVEs that have not been imported are kept as well
+    assert set(
+        GitHubEventReference.objects.values_list("event__delivery", "identifier_id")
+    ) == {("a", "CVE-1988-1234"), ("b", "CVE-1999-1234")}
+
+    # storing a delivery again does not link it again
+    store_events([GitHubEvent(kind="pull_request", delivery="b", data={})])
+    assert GitHubEventReference.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_event_buffer_keeps_events_that_failed_to_store():
+    buffer = EventBuffer(batch_size=2, interval=60)
+    events = [make_event(delivery) for delivery in "abc"]
+    buffer.events.extend(events)
+
+    with patch("tracker.github_events.buffer.store_events", side_effect=Exception):
+        buffer.flush()
+    assert buffer.events == events
+
+    buffer.flush()
+    assert GitHubEvent.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_event_buffer_isolates_malformed_events(caplog):
+    buffer = EventBuffer(batch_size=10, interval=60)
+    buffer.events.extend(
+        [
+            make_event("a"),
+            # cannot be stored
+            GitHubEvent(kind="push", delivery="b", data={"bad": object()}),
+            # cannot be searched for references
+            GitHubEvent(kind="issue_comment", delivery="c", data={"comment": None}),
+            make_event("d"),
+        ]
+    )
+    buffer.flush()
+
+    assert sorted(GitHubEvent.objects.values_list("delivery", flat=True)) == [
+        "a",
+        "c",
+        "d",
+    ]
+    assert buffer.events == []
+    assert "kind push (delivery b)" in caplog.text
+
+
+@pytest.mark.django_db(transaction=True)
+def test_event_buffer_flushes_full_batches():
+    buffer = EventBuffer(batch_size=2, interval=60)
+    buffer.add(make_event("a"))
+    buffer.add(make_event("b"))
+
+    # the batch is full, the background thread does not wait for the interval
+    deadline = time.monotonic() + 10
+    while GitHubEvent.objects.count() < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert GitHubEvent.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_github_event_is_buffered(client, settings):
+    settings.GITHUB_EVENTS_BATCH_SIZE = 10
+    buffer = EventBuffer(batch_size=10, interval=60)
+    with patch("tracker.views.get_event_buffer", return_value=buffer):
+        response = client.post(
+            reverse("github_event"),
+            '{"buffered": true}',
+            content_type="application/json",
+            HTTP_X_Github_Event="push",
+        )
+    assert response.status_code == 200
+    assert not GitHubEvent.objects.exists()
+
+    buffer.flush()
+    assert GitHubEvent.objects.get().data == {"buffered": True}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_github_event_is_flushed_by_the_buffer(client, settings, monkeypatch):
+    settings.GITHUB_EVENTS_BATCH_SIZE = 2
+    settings.GITHUB_EVENTS_FLUSH_INTERVAL = 60
+    # a buffer of its own, as configured in the settings
+    monkeypatch.setattr("tracker.github_events.buffer._event_buffer", None)
+    for delivery in ["a", "b"]:
+        response = client.post(
+            reverse("github_event"),
+            '{"buffered": true}',
+            content_type="application/json",
+            HTTP_X_Github_Event="push",
+            HTTP_X_Github_Delivery=delivery,
+        )
+        assert response.status_code == 200
+
+    # the batch is full, the background thread stores it right away
+    deadline = time.monotonic() + 10
+    while GitHubEvent.objects.count() < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sorted(GitHubEvent.objects.values_list("delivery", flat=True)) == [
+        "a",
+        "b",
+    ]
+
+
+@pytest.mark.django_db
+def test_compact_events(issue_comment_json, pull_request_json):
+    issue_comment = GitHubEvent.from_delivery(
+        "issue_comment", issue_comment_json, compact=True
+    )
+    pull_request = GitHubEvent.from_delivery(
+        "pull_request", pull_request_json, compact=True
+    )
+    store_events([issue_comment, pull_request, make_event("c")])
+
+    issue_comment = GitHubEvent.objects.get(kind="issue_comment")
+    assert issue_comment.data is None
+    assert issue_comment.number == issue_comment_json["issue"]["number"]
+    assert issue_comment.text == [issue_comment_json["comment"]["body"]]
+    assert f"gh_id={issue_comment.number}" in str(issue_comment)
+    assert issue_comment.raw_data == issue_comment_json
+    assert len(issue_comment.payload) < len(json.dumps(issue_comment_json))
+
+    pull_request = GitHubEvent.objects.get(kind="pull_request")
+    assert pull_request.text == [
+        pull_request_json["pull_request"]["body"],
+        pull_request_json["pull_request"]["title"],
+    ]
+    assert set(
+        GitHubEventReference.objects.values_list("event__kind", "identifier_id")
+    ) == {
+        ("issue_comment", "CVE-1988-1234"),
+        ("pull_request", "CVE-1999-1234"),
+    }
+
+
+@pytest.mark.django_db
+def test_compact_github_events_command(issue_comment_json, pull_request_json):
+    GitHubEvent.objects.create(kind="issue_comment", data=issue_comment_json)
+    GitHubEvent.objects.create(kind="pull_request", data=pull_request_json)
+    GitHubEvent.objects.create(kind="push", data={"ref": "refs/heads/master"})
+
+    out = StringIO()
+    call_command("compact_github_events", "--batch-size", "2", stdout=out)
+    assert "Compacted 3 events" in out.getvalue()
+    assert not GitHubEvent.objects.filter(data__isnull=False).exists()
+
+    events = {event.kind: event for event in GitHubEvent.objects.all()}
+    assert events["pull_request"].number == pull_request_json["pull_request"]["number"]
+    assert events["pull_request"].raw_data == pull_request_json
+    assert events["push"].number is None
+    assert events["push"].raw_data == {"ref": "refs/heads/master"}
+
+    out = StringIO()
+    call_command("search_cve_references", stdout=out)
+    assert "CVE-1988-1234" in out.getvalue()
+    assert "CVE-1999-1234" in out.getvalue()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "kind, data",
+    [
+        ("issue_comment", {"comment": None}),
+        ("issue_comment", {"comment": {"body": "fixes CVE-1998-123"}}),
+        ("pull_request", {"pull_request": {"title": "CVE-1998-123"}}),
+        ("pull_request", []),
+    ],
+)
+def test_compact_events_with_malformed_payload(kind, data):
+    store_events([GitHubEvent.from_delivery(kind, data, compact=True)])
+    event = GitHubEvent.objects.get()
+    assert event.data is None
+    assert event.number is None
+    assert "gh_id=N/A" in str(event)
+
+    call_command("search_cve_references", stdout=StringIO())
+    assert set(
+        GitHubEventReference.objects.values_list("identifier_id", flat=True)
+    ) <= {"CVE-1998-123"}
@@ -1,28 +1,65 @@
 import datetime
+import gzip
+import hashlib
+import json
 import os
+import shutil
+import threading
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, HTTPServer
 from io import StringIO
 from pathlib import Path
+from typing import Dict, List
 from unittest.mock import MagicMock, call, patch
+from urllib.parse import parse_qsl, urlparse
 
 import pytest
 import pytz
 import requests
-from django.core.management import call_command
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.utils import timezone
 from freezegun import freeze_time
 
-from tracker.models import Issue, IssueReference
+from tracker.management.commands.import_nvd import (
+    Command,
+    ImportProgress,
+    upsert_issues,
+)
+from tracker.models import (
+    Issue,
+    IssueCPEMatch,
+    IssueReference,
+    IssueStatus,
+    IssueWeakness,
+    NVDFeed,
+    NVDImportMode,
+    NVDImportRun,
+)
+from tracker.nvd import (
+    REQUEST_TIMEOUT,
+    iter_cve_items,
+    normalize_cve_item,
+    record_digest,
+)
+from tracker.nvd.api import MAX_ATTEMPTS, NVDAPIError, format_api_datetime
 from tracker.tests.factories import IssueFactory
+from tracker.tests.synthetic import SyntheticFeed, write_synthetic_feed
 
 FIXTURE_DIR = Path(
     os.path.join(os.path.dirname(os.path.realpath(__file__)), "fixtures")
 )
 
 
+@pytest.mark.django_db
 def test_import_nvd_requires_valid_url():
     out = StringIO()
-    with pytest.raises(requests.exceptions.MissingSchema):
+    with pytest.raises(CommandError):
         call_command("import_nvd", "not-a-url", stdout=out)
 
+    with pytest.raises(requests.exceptions.InvalidSchema):
+        call_command("import_nvd", "gopher://not-a-url", stdout=out)
+
 
 @pytest.fixture(name="nvd_json_data")
 def nvd_json_data_fixture():
@@ -36,10 +73,22 @@ def nvd_json_data():
 def mocked_nvd_response():
     mock = MagicMock()
     mock.status_code = 200
+    mock.headers = {}
     mock.raw = nvd_json_data()
     return mock
 
 
+def mocked_meta_response(text=None):
+    mock = MagicMock()
+    if text is None:
+        mock.status_code = 404
+        mock.text = ""
+    else:
+        mock.status_code = 200
+        mock.text = text
+    return mock
+
+
 @pytest.fixture(name="mocked_nvd_response")
 def mocked_nvd_response_fixture():
     return mocked_nvd_response()
@@ -51,7 +100,7 @@ def test_import_nvd(request_get, mocked_nvd_response):
     url = "https://test-dat"
     request_get.return_value = mocked_nvd_response
     call_command("import_nvd", url)
-    request_get.assert_called_once_with(url, stream=True)
+    request_get.assert_called_once_with(url, stream=True, timeout=REQUEST_TIMEOUT)
 
     expected_identifiers = [
         (
@@ -93,7 +142,7 @@ def test_import_nvd_accepts_env_var(request_get, mocked_nvd_response):
     url = "https://test-data"
     request_get.return_value = mocked_nvd_response
     call_command("import_nvd")
-    request_get.assert_called_once_with(url, stream=True)
+    request_get.assert_called_once_with(url, stream=True, timeout=REQUEST_TIMEOUT)
 
 
 @patch("requests.get")
@@ -103,7 +152,7 @@ def test_import_nvd_accepts_prefers_cli_arguments(request_get, mocked_nvd_respon
     url = "https://test-data"
     request_get.return_value = mocked_nvd_response
     call_command("import_nvd", url)
-    request_get.assert_called_once_with(url, stream=True)
+    request_get.assert_called_once_with(url, stream=True, timeout=REQUEST_TIMEOUT)
 
 
 @patch("requests.get")
@@ -116,7 +165,10 @@ def test_import_nvd_accepts_multiple_env_vars(request_get):
     request_get.side_effect = [mocked_nvd_response(), mocked_nvd_response()]
     call_command("import_nvd")
     request_get.assert_has_calls(
-        [call("https://test-data", stream=True), call("https://another", stream=True)]
+        [
+            call("https://test-data", stream=True, timeout=REQUEST_TIMEOUT),
+            call("https://another", stream=True, timeout=REQUEST_TIMEOUT),
+        ]
     )
 
 
@@ -137,7 +189,7 @@ def test_import_nvd_updates_fields(request_get, mocked_nvd_response):
 
     request_get.return_value = mocked_nvd_response
     call_command("import_nvd", url)
-    request_get.assert_called_once_with(url, stream=True)
+    request_get.assert_called_once_with(url, stream=True, timeout=REQUEST_TIMEOUT)
 
     issue = Issue.objects.get(identifier=identifier)
     assert issue.description == expected_description
@@ -190,21 +242,26 @@ def test_import_nvd_falls_back_to_timerange(request_get):
     """
     Assert that the import script falls back to using the date range to today
     for the import. The first NVD database is from 2002 so this test is
-    supposed to cause two requests.
+    supposed to cause two feed requests.
     """
-    request_get.side_effect = [mocked_nvd_response(), mocked_nvd_response()]
+    request_get.side_effect = lambda url, **kwargs: (
+        mocked_meta_response() if url.endswith(".meta") else mocked_nvd_response()
+    )
     call_command("import_nvd")
     request_get.assert_has_calls(
         [
             call(
                 "https://nvd.nist.gov/feeds/json/cve/1.1/nvdcve-1.1-2002.json.gz",
                 stream=True,
+                timeout=REQUEST_TIMEOUT,
             ),
             call(
                 "https://nvd.nist.gov/feeds/json/cve/1.1/nvdcve-1.1-2003.json.gz",
                 stream=True,
+                timeout=REQUEST_TIMEOUT,
             ),
-        ]
+        ],
+        any_order=True,
     )
 
 
@@ -228,8 +285,790 @@ def test_import_nvd_updates_missing_published_date(request_get):
 
     request_get.return_value = mocked_nvd_response()
     call_command("import_nvd", url)
-    request_get.assert_called_once_with(url, stream=True)
+    request_get.assert_called_once_with(url, stream=True, timeout=REQUEST_TIMEOUT)
 
     issue = Issue.objects.get(identifier=identifier)
     assert issue.description == expected_description
     assert issue.published_date is not None
+
+
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_in_chunks(request_get, mocked_nvd_response):
+    request_get.return_value = mocked_nvd_response
+    call_command("import_nvd", "https://test-data", "--chunk-size", "3")
+
+    assert Issue.objects.count() == 10
+    issue = Issue.objects.get(identifier="CVE-2002-2446")
+    assert IssueReference.objects.filter(issue=issue).count() == 5
+
+
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_streams_synthetic_feed(request_get):
+    response = MagicMock()
+    response.status_code = 200
+    response.headers = {}
+    response.raw = SyntheticFeed(250)
+    request_get.return_value = response
+
+    call_command("import_nvd", "https://synthetic", "--chunk-size", "100")
+
+    assert Issue.objects.count() == 250
+    assert IssueReference.objects.count() == 750
+
+
+@patch("requests.get")
+@patch.dict(
+    "os.environ",
+    {"NIXOS_SECURITY_TRACKER_NVD_URLS": "https://first;https://second;https://third"},
+)
+@pytest.mark.django_db
+def test_import_nvd_with_multiple_workers(request_get):
+    responses = {
+        "https://first": mocked_nvd_response(),
+        "https://second": mocked_nvd_response(),
+        "https://third": mocked_nvd_response(),
+    }
+    request_get.side_effect = lambda url, **kwargs: responses[url]
+    out = StringIO()
+    call_command("import_nvd", "--workers", "3", stdout=out)
+
+    assert request_get.call_count == 3
+    assert Issue.objects.count() == 10
+
+    # feeds are written in the given order
+    lines = [line for line in out.getvalue().split("\n") if line.startswith("Loading")]
+    assert lines == [
+        "Loading https://first",
+        "Loading https://second",
+        "Loading https://third",
+    ]
+
+
+def nvd_feed_sha256():
+    with gzip.open(FIXTURE_DIR / "nvdcve-1.1-2002-stripped.json.gz", "rb") as fh:
+        return hashlib.sha256(fh.read()).hexdigest()
+
+
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_stores_feed_metadata(request_get):
+    url = "https://test-data/nvdcve-1.1-2002.json.gz"
+    response = mocked_nvd_response()
+    response.headers = {"ETag": '"abc"', "Last-Modified": "Sat, 17 Oct 2026"}
+    request_get.side_effect = lambda u, **kwargs: (
+        mocked_meta_response() if u.endswith(".meta") else response
+    )
+    call_command("import_nvd", url)
+
+    feed = NVDFeed.objects.get(url=url)
+    assert feed.etag == '"abc"'
+    assert feed.last_modified == "Sat, 17 Oct 2026"
+    assert feed.sha256 == nvd_feed_sha256()
+
+
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_skips_feed_with_unchanged_meta_checksum(request_get):
+    url = "https://test-data/nvdcve-1.1-2002.json.gz"
+    sha256 = nvd_feed_sha256()
+    NVDFeed.objects.create(url=url, sha256=sha256)
+    meta = f"lastModifiedDate:2026-10-17T03:00:07-04:00\r\nsha256:{sha256.upper()}\r\n"
+    request_get.return_value = mocked_meta_response(meta)
+
+    out = StringIO()
+    call_command("import_nvd", url, stdout=out)
+
+    request_get.assert_called_once_with(
+        "https://test-data/nvdcve-1.1-2002.meta", timeout=REQUEST_TIMEOUT
+    )
+    assert f"Skipping {url}" in out.getvalue()
+    assert Issue.objects.count() == 0
+
+
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_imports_feed_with_changed_meta_checksum(request_get):
+    url = "https://test-data/nvdcve-1.1-2002.json.gz"
+    NVDFeed.objects.create(url=url, sha256="0" * 64)
+    meta = f"sha256:{nvd_feed_sha256()}\r\n"
+    request_get.side_effect = lambda u, **kwargs: (
+        mocked_meta_response(meta) if u.endswith(".meta") else mocked_nvd_response()
+    )
+    call_command("import_nvd", url)
+
+    request_get.assert_called_with(url, stream=True, timeout=REQUEST_TIMEOUT)
+    assert Issue.objects.count() == 10
+    assert NVDFeed.objects.get(url=url).sha256 == nvd_feed_sha256()
+
+
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_treats_meta_timeout_as_missing_meta(request_get):
+    url = "https://test-data/nvdcve-1.1-2002.json.gz"
+    NVDFeed.objects.create(url=url, etag='"abc"')
+
+    def get(u, **kwargs):
+        if u.endswith(".meta"):
+            raise requests.Timeout()
+        return mocked_nvd_response()
+
+    request_get.side_effect = get
+    call_command("import_nvd", url)
+
+    request_get.assert_called_with(
+        url, stream=True, timeout=REQUEST_TIMEOUT, headers={"If-None-Match": '"abc"'}
+    )
+    assert Issue.objects.count() == 10
+
+
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_uses_conditional_get_without_meta(request_get):
+    url = "https://test-data"
+    NVDFeed.objects.create(url=url, etag='"abc"', last_modified="Sat, 17 Oct 2026")
+    response = MagicMock()
+    response.status_code = 304
+    request_get.return_value = response
+
+    out = StringIO()
+    call_command("import_nvd", url, stdout=out)
+
+    request_get.assert_called_once_with(
+        url,
+        stream=True,
+        timeout=REQUEST_TIMEOUT,
+        headers={"If-None-Match": '"abc"', "If-Modified-Since": "Sat, 17 Oct 2026"},
+    )
+    assert f"Skipping {url}" in out.getvalue()
+    assert Issue.objects.count() == 0
+
+
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_force_ignores_feed_metadata(request_get, mocked_nvd_response):
+    url = "https://test-data"
+    NVDFeed.objects.create(url=url, etag='"abc"', last_modified="Sat, 17 Oct 2026")
+    request_get.return_value = mocked_nvd_response
+    call_command("import_nvd", url, "--force")
+
+    request_get.assert_called_once_with(url, stream=True, timeout=REQUEST_TIMEOUT)
+    assert Issue.objects.count() == 10
+
+
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_stores_record_digest(request_get, mocked_nvd_response):
+    request_get.return_value = mocked_nvd_response
+    call_command("import_nvd", "https://test-data")
+
+    assert not Issue.objects.filter(nvd_digest="").exists()
+
+
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_skips_issues_with_unchanged_digest(request_get):
+    request_get.return_value = mocked_nvd_response()
+    call_command("import_nvd", "https://test-data")
+
+    # a change that did not come from the NVD must not be overwritten as long
+    # as the NVD record stays the same
+    issue = Issue.objects.get(identifier="CVE-1999-0001")
+    issue.description = "edited locally"
+    issue.save()
+    IssueReference.objects.filter(issue=issue).delete()
+
+    request_get.return_value = mocked_nvd_response()
+    call_command("import_nvd", "https://test-data")
+
+    issue.refresh_from_db()
+    assert issue.description == "edited locally"
+    assert IssueReference.objects.filter(issue=issue).count() == 0
+
+    # once the digest changes the issue is compared and updated again
+    Issue.objects.filter(pk=issue.pk).update(nvd_digest="outdated")
+    request_get.return_value = mocked_nvd_response()
+    call_command("import_nvd", "https://test-data")
+
+    issue.refresh_from_db()
+    assert issue.description.startswith("ip_input.c in BSD-derived")
+    assert IssueReference.objects.filter(issue=issue).count() == 2
+
+
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_records_runs(request_get):
+    url = "https://test-data"
+    request_get.return_value = mocked_nvd_response()
+    call_command("import_nvd", url)
+
+    run = NVDImportRun.objects.get()
+    assert run.mode == NVDImportMode.FEEDS
+    assert run.succeeded
+    assert run.finished_at >= run.started_at
+    assert (run.issues_created, run.issues_updated, run.issues_unchanged) == (10, 0, 0)
+    assert run.references_created == IssueReference.objects.count()
+    assert run.references_deleted == 0
+
+    feed = run.feeds.get()
+    assert feed.url == url
+    assert not feed.skipped
+    assert feed.downloaded_bytes == os.path.getsize(
+        FIXTURE_DIR / "nvdcve-1.1-2002-stripped.json.gz"
+    )
+    assert feed.parse_duration > datetime.timedelta(0)
+    assert feed.write_duration > datetime.timedelta(0)
+    assert feed.issues_created == 10
+
+    issue = Issue.objects.get(identifier="CVE-1999-0001")
+    Issue.objects.filter(pk=issue.pk).update(nvd_digest="outdated")
+    IssueReference.objects.create(issue=issue, uri="please remove me")
+
+    request_get.return_value = mocked_nvd_response()
+    call_command("import_nvd", url, "--force")
+
+    run = NVDImportRun.objects.first()
+    assert (run.issues_created, run.issues_updated, run.issues_unchanged) == (0, 1, 9)
+    assert (run.references_created, run.references_deleted) == (0, 1)
+
+
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_records_failed_runs(request_get):
+    request_get.side_effect = requests.ConnectionError()
+    with pytest.raises(requests.ConnectionError):
+        call_command("import_nvd", "https://test-data")
+
+    run = NVDImportRun.objects.get()
+    assert not run.succeeded
+    assert run.finished_at is not None
+
+
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_fails_on_http_errors(request_get):
+    response = MagicMock()
+    response.status_code = 503
+    request_get.return_value = response
+    with pytest.raises(requests.HTTPError, match="HTTP 503"):
+        call_command("import_nvd", "https://test-data")
+
+    assert not NVDImportRun.objects.get().succeeded
+
+
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_writes_per_issue_lines_only_when_verbose(request_get):
+    request_get.return_value = mocked_nvd_response()
+    out = StringIO()
+    call_command("import_nvd", "https://test-data", stdout=out)
+
+    lines = out.getvalue().splitlines()
+    assert not any("issue CVE-" in line for line in lines)
+    assert (
+        "Read 10 records from https://test-data: 10 issues created, 0 updated, "
+        "0 unchanged, 24 references created, 0 deleted"
+    ) in lines
+
+    Issue.objects.filter(identifier="CVE-1999-0001").update(nvd_digest="outdated")
+    request_get.return_value = mocked_nvd_response()
+    out = StringIO()
+    call_command("import_nvd", "https://test-data", "--force", "-v", "2", stdout=out)
+
+    lines = out.getvalue().splitlines()
+    assert [line for line in lines if "issue CVE-" in line] == [
+        "Updating issue CVE-1999-0001"
+    ]
+
+
+def test_import_progress_is_rate_limited():
+    now = 0.0
+    lines: List[str] = []
+    progress = ImportProgress(
+        lines.append, "https://test-data", interval=10, clock=lambda: now
+    )
+
+    now = 5.0
+    progress.update(500, 0.1)
+    assert lines == []
+
+    now = 10.0
+    progress.update(1000, 0.25)
+    assert lines == [
+        "https://test-data: 1000 records, 100 records/s, 25% done, ETA 0:00:30"
+    ]
+
+    now = 15.0
+    progress.update(1500, 0.5)
+    now = 20.0
+    progress.update(2000)
+    assert lines[1:] == ["https://test-data: 2000 records, 100 records/s"]
+
+
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_stores_scores_weaknesses_and_cpe_matches(request_get):
+    request_get.return_value = mocked_nvd_response()
+    call_command("import_nvd", "https://test-data")
+
+    issue = Issue.objects.get(identifier="CVE-1999-0001")
+    assert issue.cvss3_base_score is None
+    assert issue.cvss2_base_score == Decimal("5.0")
+    assert issue.cvss2_vector == "AV:N/AC:L/Au:N/C:N/I:N/A:P"
+    assert list(issue.weaknesses.values_list("cwe", flat=True)) == ["CWE-20"]
+    assert issue.cpe_matches.count() == 23
+    match = issue.cpe_matches.get(criteria="cpe:2.3:o:bsdi:bsd_os:3.1:*:*:*:*:*:*:*")
+    assert (match.vendor, match.product, match.vulnerable) == ("bsdi", "bsd_os", True)
+
+    # the weaknesses and CPE matches of changed issues are replaced
+    IssueWeakness.objects.create(issue=issue, cwe="CWE-1")
+    IssueCPEMatch.objects.filter(issue=issue).delete()
+    Issue.objects.filter(pk=issue.pk).update(nvd_digest="outdated")
+    request_get.return_value = mocked_nvd_response()
+    call_command("import_nvd", "https://test-data", "--force")
+
+    assert list(issue.weaknesses.values_list("cwe", flat=True)) == ["CWE-20"]
+    assert issue.cpe_matches.count() == 23
+    assert IssueWeakness.objects.count() == 10
+
+
+def nvd_records():
+    with gzip.open(FIXTURE_DIR / "nvdcve-1.1-2002-stripped.json.gz", "rb") as fh:
+        return [normalize_cve_item(item) for item in iter_cve_items(fh)]
+
+
+@pytest.mark.django_db
+def test_import_nvd_updates_in_constant_number_of_queries(django_assert_num_queries):
+    # few enough CPE matches to be inserted with a single query on SQLite
+    records = [
+        record._replace(cpe_matches=record.cpe_matches[:3]) for record in nvd_records()
+    ]
+    for record in records:
+        issue = IssueFactory(identifier=record.identifier, published_date=None)
+        IssueReference.objects.create(issue=issue, uri="please remove me")
+        if record.references:
+            IssueReference.objects.create(issue=issue, uri=record.references[0])
+
+    # look up the largest primary key, upsert the issues, select, delete and
+    # insert the references, replace the weaknesses and CPE matches
+    with django_assert_num_queries(9):
+        Command().import_records(records)
+
+    for record in records:
+        issue = Issue.objects.get(identifier=record.identifier)
+        assert issue.description == record.description
+        assert issue.published_date == record.published_date
+        assert sorted(issue.references.values_list("uri", flat=True)) == sorted(
+            record.references
+        )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("returning", [True, False])
+def test_upsert_issues(returning):
+    records = nvd_records()
+    unchanged, changed, *_ = records
+    IssueFactory(
+        identifier=unchanged.identifier,
+        description="edited locally",
+        nvd_digest=record_digest(unchanged),
+    )
+    IssueFactory(
+        identifier=changed.identifier,
+        description="outdated",
+        published_date=None,
+        nvd_digest="outdated",
+    )
+
+    with patch(
+        "tracker.management.commands.import_nvd.supports_returning",
+        return_value=returning,
+    ):
+        issues, created = upsert_issues(records)
+
+    assert set(issues.keys()) == set(r.identifier for r in records[1:])
+    assert created == set(r.identifier for r in records[2:])
+    for identifier, pk in issues.items():
+        assert Issue.objects.get(pk=pk).identifier == identifier
+
+    assert Issue.objects.get(identifier=unchanged.identifier).description == (
+        "edited locally"
+    )
+    issue = Issue.objects.get(identifier=changed.identifier)
+    assert issue.description == changed.description
+    assert issue.published_date == changed.published_date
+    assert issue.nvd_digest == record_digest(changed)
+    assert issue.status == IssueStatus.UNKNOWN
+
+
+requires_postgresql = pytest.mark.skipif(
+    connection.vendor != "postgresql", reason="requires a PostgreSQL database"
+)
+
+
+@pytest.mark.django_db
+def test_import_nvd_bulk_load_requires_postgresql():
+    if connection.vendor == "postgresql":
+        pytest.skip("requires a database other than PostgreSQL")
+
+    with pytest.raises(CommandError):
+        call_command("import_nvd", "https://test-data", "--bulk-load")
+
+
+@requires_postgresql
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_bulk_load(request_get):
+    unchanged = IssueFactory(identifier="CVE-1999-0001")
+    IssueReference.objects.create(issue=unchanged, uri="unrelated")
+    changed = IssueFactory(
+        identifier="CVE-2002-2446", description="outdated", published_date=None
+    )
+    IssueReference.objects.create(issue=changed, uri="please remove me")
+    IssueReference.objects.create(
+        issue=changed, uri="https://twitter.com/digitalbond/status/619250429751222277"
+    )
+
+    records = {record.identifier: record for record in nvd_records()}
+    Issue.objects.filter(pk=unchanged.pk).update(
+        nvd_digest=record_digest(records[unchanged.identifier])
+    )
+
+    # the same feed twice, the records must only be merged once
+    request_get.side_effect = [mocked_nvd_response(), mocked_nvd_response()]
+    out = StringIO()
+    call_command(
+        "import_nvd", "https://first", "https://second", "--bulk-load", stdout=out
+    )
+
+    assert "Created or updated 9 issues" in out.getvalue()
+    assert Issue.objects.count() == 10
+
+    run = NVDImportRun.objects.get()
+    assert run.mode == NVDImportMode.BULK_LOAD
+    assert run.succeeded
+    assert (run.issues_created, run.issues_updated, run.issues_unchanged) == (8, 1, 1)
+    assert run.references_deleted == 1
+
+    unchanged.refresh_from_db()
+    assert list(unchanged.references.values_list("uri", flat=True)) == ["unrelated"]
+
+    for record in records.values():
+        if record.identifier == unchanged.identifier:
+            continue
+        issue = Issue.objects.get(identifier=record.identifier)
+        assert issue.description == record.description
+        assert issue.published_date == record.published_date
+        assert issue.nvd_digest == record_digest(record)
+        assert issue.status == IssueStatus.UNKNOWN
+        assert sorted(issue.references.values_list("uri", flat=True)) == sorted(
+            set(record.references)
+        )
+        assert issue.cvss2_base_score == Decimal(str(record.cvss2_score))
+        assert issue.cvss2_vector == record.cvss2_vector
+        assert list(issue.weaknesses.values_list("cwe", flat=True)) == record.cwes
+        assert issue.cpe_matches.count() == len(record.cpe_matches)
+        assert not issue.cpe_matches.filter(vendor="").exists()
+
+
+@pytest.fixture(name="feed_directory")
+def feed_directory_fixture(tmp_path):
+    shutil.copy(
+        FIXTURE_DIR / "nvdcve-1.1-2002-stripped.json.gz",
+        tmp_path / "nvdcve-1.1-2002.json.gz",
+    )
+    return tmp_path
+
+
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_from_local_files(request_get, feed_directory):
+    path = feed_directory / "nvdcve-1.1-2002.json.gz"
+    call_command("import_nvd", str(path))
+    assert Issue.objects.count() == 10
+
+    Issue.objects.all().delete()
+    call_command("import_nvd", path.as_uri(), "--force")
+    assert Issue.objects.count() == 10
+
+    request_get.assert_not_called()
+    assert NVDFeed.objects.get(url=path.as_uri()).sha256 == nvd_feed_sha256()
+
+
+@pytest.mark.django_db
+def test_import_nvd_skips_local_file_with_unchanged_meta(feed_directory):
+    path = feed_directory / "nvdcve-1.1-2002.json.gz"
+    (feed_directory / "nvdcve-1.1-2002.meta").write_text(
+        f"sha256:{nvd_feed_sha256()}\r\n"
+    )
+    NVDFeed.objects.create(url=str(path), sha256=nvd_feed_sha256())
+
+    out = StringIO()
+    call_command("import_nvd", str(path), stdout=out)
+
+    assert f"Skipping {path}" in out.getvalue()
+    assert Issue.objects.count() == 0
+
+
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_caches_downloaded_feeds(request_get, tmp_path):
+    url = "https://test-data/nvdcve-1.1-2002.json.gz"
+    sha256 = nvd_feed_sha256()
+    request_get.side_effect = lambda u, **kwargs: (
+        mocked_meta_response(f"sha256:{sha256}")
+        if u.endswith(".meta")
+        else mocked_nvd_response()
+    )
+    call_command("import_nvd", url, "--cache-dir", str(tmp_path))
+
+    assert [p.name for p in tmp_path.iterdir()] == [f"{sha256}.json.gz"]
+    assert (tmp_path / f"{sha256}.json.gz").read_bytes() == nvd_json_data().read()
+
+    # a forced import reads the feed from the cache
+    Issue.objects.all().delete()
+    request_get.reset_mock()
+    call_command("import_nvd", url, "--cache-dir", str(tmp_path), "--force")
+
+    request_get.assert_called_once_with(
+        "https://test-data/nvdcve-1.1-2002.meta", timeout=REQUEST_TIMEOUT
+    )
+    assert Issue.objects.count() == 10
+
+
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_replaces_outdated_cached_feeds(request_get, tmp_path):
+    url = "https://test-data/nvdcve-1.1-2002.json.gz"
+    (tmp_path / f"{'0' * 64}.json.gz").write_bytes(b"outdated")
+    NVDFeed.objects.create(url=url, sha256="0" * 64)
+    request_get.side_effect = lambda u, **kwargs: (
+        mocked_meta_response() if u.endswith(".meta") else mocked_nvd_response()
+    )
+    call_command("import_nvd", url, "--cache-dir", str(tmp_path))
+
+    assert [p.name for p in tmp_path.iterdir()] == [f"{nvd_feed_sha256()}.json.gz"]
+
+
+@patch("requests.get")
+@pytest.mark.django_db(transaction=True)
+def test_import_nvd_resumes_interrupted_import(request_get):
+    url = "https://test-data/nvdcve-1.1-2002.json.gz"
+    sha256 = nvd_feed_sha256()
+    request_get.side_effect = lambda u, **kwargs: (
+        mocked_meta_response(f"sha256:{sha256}")
+        if u.endswith(".meta")
+        else mocked_nvd_response()
+    )
+
+    import_records = Command.import_records
+    chunks = []
+
+    def interrupted(self, records):
+        if len(chunks) == 1:
+            raise KeyboardInterrupt()
+        chunks.append(len(records))
+        import_records(self, records)
+
+    with patch.object(Command, "import_records", interrupted):
+        with pytest.raises(KeyboardInterrupt):
+            call_command("import_nvd", url, "--chunk-size", "3")
+
+    assert Issue.objects.count() == 3
+    feed = NVDFeed.objects.get(url=url)
+    assert (feed.checkpoint_version, feed.checkpoint_offset) == (sha256, 3)
+    assert feed.sha256 == ""
+
+    def counted(self, records):
+        chunks.append(len(records))
+        import_records(self, records)
+
+    chunks = []
+    out = StringIO()
+    with patch.object(Command, "import_records", counted):
+        call_command("import_nvd", url, "--chunk-size", "3", stdout=out)
+
+    assert f"Resuming {url} after 3 records" in out.getvalue()
+    assert chunks == [3, 3, 1]
+    assert Issue.objects.count() == 10
+
+    feed.refresh_from_db()
+    assert (feed.checkpoint_version, feed.checkpoint_offset) == ("", 0)
+    assert feed.sha256 == sha256
+
+
+@patch("requests.get")
+@pytest.mark.django_db
+def test_import_nvd_ignores_checkpoint_of_other_version(request_get):
+    url = "https://test-data/nvdcve-1.1-2002.json.gz"
+    NVDFeed.objects.create(url=url, checkpoint_version="0" * 64, checkpoint_offset=5)
+    request_get.side_effect = lambda u, **kwargs: (
+        mocked_meta_response(f"sha256:{nvd_feed_sha256()}")
+        if u.endswith(".meta")
+        else mocked_nvd_response()
+    )
+    call_command("import_nvd", url)
+
+    assert Issue.objects.count() == 10
+    assert NVDFeed.objects.get(url=url).checkpoint_offset == 0
+
+
+@pytest.mark.django_db
+def test_import_nvd_with_worker_processes(tmp_path):
+    paths = [
+        write_synthetic_feed(tmp_path / f"{n}.json.gz", 250 * (n + 1)) for n in range(3)
+    ]
+    call_command(
+        "import_nvd",
+        *map(str, paths),
+        "--processes",
+        "--workers",
+        "2",
+        "--chunk-size",
+        "100",
+    )
+
+    assert Issue.objects.count() == 750
+    assert IssueReference.objects.count() == 2250
+    for path in paths:
+        assert len(NVDFeed.objects.get(url=str(path)).sha256) == 64
+
+
+class NVDAPIStub(BaseHTTPRequestHandler):
+    """
+    Serves the pages of the CVE API from the fixture files. Requests for
+    CVEs modified within a time range get an empty page.
+    """
+
+    requests: List[Dict[str, str]] = []
+    # statuses to reply with before serving the pages
+    failures: List[int] = []
+
+    def do_GET(self):
+        params = dict(parse_qsl(urlparse(self.path).query))
+        self.requests.append(params)
+
+        if self.failures:
+            self.send_response(self.failures.pop(0))
+            self.end_headers()
+            return
+
+        if "lastModStartDate" in params:
+            page = {
+                "resultsPerPage": 0,
+                "startIndex": int(params["startIndex"]),
+                "totalResults": 0,
+                "vulnerabilities": [],
+            }
+            body = json.dumps(page).encode()
+        else:
+            path = FIXTURE_DIR / f"nvd-api-2.0-{params['startIndex']}.json"
+            body = path.read_bytes()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(name="nvd_api")
+def nvd_api_fixture():
+    NVDAPIStub.requests = []
+    NVDAPIStub.failures = []
+    server = HTTPServer(("127.0.0.1", 0), NVDAPIStub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/rest/json/cves/2.0"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.django_db
+def test_import_nvd_from_api(nvd_api):
+    call_command(
+        "import_nvd",
+        "--api",
+        "--api-url",
+        nvd_api,
+        "--api-delay",
+        "0",
+        "--chunk-size",
+        "2",
+    )
+
+    assert [r["startIndex"] for r in NVDAPIStub.requests] == ["0", "2"]
+    assert "lastModStartDate" not in NVDAPIStub.requests[0]
+
+    assert Issue.objects.count() == 3
+    issue = Issue.objects.get(identifier="CVE-1999-0001")
+    assert issue.description.startswith("ip_input.c in BSD-derived")
+    assert issue.published_date == datetime.datetime(1999, 12, 30, 5, tzinfo=pytz.UTC)
+    assert sorted(issue.references.values_list("uri", flat=True)) == [
+        "http://www.openbsd.org/errata23.html#tcpfix",
+        "http://www.osvdb.org/5707",
+    ]
+
+    # the same CVEs as in the feed
+    records = {record.identifier: record for record in nvd_records()}
+    for issue in Issue.objects.all():
+        assert issue.nvd_digest == record_digest(records[issue.identifier])
+
+    assert NVDFeed.objects.get(url=nvd_api).watermark is not None
+
+
+@pytest.mark.django_db
+def test_import_nvd_from_api_retries_rate_limited_requests(nvd_api):
+    NVDAPIStub.failures = [403, 503]
+    call_command("import_nvd", "--api", "--api-url", nvd_api, "--api-delay", "0")
+
+    assert [r["startIndex"] for r in NVDAPIStub.requests] == ["0", "0", "0", "2"]
+    assert Issue.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_import_nvd_from_api_gives_up_after_retries(nvd_api):
+    NVDAPIStub.failures = [503] * MAX_ATTEMPTS
+    with pytest.raises(NVDAPIError, match="HTTP 503"):
+        call_command("import_nvd", "--api", "--api-url", nvd_api, "--api-delay", "0")
+    assert len(NVDAPIStub.requests) == MAX_ATTEMPTS
+
+
+@pytest.mark.django_db
+def test_import_nvd_from_api_since_watermark(nvd_api):
+    watermark = timezone.now() - datetime.timedelta(days=200)
+    NVDFeed.objects.create(url=nvd_api, watermark=watermark)
+
+    call_command("import_nvd", "--api", "--api-url", nvd_api, "--api-delay", "0")
+
+    # the range is split into windows of at most 120 days
+    assert len(NVDAPIStub.requests) == 2
+    first, second = NVDAPIStub.requests
+    assert first["lastModStartDate"] == format_api_datetime(watermark)
+    assert first["lastModEndDate"] == second["lastModStartDate"]
+    assert Issue.objects.count() == 0
+
+    feed = NVDFeed.objects.get(url=nvd_api)
+    assert feed.watermark > watermark
+    assert second["lastModEndDate"] == format_api_datetime(feed.watermark)
+
+
+@pytest.mark.django_db
+def test_import_nvd_from_api_since_argument(nvd_api):
+    call_command(
+        "import_nvd",
+        "--api",
+        "--api-url",
+        nvd_api,
+        "--api-delay",
+        "0",
+        "--since",
+        f"{timezone.now().date()}",
+    )
+
+    assert len(NVDAPIStub.requests) == 1
+    assert NVDAPIStub.requests[0]["lastModStartDate"].endswith("T00:00:00.000Z")
@@ -0,0 +1,263 @@
+import json
+import os
+from io import StringIO
+from pathlib import Path
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from tracker.models import (
+    Channel,
+    ChannelPackageChange,
+    IssueCPEMatch,
+    IssuePackageCandidate,
+    IssueStatus,
+    Package,
+    PackageMatchReason,
+)
+from tracker.tests.factories import IssueFactory
+
+FIXTURE_DIR = Path(
+    os.path.join(os.path.dirname(os.path.realpath(__file__)), "fixtures")
+)
+
+
+@pytest.mark.django_db
+def test_import_packages():
+    out = StringIO()
+    call_command("import_packages", str(FIXTURE_DIR / "packages.json"), stdout=out)
+    assert "9 created, 0 updated" in out.getvalue()
+
+    package = Package.objects.get(attribute="openssl_1_1")
+    assert (package.pname, package.version) == ("openssl", "1.1.1h")
+
+    Package.objects.filter(pk=package.pk).update(version="1.1.1g")
+    out = StringIO()
+    call_command("import_packages", str(FIXTURE_DIR / "packages.json"), stdout=out)
+    assert "0 created, 1 updated" in out.getvalue()
+
+    package.refresh_from_db()
+    assert package.version == "1.1.1h"
+
+
+@pytest.mark.django_db
+def test_import_packages_requires_existing_file():
+    with pytest.raises(CommandError):
+        call_command("import_packages", "does-not-exist.json")
+
+
+@pytest.mark.django_db
+def test_match_packages():
+    call_command("import_packages", str(FIXTURE_DIR / "packages.json"))
+
+    by_cpe = IssueFactory(description="Mozilla Thunderbird mentioned in passing.")
+    IssueCPEMatch.objects.create(
+        issue=by_cpe,
+        criteria="cpe:2.3:a:nodejs:node.js:*:*:*:*:*:*:*:*",
+        vendor="nodejs",
+        product="node.js",
+    )
+    # the platform a vulnerable product runs on is not a candidate
+    IssueCPEMatch.objects.create(
+        issue=by_cpe,
+        criteria="cpe:2.3:o:python:python:-:*:*:*:*:*:*:*",
+        vendor="python",
+        product="python",
+        vulnerable=False,
+    )
+    by_keyword = IssueFactory(
+        description="Mozilla Thunderbird before 78.5 crashes on a crafted file."
+    )
+    IssueFactory(description="Nothing to see here.")
+
+    out = StringIO()
+    call_command("match_packages", "--chunk-size", "2", stdout=out)
+    assert "Matched 3 issues to 3 package candidates" in out.getvalue()
+
+    candidates = {
+        (c.issue_id, c.package.attribute, c.reason)
+        for c in IssuePackageCandidate.objects.select_related("package")
+    }
+    assert candidates == {
+        (by_cpe.pk, "nodejs", PackageMatchReason.CPE),
+        (by_keyword.pk, "thunderbird", PackageMatchReason.KEYWORD),
+        (by_keyword.pk, "thunderbird-bin", PackageMatchReason.KEYWORD),
+    }
+
+    # matching again replaces the candidates
+    call_command("match_packages")
+    assert IssuePackageCandidate.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_evaluate_versions():
+    call_command("import_packages", str(FIXTURE_DIR / "packages.json"))
+
+    affected = IssueFactory(description="")
+    IssueCPEMatch.objects.create(
+        issue=affected,
+        criteria="cpe:2.3:a:openssl:openssl:*:*:*:*:*:*:*:*",
+        vendor="openssl",
+        product="openssl",
+        version_start_including="1.1.0",
+        version_end_excluding="1.1.1i",
+    )
+    fixed = IssueFactory(description="")
+    IssueCPEMatch.objects.create(
+        issue=fixed,
+        criteria="cpe:2.3:a:openssl:openssl:*:*:*:*:*:*:*:*",
+        vendor="openssl",
+        product="openssl",
+        version_start_including="1.1.0",
+        version_end_excluding="1.1.1h",
+    )
+    unknown = IssueFactory(description="Thunderbird crashes.")
+
+    call_command("match_packages")
+
+    def outcome(issue):
+        issue.refresh_from_db()
+        return issue.suggested_status, [
+            c.affected for c in issue.package_candidates.all()
+        ]
+
+    assert outcome(affected) == (IssueStatus.AFFECTED, [True])
+    assert outcome(fixed) == (IssueStatus.NOTAFFECTED, [False])
+    assert outcome(unknown) == (IssueStatus.UNKNOWN, [None, None])
+    # the status itself is left to be triaged
+    assert affected.status == IssueStatus.UNKNOWN
+
+    # a package update only changes the candidates of that package
+    Package.objects.filter(attribute="openssl_1_1").update(version="1.1.1i")
+    out = StringIO()
+    call_command("evaluate_versions", "--chunk-size", "2", stdout=out)
+    assert "Evaluated 3 issues, 1 package candidates changed" in out.getvalue()
+    assert outcome(affected) == (IssueStatus.NOTAFFECTED, [False])
+
+
+def write_listing(path, **changes):
+    """
+    Write the fixture listing with some packages changed to the given
+    versions, or removed if the version is None.
+    """
+    data = json.loads((FIXTURE_DIR / "packages.json").read_text())
+    for attribute, version in changes.items():
+        if version is None:
+            del data["packages"][attribute]
+        else:
+            data["packages"][attribute]["version"] = version
+    path.write_text(json.dumps(data))
+    return str(path)
+
+
+@pytest.mark.django_db
+def test_import_channel(tmp_path):
+    issue = IssueFactory(description="")
+    IssueCPEMatch.objects.create(
+        issue=issue,
+        criteria="cpe:2.3:a:openssl:openssl:*:*:*:*:*:*:*:*",
+        vendor="openssl",
+        product="openssl",
+        version_start_including="1.1.0",
+        version_end_excluding="1.1.1i",
+    )
+    triaged = IssueFactory(
+        description="Mozilla Thunderbird crashes.", status=IssueStatus.NOTFORUS
+    )
+
+    out = StringIO()
+    call_command(
+        "import_channel",
+        "nixos-20.09",
+        write_listing(tmp_path / "a.json"),
+        "--revision",
+        "a",
+        stdout=out,
+    )
+    assert "9 added, 0 removed, 0 changed, 1 new package candidates" in (out.getvalue())
+    # closed issues are not matched against new packages
+    assert not triaged.package_candidates.exists()
+
+    call_command(
+        "import_channel",
+        "nixos-unstable",
+        write_listing(tmp_path / "b.json", openssl_1_1="1.1.1i"),
+        "--revision",
+        "b",
+    )
+    candidate = issue.package_candidates.get()
+    assert candidate.affected is True
+    assert {
+        (c.channel_package.channel.name, c.affected)
+        for c in candidate.channels.select_related("channel_package__channel")
+    } == {("nixos-20.09", True), ("nixos-unstable", False)}
+
+    # only the changed packages are re-evaluated
+    out = StringIO()
+    call_command(
+        "import_channel",
+        "nixos-20.09",
+        write_listing(tmp_path / "c.json", openssl_1_1="1.1.1i", file=None),
+        "--revision",
+        "c",
+        stdout=out,
+    )
+    assert "0 added, 1 removed, 1 changed, 0 new package candidates, " in (
+        out.getvalue()
+    )
+    assert "1 package candidates changed" in out.getvalue()
+
+    candidate.refresh_from_db()
+    assert candidate.affected is False
+    issue.refresh_from_db()
+    assert issue.suggested_status == IssueStatus.NOTAFFECTED
+
+    channel = Channel.objects.get(name="nixos-20.09")
+    assert channel.revision == "c"
+    assert channel.packages.count() == 8
+    assert {
+        (c.package.attribute, c.old_version, c.new_version)
+        for c in ChannelPackageChange.objects.filter(revision__revision="c")
+    } == {("openssl_1_1", "1.1.1h", "1.1.1i"), ("file", "5.39", None)}
+    # the packages themselves are never removed
+    assert Package.objects.filter(attribute="file").exists()
+
+
+@pytest.mark.django_db
+def test_import_channel_leaves_closed_issues_alone(tmp_path):
+    def openssl_issue(**kwargs):
+        issue = IssueFactory(description="", **kwargs)
+        IssueCPEMatch.objects.create(
+            issue=issue,
+            criteria="cpe:2.3:a:openssl:openssl:*:*:*:*:*:*:*:*",
+            vendor="openssl",
+            product="openssl",
+            version_start_including="1.1.0",
+            version_end_excluding="1.1.1i",
+        )
+        return issue
+
+    first = openssl_issue()
+    closed = openssl_issue(status=IssueStatus.NOTFORUS)
+    last = openssl_issue()
+
+    call_command("import_channel", "nixos-20.09", write_listing(tmp_path / "a.json"))
+    # matched before the issue has been closed
+    candidate = IssuePackageCandidate.objects.create(
+        issue=closed,
+        package=Package.objects.get(attribute="openssl_1_1"),
+        reason=PackageMatchReason.CPE,
+    )
+
+    call_command(
+        "import_channel",
+        "nixos-20.09",
+        write_listing(tmp_path / "b.json", openssl_1_1="1.1.1i"),
+    )
+    for issue in (first, last):
+        issue.refresh_from_db()
+        assert issue.suggested_status == IssueStatus.NOTAFFECTED
+    candidate.refresh_from_db()
+    assert candidate.affected is None
+    closed.refresh_from_db()
+    assert closed.suggested_status == IssueStatus.UNKNOWN
@@ -0,0 +1,193 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from tracker.models import IssueStatus
+from tracker.nixpkgs import PackageRecord, parse_drv_name, read_packages
+from tracker.nixpkgs.evaluation import cpe_match_range, suggested_status
+from tracker.nixpkgs.matching import PackageIndex, name_keys, normalize_name
+from tracker.nixpkgs.versions import VersionRange, evaluate_ranges, version_key
+
+FIXTURE_DIR = Path(
+    os.path.join(os.path.dirname(os.path.realpath(__file__)), "fixtures")
+)
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("thunderbird-bin-78.5.0", ("thunderbird-bin", "78.5.0")),
+        ("python3.9-requests-2.24.0", ("python3.9-requests", "2.24.0")),
+        ("hello", ("hello", "")),
+        ("firefox-78.5.0esr", ("firefox", "78.5.0esr")),
+    ],
+)
+def test_parse_drv_name(name, expected):
+    assert parse_drv_name(name) == expected
+
+
+def test_read_packages():
+    packages = {p.attribute: p for p in read_packages(FIXTURE_DIR / "packages.json")}
+    assert len(packages) == 9
+    assert packages["thunderbird-bin"] == PackageRecord(
+        attribute="thunderbird-bin",
+        pname="thunderbird-bin",
+        version="78.5.0",
+        description="Mozilla Thunderbird, a full-featured email client (binary package)",
+    )
+
+
+def test_read_packages_of_nix_env(tmp_path):
+    path = tmp_path / "packages.json"
+    path.write_text('{"nixos.hello": {"name": "hello-2.10", "meta": {}}}')
+    assert list(read_packages(path)) == [
+        PackageRecord(
+            attribute="nixos.hello", pname="hello", version="2.10", description=""
+        )
+    ]
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("Node.js", "nodejs"),
+        ("node_js", "nodejs"),
+        ("a\\:b", "ab"),
+    ],
+)
+def test_normalize_name(name, expected):
+    assert normalize_name(name) == expected
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("thunderbird-bin", {"thunderbird", "thunderbirdbin"}),
+        ("python39", {"python", "python39"}),
+        ("openssl_1_1", {"openssl", "openssl11"}),
+        ("gtk3", {"gtk", "gtk3"}),
+        ("xz", set()),
+    ],
+)
+def test_name_keys(name, expected):
+    assert name_keys(name) == expected
+
+
+@pytest.fixture
+def index():
+    return PackageIndex.build(
+        [
+            (1, "thunderbird", "thunderbird"),
+            (2, "thunderbird-bin", "thunderbird-bin"),
+            (3, "nodejs", "nodejs"),
+            (4, "python39Packages.requests", "python3.9-requests"),
+            (5, "file", "file"),
+            (6, "xorg.xorgserver", "xorg-server"),
+        ]
+    )
+
+
+def test_package_index_matches_cpe_products(index):
+    assert index.match_cpe("mozilla", "thunderbird") == {1, 2}
+    assert index.match_cpe("nodejs", "node.js") == {3}
+    assert index.match_cpe("python", "requests") == {4}
+    assert index.match_cpe("microsoft", "windows") == set()
+    assert index.match_cpe("*", "*") == set()
+
+
+def test_package_index_matches_cpe_vendors(index):
+    # generic products only match if the vendor agrees or is unknown
+    assert index.match_cpe("file_project", "file") == {5}
+    assert index.match_cpe("*", "file") == {5}
+    assert index.match_cpe("acme", "file") == set()
+    # packages named after the vendor and the product
+    assert index.match_cpe("x.org", "server") == {6}
+    assert index.match_cpe("apache", "server") == set()
+
+
+def test_package_index_matches_description_keywords(index):
+    assert index.match_description(
+        "Mozilla Thunderbird before 78.5 allows remote attackers to crash the client."
+    ) == {1, 2}
+    # ordinary words are not taken as package names
+    assert index.match_description("A crafted file causes a crash.") == set()
+
+
+def test_version_key_orders_like_nix():
+    versions = [
+        "1.0pre1",
+        "1.0",
+        "1.0a",
+        "1.0.1",
+        "1.1",
+        "2.3a",
+        "2.3.1",
+        "10",
+    ]
+    assert sorted(reversed(versions), key=version_key) == versions
+    assert version_key("1.0") == version_key("1-0")
+
+
+@pytest.mark.parametrize(
+    "version, version_range, expected",
+    [
+        ("1.1.1h", VersionRange("1.1.0", "", "", "1.1.1k"), True),
+        ("1.1.1k", VersionRange("1.1.0", "", "", "1.1.1k"), False),
+        ("1.1.0", VersionRange("", "1.1.0", "1.1.1k", ""), False),
+        ("1.1.1k", VersionRange("", "1.1.0", "1.1.1k", ""), True),
+        ("1.0.2u", VersionRange("1.1.0", "", "", ""), False),
+        ("3.0", VersionRange(), True),
+        ("78.5.0", VersionRange.exactly("78.5"), False),
+        ("78.5", VersionRange.exactly("78.5"), True),
+    ],
+)
+def test_evaluate_ranges(version, version_range, expected):
+    assert evaluate_ranges([(version, [version_range])]) == [expected]
+
+
+def test_evaluate_ranges_in_batch():
+    openssl = [VersionRange("1.0.2", "", "", "1.0.2x"), VersionRange.exactly("1.1.1")]
+    assert evaluate_ranges(
+        [
+            ("1.0.2w", openssl),
+            ("1.1.1", openssl),
+            ("1.1.1h", openssl),
+            ("", openssl),
+            ("1.1.1", []),
+        ]
+    ) == [True, True, False, None, None]
+
+
+@pytest.mark.parametrize(
+    "criteria, bounds, expected",
+    [
+        (
+            "cpe:2.3:a:openssl:openssl:*:*:*:*:*:*:*:*",
+            ("1.1.0", "", "", "1.1.1k"),
+            VersionRange("1.1.0", "", "", "1.1.1k"),
+        ),
+        ("cpe:2.3:a:openssl:openssl:*:*:*:*:*:*:*:*", ("", "", "", ""), VersionRange()),
+        (
+            "cpe:2.3:a:openssl:openssl:1.1.1\\-pre1:*:*:*:*:*:*:*",
+            ("", "", "", ""),
+            VersionRange.exactly("1.1.1-pre1"),
+        ),
+        ("cpe:2.3:o:linux:linux_kernel:-:*:*:*:*:*:*:*", ("", "", "", ""), None),
+    ],
+)
+def test_cpe_match_range(criteria, bounds, expected):
+    assert cpe_match_range(criteria, *bounds) == expected
+
+
+@pytest.mark.parametrize(
+    "affected, expected",
+    [
+        ([], IssueStatus.UNKNOWN),
+        ([None, True, False], IssueStatus.AFFECTED),
+        ([False, False], IssueStatus.NOTAFFECTED),
+        ([False, None], IssueStatus.UNKNOWN),
+    ],
+)
+def test_suggested_status(affected, expected):
+    assert suggested_status(affected) == expected
@@ -0,0 +1,302 @@
+import datetime
+import gzip
+import io
+import json
+import os
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+from tracker.nvd import (
+    CPEMatch,
+    NVDFeedFormatError,
+    cpe_vendor_product,
+    gzip_decompress,
+    iter_cve_items,
+    normalize_cve_item,
+    record_digest,
+)
+from tracker.nvd.api import MAX_WINDOW, normalize_api_cve, time_windows
+from tracker.tests.synthetic import SyntheticFeed
+from tracker.utils import chunked
+
+FIXTURE_DIR = Path(
+    os.path.join(os.path.dirname(os.path.realpath(__file__)), "fixtures")
+)
+
+
+@pytest.fixture
+def nvd_feed_bytes():
+    with gzip.open(FIXTURE_DIR / "nvdcve-1.1-2002-stripped.json.gz", "rb") as fh:
+        return fh.read()
+
+
+@pytest.mark.parametrize("read_size", [1, 7, 4096, 64 * 1024])
+def test_iter_cve_items_matches_json_load(nvd_feed_bytes, read_size):
+    expected = json.loads(nvd_feed_bytes)["CVE_Items"]
+    items = list(iter_cve_items(io.BytesIO(nvd_feed_bytes), read_size=read_size))
+    assert items == expected
+
+
+@pytest.mark.parametrize(
+    "document, expected",
+    [
+        (b"{}", []),
+        (b'{"CVE_Items": []}', []),
+        (
+            b' { "CVE_data_numberOfCVEs" : 12 , "CVE_Items" : [ {"a": 1} ] } ',
+            [{"a": 1}],
+        ),
+        (
+            b'{"CVE_Items": [{"a": 1}, {"b": "\xc3\xa4"}], "trailer": [1, 2]}',
+            [{"a": 1}, {"b": "ä"}],
+        ),
+    ],
+)
+def test_iter_cve_items_documents(document, expected):
+    assert list(iter_cve_items(io.BytesIO(document), read_size=3)) == expected
+
+
+@pytest.mark.parametrize(
+    "document",
+    [b"", b"[]", b'{"CVE_Items": [{"a": 1}', b'{"CVE_Items": [{"a": 1} {"b": 2}]}'],
+)
+def test_iter_cve_items_rejects_invalid_documents(document):
+    with pytest.raises((NVDFeedFormatError, json.JSONDecodeError)):
+        list(iter_cve_items(io.BytesIO(document)))
+
+
+def test_normalize_cve_item(nvd_feed_bytes):
+    item = json.loads(nvd_feed_bytes)["CVE_Items"][0]
+    record = normalize_cve_item(item)
+    assert record.identifier == "CVE-1999-0001"
+    assert record.description.startswith("ip_input.c in BSD-derived")
+    assert record.published_date.year == 1999
+    assert record.references == [
+        "http://www.openbsd.org/errata23.html#tcpfix",
+        "http://www.osvdb.org/5707",
+    ]
+
+
+def test_normalize_cve_item_extracts_scores_weaknesses_and_cpe_matches(
+    nvd_feed_bytes,
+):
+    item = json.loads(nvd_feed_bytes)["CVE_Items"][0]
+    record = normalize_cve_item(item)
+    assert record.cvss3_score is None
+    assert record.cvss3_vector == ""
+    assert record.cvss2_score == 5.0
+    assert record.cvss2_vector == "AV:N/AC:L/Au:N/C:N/I:N/A:P"
+    assert record.cwes == ["CWE-20"]
+    assert len(record.cpe_matches) == 23
+    assert CPEMatch("cpe:2.3:o:bsdi:bsd_os:3.1:*:*:*:*:*:*:*", True) in (
+        record.cpe_matches
+    )
+
+    item["impact"]["baseMetricV3"] = {
+        "cvssV3": {
+            "vectorString": "CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:N/I:N/A:H",
+            "baseScore": 7.5,
+        }
+    }
+    item["cve"]["problemtype"]["problemtype_data"].append(
+        {"description": [{"lang": "en", "value": "CWE-20"}]}
+    )
+    item["configurations"]["nodes"] = [
+        {
+            "operator": "AND",
+            "children": [
+                {
+                    "operator": "OR",
+                    "cpe_match": [
+                        {
+                            "vulnerable": True,
+                            "cpe23Uri": "cpe:2.3:a:openssl:openssl:*:*:*:*:*:*:*:*",
+                            "versionStartIncluding": "1.1.0",
+                            "versionEndExcluding": "1.1.1k",
+                        }
+                    ],
+                },
+                {
+                    "operator": "OR",
+                    "cpe_match": [
+                        {
+                            "vulnerable": False,
+                            "cpe23Uri": "cpe:2.3:o:linux:linux_kernel:-:*:*:*:*:*:*:*",
+                        }
+                    ],
+                },
+            ],
+            "cpe_match": [],
+        }
+    ]
+    record = normalize_cve_item(item)
+    assert record.cvss3_score == 7.5
+    assert record.cvss3_vector == "CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:N/I:N/A:H"
+    assert record.cwes == ["CWE-20"]
+    assert record.cpe_matches == [
+        CPEMatch(
+            "cpe:2.3:a:openssl:openssl:*:*:*:*:*:*:*:*",
+            True,
+            version_start_including="1.1.0",
+            version_end_excluding="1.1.1k",
+        ),
+        CPEMatch("cpe:2.3:o:linux:linux_kernel:-:*:*:*:*:*:*:*", False),
+    ]
+
+
+def test_normalize_api_cve_prefers_primary_metrics():
+    record = normalize_api_cve(
+        {
+            "cve": {
+                "id": "CVE-2021-3449",
+                "published": "2021-03-25T15:15:13.450",
+                "descriptions": [{"lang": "en", "value": "A NULL pointer deref."}],
+                "metrics": {
+                    "cvssMetricV31": [
+                        {
+                            "type": "Secondary",
+                            "cvssData": {"vectorString": "other", "baseScore": 4.0},
+                        },
+                        {
+                            "type": "Primary",
+                            "cvssData": {"vectorString": "primary", "baseScore": 5.9},
+                        },
+                    ],
+                    "cvssMetricV2": [
+                        {
+                            "type": "Secondary",
+                            "cvssData": {"vectorString": "v2", "baseScore": 4.3},
+                        },
+                    ],
+                },
+                "weaknesses": [
+                    {"description": [{"lang": "en", "value": "CWE-476"}]},
+                ],
+                "configurations": [
+                    {
+                        "nodes": [
+                            {
+                                "operator": "OR",
+                                "cpeMatch": [
+                                    {
+                                        "vulnerable": True,
+                                        "criteria": "cpe:2.3:a:openssl:openssl:*:*:*:*:*:*:*:*",
+                                        "versionEndExcluding": "1.1.1k",
+                                    }
+                                ],
+                            }
+                        ]
+                    }
+                ],
+                "references": [],
+            }
+        }
+    )
+    assert (record.cvss3_score, record.cvss3_vector) == (5.9, "primary")
+    assert (record.cvss2_score, record.cvss2_vector) == (4.3, "v2")
+    assert record.cwes == ["CWE-476"]
+    assert record.cpe_matches == [
+        CPEMatch(
+            "cpe:2.3:a:openssl:openssl:*:*:*:*:*:*:*:*",
+            True,
+            version_end_excluding="1.1.1k",
+        )
+    ]
+
+
+@pytest.mark.parametrize(
+    "criteria, expected",
+    [
+        ("cpe:2.3:a:openssl:openssl:1.1.1:*:*:*:*:*:*:*", ("openssl", "openssl")),
+        ("cpe:2.3:a:a\\:b:c\\:d:*:*:*:*:*:*:*:*", ("a\\:b", "c\\:d")),
+        ("cpe:/a:openssl:openssl:1.1.1", ("", "")),
+        ("", ("", "")),
+    ],
+)
+def test_cpe_vendor_product(criteria, expected):
+    assert cpe_vendor_product(criteria) == expected
+
+
+def test_record_digest(nvd_feed_bytes):
+    item = json.loads(nvd_feed_bytes)["CVE_Items"][0]
+    record = normalize_cve_item(item)
+
+    assert record_digest(record) == record_digest(normalize_cve_item(item))
+    assert record_digest(record) == record_digest(
+        record._replace(references=list(reversed(record.references)))
+    )
+    assert record_digest(record) != record_digest(
+        record._replace(description="changed")
+    )
+    assert record_digest(record) != record_digest(
+        record._replace(references=record.references[:1])
+    )
+    assert record_digest(record) != record_digest(record._replace(published_date=None))
+    assert record_digest(record) != record_digest(record._replace(cvss3_score=9.8))
+    assert record_digest(record) != record_digest(record._replace(cwes=[]))
+    assert record_digest(record) != record_digest(
+        record._replace(cpe_matches=record.cpe_matches[1:])
+    )
+
+
+def test_time_windows():
+    start = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+    end = start + 2 * MAX_WINDOW + datetime.timedelta(days=1)
+    assert list(time_windows(start, end)) == [
+        (start, start + MAX_WINDOW),
+        (start + MAX_WINDOW, start + 2 * MAX_WINDOW),
+        (start + 2 * MAX_WINDOW, end),
+    ]
+    assert list(time_windows(end, end)) == []
+
+
+def test_synthetic_feed_is_a_valid_feed():
+    data = json.load(gzip_decompress(SyntheticFeed(25)))
+    assert data["CVE_data_numberOfCVEs"] == "25"
+    assert len(data["CVE_Items"]) == 25
+
+    records = [normalize_cve_item(i) for i in data["CVE_Items"]]
+    assert len(set(r.identifier for r in records)) == 25
+
+
+def test_synthetic_feed_churn():
+    def records(**kwargs):
+        data = json.load(gzip_decompress(SyntheticFeed(1000, **kwargs)))
+        return [normalize_cve_item(i) for i in data["CVE_Items"]]
+
+    initial = records()
+
+    # the initial revision never has any churn
+    assert records(changed=0.5, reference_churn=0.5) == initial
+
+    revised = records(revision=1, new=50, changed=0.1, reference_churn=0.2)
+    assert len(revised) == 1050
+    assert revised[:1000] != initial
+
+    changed = sum(a.description != b.description for a, b in zip(initial, revised))
+    churned = sum(a.references != b.references for a, b in zip(initial, revised))
+    assert 50 < changed < 150
+    assert 150 < churned < 250
+
+
+def peak_memory_of_parsing(count: int) -> int:
+    tracemalloc.start()
+    try:
+        items = iter_cve_items(gzip_decompress(SyntheticFeed(count)))
+        for chunk in chunked((normalize_cve_item(i) for i in items), 100):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_iter_cve_items_memory_is_bounded():
+    """
+    The peak memory usage while parsing must not grow with the size of the
+    feed.
+    """
+    small = peak_memory_of_parsing(2000)
+    large = peak_memory_of_parsing(10000)
+    assert large < small * 1.5
@@ -0,0 +1,137 @@
+import os
+import threading
+
+import pytest
+
+from tracker.utils import chunked, pipeline, process_pipeline
+
+
+@pytest.mark.parametrize(
+    "items, size, expected",
+    [
+        ([], 3, []),
+        ([1, 2, 3], 3, [[1, 2, 3]]),
+        ([1, 2, 3, 4], 3, [[1, 2, 3], [4]]),
+        (range(5), 2, [[0, 1], [2, 3], [4]]),
+    ],
+)
+def test_chunked(items, size, expected):
+    assert list(chunked(items, size)) == expected
+
+
+@pytest.mark.parametrize("workers", [1, 2, 8])
+def test_pipeline_preserves_order(workers):
+    sources = list(range(10))
+    result = [
+        (source, list(items))
+        for source, items in pipeline(
+            sources, lambda n: range(n), workers=workers, buffer_size=2
+        )
+    ]
+    assert result == [(n, list(range(n))) for n in sources]
+
+
+def test_pipeline_produces_concurrently():
+    """
+    The second source must be produced while the first one is still being
+    consumed.
+    """
+    second_started = threading.Event()
+
+    def produce(source):
+        if source == "second":
+            second_started.set()
+        yield source
+
+    for source, items in pipeline(["first", "second"], produce, workers=2):
+        if source == "first":
+            assert second_started.wait(timeout=5)
+        assert list(items) == [source]
+
+
+def test_pipeline_raises_producer_exceptions():
+    def produce(source):
+        yield source
+        raise ValueError(source)
+
+    with pytest.raises(ValueError):
+        for source, items in pipeline(["a", "b"], produce):
+            list(items)
+
+
+def test_pipeline_stops_producers_when_consumer_fails():
+    def produce(source):
+        yield from range(1000)
+
+    with pytest.raises(RuntimeError):
+        for source, items in pipeline(list(range(4)), produce, buffer_size=1):
+            raise RuntimeError()
+
+
+def test_pipeline_skips_unconsumed_items():
+    result = [
+        source for source, items in pipeline(list(range(5)), range, buffer_size=1)
+    ]
+    assert result == list(range(5))
+
+
+class Source:
+    def __init__(self, name: str):
+        self.name = name
+        self.produced_by = None
+
+
+def produce_with_state(source: Source):
+    source.produced_by = os.getpid()
+    yield source.name
+    yield from range(3)
+
+
+def produce_failure(source: Source):
+    yield source.name
+    raise ValueError(source.name)
+
+
+@pytest.mark.parametrize("workers", [1, 2, 8])
+def test_process_pipeline_preserves_order(workers):
+    sources = [Source(str(n)) for n in range(5)]
+    result = [
+        (source.name, list(items))
+        for source, items in process_pipeline(
+            sources, produce_with_state, workers=workers, buffer_size=1
+        )
+    ]
+    assert result == [(s.name, [s.name, 0, 1, 2]) for s in sources]
+
+
+def test_process_pipeline_updates_sources():
+    sources = [Source("a"), Source("b")]
+    for source, items in process_pipeline(sources, produce_with_state, workers=2):
+        assert next(items) == source.name
+        assert source.produced_by not in (None, os.getpid())
+
+
+def test_process_pipeline_raises_producer_exceptions():
+    with pytest.raises(ValueError):
+        for source, items in process_pipeline([Source("a")], produce_failure):
+            list(items)
+
+
+def produce_unpicklable_failure(source: Source):
+    yield source.name
+    raise ValueError(threading.Lock())
+
+
+def test_process_pipeline_raises_unpicklable_producer_exceptions():
+    with pytest.raises(RuntimeError, match="ValueError"):
+        for source, items in process_pipeline(
+            [Source("a")], produce_unpicklable_failure
+        ):
+            list(items)
+
+
+def test_process_pipeline_stops_producers_when_consumer_fails():
+    sources = [Source(str(n)) for n in range(4)]
+    with pytest.raises(RuntimeError):
+        for source, items in process_pipeline(sources, produce_with_state):
+            raise RuntimeError()
@@ -1,4 +1,5 @@
 import itertools
+from decimal import Decimal
 from typing import List
 
 import pytest
@@ -9,7 +10,16 @@ from django.urls import reverse
 from pytest_django.asserts import assertRedirects, assertTemplateUsed
 
 from ..github_events.signature import compute_github_hmac
-from ..models import Advisory, GitHubEvent, Issue, IssueStatus
+from ..models import (
+    Advisory,
+    GitHubEvent,
+    GitHubEventReference,
+    Issue,
+    IssuePackageCandidate,
+    IssueStatus,
+    Package,
+    PackageMatchReason,
+)
 from ..views import list_advisories
 from .factories import AdvisoryFactory, IssueFactory, IssueReferenceFactory
 
@@ -116,6 +126,24 @@ def test_list_issues(client):
             assert issue.description in content
 
 
+@pytest.mark.django_db
+def test_list_issues_by_severity(client):
+    critical = IssueFactory(cvss3_base_score=Decimal("9.8"), cvss2_base_score=5)
+    high = IssueFactory(cvss2_base_score=Decimal("7.5"))
+    medium = IssueFactory(cvss3_base_score=Decimal("5.3"), cvss2_base_score=8)
+    unscored = IssueFactory()
+
+    response = client.get(reverse("issues"), {"min_cvss": "7.0"})
+    assert response.status_code == 200
+    assert list(response.context["table"].data) == sorted(
+        [critical, high], key=lambda issue: issue.published_date, reverse=True
+    )
+
+    response = client.get(reverse("issues"), {"sort": "-cvss_score"})
+    assert list(response.context["table"].data)[:3] == [critical, high, medium]
+    assert unscored in response.context["table"].data
+
+
 @pytest.mark.django_db
 def test_detail_issue(client):
     issue = IssueFactory()
@@ -128,6 +156,35 @@ def test_detail_issue(client):
     assert reference.uri in content
 
 
+@pytest.mark.django_db
+def test_detail_issue_package_candidates(client):
+    issue = IssueFactory(suggested_status=IssueStatus.AFFECTED)
+    package = Package.objects.create(
+        attribute="openssl_1_1", pname="openssl", version="1.1.1h"
+    )
+    IssuePackageCandidate.objects.create(
+        issue=issue, package=package, reason=PackageMatchReason.CPE, affected=True
+    )
+    response = client.get(issue.get_absolute_url())
+    content = response.content.decode("utf-8")
+    assert "openssl_1_1 1.1.1h" in content
+    assert "(affected)" in content
+
+
+@pytest.mark.django_db
+def test_detail_issue_github_events(client):
+    issue = IssueFactory()
+    event = GitHubEvent.objects.create(kind="issue_comment", data={})
+    GitHubEventReference.objects.create(event=event, identifier=issue)
+    GitHubEvent.objects.create(kind="issue_comment", data={})
+
+    response = client.get(issue.get_absolute_url())
+    assert list(response.context["github_events"]) == [event]
+    assert reverse("github_event_detail", kwargs={"pk": event.pk}) in (
+        response.content.decode("utf-8")
+    )
+
+
 @pytest.mark.django_db
 def test_edit_issue_requires_login(client):
     assert not auth_get_user(client).is_authenticated
@@ -183,6 +240,32 @@ def test_github_event(client):
     GitHubEvent.objects.filter(kind="test_github_event", data__name="some name").get()
 
 
+@pytest.mark.django_db
+def test_github_event_ignores_duplicate_deliveries(client):
+    for _ in range(2):
+        response = client.post(
+            reverse("github_event"),
+            '{"name": "redelivered"}',
+            content_type="application/json",
+            HTTP_X_Github_Event="test_github_event",
+            HTTP_X_Github_Delivery="72d3162e-cc78-11e3-81ab-4c9367dc0958",
+        )
+        assert response.status_code == 200
+
+    event = GitHubEvent.objects.get(data__name="redelivered")
+    assert event.delivery == "72d3162e-cc78-11e3-81ab-4c9367dc0958"
+
+    response = client.post(
+        reverse("github_event"),
+        '{"name": "redelivered"}',
+        content_type="application/json",
+        HTTP_X_Github_Event="test_github_event",
+        HTTP_X_Github_Delivery="8e7c1a4a-cc78-11e3-8a8f-b5f1b0f9ef4a",
+    )
+    assert response.status_code == 200
+    assert GitHubEvent.objects.filter(data__name="redelivered").count() == 2
+
+
 @pytest.mark.django_db
 def test_github_event_invalid_body(client):
     response = client.post(
@@ -278,3 +361,21 @@ def test_github_event_detail(client):
     assert str(event.pk) in content
     assert "whatever" in content
     assert "some-body-data" in content
+
+
+@pytest.mark.django_db
+def test_github_event_compact(client, settings):
+    settings.GITHUB_EVENTS_COMPACT = True
+    response = client.post(
+        reverse("github_event"),
+        '{"name": "compact"}',
+        content_type="application/json",
+        HTTP_X_Github_Event="test_github_event",
+    )
+    assert response.status_code == 200
+    event = GitHubEvent.objects.get(kind="test_github_event")
+    assert event.data is None
+    assert event.raw_data == {"name": "compact"}
+
+    response = client.get(reverse("github_event_detail", kwargs={"pk": event.pk}))
+    assert "compact" in response.content.decode()
@@ -1 +1,172 @@
+import itertools
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.reduction import ForkingPickler
+from typing import Callable, Iterable, Iterator, List, Sequence, Tuple, TypeVar
 
+S = TypeVar("S")
+T = TypeVar("T")
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    Split the given iterable into lists of at most `size` elements without
+    consuming more of the iterable than required for the current chunk.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class _Done:
+    pass
+
+
+class _Failure:
+    def __init__(self, exception: BaseException):
+        self.exception = exception
+
+
+def pipeline(
+    sources: Sequence[S],
+    produce: Callable[[S], Iterable[T]],
+    workers: int = 1,
+    buffer_size: int = 4,
+) -> Iterator[Tuple[S, Iterator[T]]]:
+    """
+    Run `produce` for each of the given sources in a pool of `workers` threads
+    and yield tuples of (source, items) in the order of the sources. While the
+    caller consumes the items of one source the following sources are already
+    being produced in the background. At most `buffer_size` items are buffered
+    per source so a slow consumer bounds the amount of memory in use.
+    """
+    stop = threading.Event()
+    queues: List[queue.Queue] = [queue.Queue(maxsize=buffer_size) for _ in sources]
+
+    def put(q: queue.Queue, item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(source: S, q: queue.Queue):
+        if stop.is_set():
+            return
+        try:
+            for item in produce(source):
+                if not put(q, item):
+                    return
+        except BaseException as e:
+            put(q, _Failure(e))
+            return
+        put(q, _Done)
+
+    def drain(q: queue.Queue) -> Iterator[T]:
+        while True:
+            item = q.get()
+            if item is _Done:
+                return
+            if isinstance(item, _Failure):
+                raise item.exception
+            yield item
+
+    executor = ThreadPoolExecutor(max_workers=max(workers, 1))
+    try:
+        for source, q in zip(sources, queues):
+            executor.submit(run, source, q)
+
+        for source, q in zip(sources, queues):
+            items = drain(q)
+            yield source, items
+            # make sure the producer is not blocked forever on a full queue
+            for _ in items:
+                pass
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
+
+
+def _produce_in_process(source, produce, q):
+    try:
+        for item in produce(source):
+            q.put((item, source, None))
+    except BaseException as e:
+        # The queue pickles in a background thread, where a failure would only
+        # be printed and leave the consumer waiting forever.
+        try:
+            ForkingPickler.dumps(e)
+        except Exception:
+            e = RuntimeError(repr(e))
+        q.put((None, source, e))
+        return
+    q.put((_Done, source, None))
+
+
+def process_pipeline(
+    sources: Sequence[S],
+    produce: Callable[[S], Iterable[T]],
+    workers: int = 1,
+    buffer_size: int = 4,
+) -> Iterator[Tuple[S, Iterator[T]]]:
+    """
+    Like `pipeline` but runs `produce` in up to `workers` separate processes
+    so CPU bound producers are not limited by the GIL. The items are pickled
+    and sent back to the calling process. Producers usually carry state in the
+    source objects (e.g. metadata of a download), so whenever an item arrives
+    the attributes of the source are updated with those of the producing
+    process.
+    """
+    context = multiprocessing.get_context()
+    workers = max(workers, 1)
+    processes: List = []
+    queues: List = []
+
+    def start(index: int):
+        q = context.Queue(maxsize=buffer_size)
+        process = context.Process(
+            target=_produce_in_process,
+            args=(sources[index], produce, q),
+            daemon=True,
+        )
+        process.start()
+        processes.append(process)
+        queues.append(q)
+
+    def drain(source: S, q) -> Iterator[T]:
+        while True:
+            item, remote_source, exception = q.get()
+            if hasattr(source, "__dict__"):
+                vars(source).update(vars(remote_source))
+            if exception is not None:
+                raise exception
+            if item is _Done:
+                return
+            yield item
+
+    try:
+        for index in range(min(workers, len(sources))):
+            start(index)
+
+        for index, source in enumerate(sources):
+            items = drain(source, queues[index])
+            yield source, items
+            # make sure the producer is not blocked forever on a full queue
+            for _ in items:
+                pass
+            processes[index].join()
+
+            if index + workers < len(sources):
+                start(index + workers)
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
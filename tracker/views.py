@@ -1,17 +1,20 @@
 import json
 import logging
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import LoginView as AuthLoginView
-from django.http import HttpResponse, HttpResponseBadRequest
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed
 from django.shortcuts import redirect, render
 from django.urls import reverse
-from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
 from django.views.generic import DetailView, UpdateView
 from django_tables2 import SingleTableView
 
+from .forms import IssueFilterForm
+from .github_events.buffer import get_event_buffer, store_events
 from .github_events.signature import verify_github_signature
 from .models import Advisory, GitHubEvent, Issue, IssueReference
 from .tables import IssueTable
@@ -42,6 +45,29 @@ class IssueList(SingleTableView):
     paginate_by = settings.PAGINATE_BY
     template_name = "issues/list.html"
 
+    def get_queryset(self):
+        # the v2 score stands in for issues that predate CVSS v3
+        queryset = Issue.objects.annotate(
+            cvss_score=Coalesce("cvss3_base_score", "cvss2_base_score")
+        )
+
+        self.filter_form = IssueFilterForm(self.request.GET)
+        if self.filter_form.is_valid():
+            min_cvss = self.filter_form.cleaned_data["min_cvss"]
+            if min_cvss is not None:
+                # spelled out rather than filtering on the annotation so the
+                # indexes on the score columns can be used
+                queryset = queryset.filter(
+                    Q(cvss3_base_score__gte=min_cvss)
+                    | Q(cvss3_base_score__isnull=True, cvss2_base_score__gte=min_cvss)
+                )
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["filter_form"] = self.filter_form
+        return context
+
 
 class IssueDetail(DetailView):
     model = Issue
@@ -52,6 +78,13 @@ class IssueDetail(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["references"] = IssueReference.objects.filter(issue=self.object)
+        context["weaknesses"] = self.object.weaknesses.values_list("cwe", flat=True)
+        context["package_candidates"] = self.object.package_candidates.select_related(
+            "package"
+        ).order_by("package__attribute")
+        context["github_events"] = GitHubEvent.objects.filter(
+            references__identifier=self.object
+        ).only("id", "kind", "received_at")
         return context
 
 
@@ -69,9 +102,15 @@ class IssueEdit(LoginRequiredMixin, UpdateView):
         return context
 
 
-@require_POST
-@csrf_exempt
-def github_event(request):
+async def github_event(request):
+    """
+    Receive a GitHub webhook delivery. Valid events are buffered and stored
+    in batches (see `tracker.github_events.buffer`), the response does not
+    wait for the database.
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+
     if "X-Github-Event" not in request.headers:
         logger.info("Received GitHub event without event type")
         return HttpResponseBadRequest("Nope.")
@@ -92,15 +131,30 @@ def github_event(request):
 
     try:
         data = json.loads(request.body)
-        event = GitHubEvent(kind=kind, data=data)
-        event.save()
     except json.JSONDecodeError as e:
         logger.error("Invalid body received: %s", e)
         return HttpResponseBadRequest("Not sure if you are serious.")
 
+    # GitHub retries deliveries and they can be redelivered by hand, each
+    # delivery is only stored once
+    event = GitHubEvent.from_delivery(
+        kind,
+        data,
+        delivery=request.headers.get("X-GitHub-Delivery") or None,
+        compact=settings.GITHUB_EVENTS_COMPACT,
+    )
+    if settings.GITHUB_EVENTS_BATCH_SIZE:
+        get_event_buffer().add(event)
+    else:
+        await sync_to_async(store_events)([event])
+
     return HttpResponse("Thanks!")
 
 
+# the decorators of Django do not support coroutines yet
+github_event.csrf_exempt = True  # type: ignore
+
+
 class GitHubEventDetail(DetailView):
     """
     Show the details of a received GitHubEvent.